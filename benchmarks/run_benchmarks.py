@@ -0,0 +1,285 @@
+"""
+Measure the throughput and peak memory use of SCEPTR across model variants,
+batch sizes and species, and write the results to a JSON file.
+
+Each operation is run once to warm up, then timed over several repeats on a
+fixed synthetic repertoire (see synthetic.py), so that runs with the same
+arguments on the same machine are comparable.
+
+Example::
+
+    python benchmarks/run_benchmarks.py --variants tiny default --batch-sizes 128 512 --output results.json
+"""
+
+import argparse
+from datetime import datetime, timezone
+from importlib import metadata
+import json
+import os
+import platform
+import sceptr
+from sceptr import variant
+from sceptr.model import Sceptr
+import statistics
+import sys
+from synthetic import generate_tcrs
+import threading
+import time
+import torch
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where the maximum RSS goes unrecorded
+    resource = None
+
+
+FORMAT_VERSION = 1
+MEMORY_POLL_INTERVAL_SECONDS = 0.005
+
+OPERATIONS = ("vector_representations", "residue_representations", "cdist", "pdist")
+
+
+class PeakMemoryMonitor:
+    """
+    Record the peak resident set size of this process while the context is
+    active, by polling it from a background thread. On CUDA devices, the peak
+    memory allocated by torch is also recorded.
+    """
+
+    def __init__(self) -> None:
+        self.peak_rss_bytes: Optional[int] = None
+        self.peak_cuda_bytes: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+
+    def __enter__(self) -> "PeakMemoryMonitor":
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+
+        self.peak_rss_bytes = _get_current_rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._update_peak_rss()
+
+        if torch.cuda.is_available():
+            self.peak_cuda_bytes = torch.cuda.max_memory_allocated()
+
+    def _poll(self) -> None:
+        while not self._stop.wait(MEMORY_POLL_INTERVAL_SECONDS):
+            self._update_peak_rss()
+
+    def _update_peak_rss(self) -> None:
+        rss_bytes = _get_current_rss_bytes()
+
+        if rss_bytes is not None:
+            self.peak_rss_bytes = max(self.peak_rss_bytes, rss_bytes)
+
+
+def _get_current_rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+
+def benchmark_operation(
+    operation: Callable[[], object], num_repeats: int
+) -> Dict[str, object]:
+    operation()
+
+    durations = []
+    with PeakMemoryMonitor() as memory_monitor:
+        for _ in range(num_repeats):
+            start = time.perf_counter()
+            operation()
+            durations.append(time.perf_counter() - start)
+
+    return {
+        "seconds": durations,
+        "median_seconds": statistics.median(durations),
+        "peak_rss_bytes": memory_monitor.peak_rss_bytes,
+        "peak_cuda_bytes": memory_monitor.peak_cuda_bytes,
+    }
+
+
+def benchmark_model(
+    model: Sceptr,
+    species: str,
+    batch_size: int,
+    operations: List[str],
+    num_tcrs: int,
+    num_distance_tcrs: int,
+    num_repeats: int,
+    seed: int,
+) -> List[Dict[str, object]]:
+    tcrs = generate_tcrs(num_tcrs, species, seed)
+    distance_tcrs = tcrs.iloc[:num_distance_tcrs]
+    model.set_batch_size(batch_size)
+
+    workloads = {
+        "vector_representations": (
+            lambda: model.calc_vector_representations(tcrs),
+            len(tcrs),
+            None,
+        ),
+        "residue_representations": (
+            lambda: model.calc_residue_representations(tcrs),
+            len(tcrs),
+            None,
+        ),
+        "cdist": (
+            lambda: model.calc_cdist_matrix(distance_tcrs, tcrs),
+            len(distance_tcrs) + len(tcrs),
+            len(distance_tcrs) * len(tcrs),
+        ),
+        "pdist": (
+            lambda: model.calc_pdist_vector(distance_tcrs),
+            len(distance_tcrs),
+            len(distance_tcrs) * (len(distance_tcrs) - 1) // 2,
+        ),
+    }
+
+    results = []
+    for operation in operations:
+        run, num_operation_tcrs, num_pairs = workloads[operation]
+        measurements = benchmark_operation(run, num_repeats)
+        median_seconds = measurements["median_seconds"]
+
+        results.append(
+            {
+                "species": species,
+                "variant": model.name,
+                "batch_size": batch_size,
+                "operation": operation,
+                "num_tcrs": num_operation_tcrs,
+                "num_pairs": num_pairs,
+                "tcrs_per_second": num_operation_tcrs / median_seconds,
+                "pairs_per_second": (
+                    None if num_pairs is None else num_pairs / median_seconds
+                ),
+                **measurements,
+            }
+        )
+        _report(results[-1])
+
+    return results
+
+
+def get_environment() -> Dict[str, object]:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "sceptr_version": metadata.version("sceptr"),
+        "torch_version": torch.__version__,
+        "torch_num_threads": torch.get_num_threads(),
+        "cuda_device": (
+            torch.cuda.get_device_name() if torch.cuda.is_available() else None
+        ),
+        "max_rss_bytes_before_run": _get_max_rss_bytes(),
+    }
+
+
+def _get_max_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _report(result: Dict[str, object]) -> None:
+    print(
+        f"{result['species']:<12} {result['variant']:<20} batch {result['batch_size']:<6} "
+        f"{result['operation']:<24} {result['tcrs_per_second']:>12.1f} TCRs/s",
+        file=sys.stderr,
+    )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--variants",
+        nargs="+",
+        default=["tiny", "small", "default", "large"],
+        help="names of functions in sceptr.variant to benchmark",
+    )
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[64, 256, 1024])
+    parser.add_argument(
+        "--species",
+        nargs="+",
+        default=["homosapiens", "musmusculus"],
+        choices=["homosapiens", "musmusculus"],
+    )
+    parser.add_argument(
+        "--operations", nargs="+", default=list(OPERATIONS), choices=OPERATIONS
+    )
+    parser.add_argument("--num-tcrs", type=int, default=10_000)
+    parser.add_argument(
+        "--num-distance-tcrs",
+        type=int,
+        default=1_000,
+        help="number of anchor TCRs for cdist, and of TCRs for pdist",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cpu", action="store_true", help="disable GPU acceleration")
+    parser.add_argument("--output", default="benchmark_results.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+
+    if args.cpu:
+        sceptr.disable_hardware_acceleration()
+
+    environment = get_environment()
+    results = []
+
+    for species in args.species:
+        sceptr.setup(species)
+
+        for variant_name in args.variants:
+            model = getattr(variant, variant_name)()
+
+            for batch_size in args.batch_sizes:
+                results.extend(
+                    benchmark_model(
+                        model,
+                        species,
+                        batch_size,
+                        args.operations,
+                        args.num_tcrs,
+                        min(args.num_distance_tcrs, args.num_tcrs),
+                        args.repeats,
+                        args.seed,
+                    )
+                )
+
+    sceptr.setup("homosapiens")
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "format_version": FORMAT_VERSION,
+                "environment": environment,
+                "arguments": vars(args),
+                "results": results,
+            },
+            f,
+            indent=4,
+        )
+
+
+if __name__ == "__main__":
+    main()
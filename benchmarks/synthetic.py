@@ -0,0 +1,194 @@
+"""
+Generate synthetic TCRs for benchmarking.
+
+Each chain is assembled the way V(D)J recombination builds one: the CDR3
+starts with the germline end of a functional V allele, ends with the germline
+start of a functional J allele up to its conserved Phe/Trp, and any remaining
+length is filled with non-templated residues. Junction lengths are drawn from
+per-chain distributions approximating those seen in real repertoires.
+"""
+
+from functools import lru_cache
+import numpy as np
+from pandas import DataFrame
+import re
+import tidytcells as tt
+from typing import List, Literal, NamedTuple, Tuple
+
+
+Species = Literal["homosapiens", "musmusculus"]
+Chain = Literal["A", "B"]
+
+# Mean and standard deviation of IMGT junction lengths (in amino acids,
+# including the conserved Cys and Phe/Trp) in typical alpha and beta repertoires
+JUNCTION_LENGTH_DISTRIBUTIONS = {"A": (13.5, 1.8), "B": (14.5, 1.7)}
+MIN_JUNCTION_LENGTH = 8
+MAX_JUNCTION_LENGTH = 24
+
+# Residues seen most often in non-templated CDR3 regions, and their weights
+NON_TEMPLATED_RESIDUES = "GSALRDTEPNQVKYFIWHM"
+NON_TEMPLATED_WEIGHTS = np.array(
+    [14, 11, 8, 7, 7, 7, 6, 6, 6, 5, 5, 4, 4, 3, 2, 2, 1, 1, 1], dtype=float
+)
+NON_TEMPLATED_WEIGHTS /= NON_TEMPLATED_WEIGHTS.sum()
+
+MAX_GERMLINE_TRIM = 4
+
+AMINO_ACIDS = set("ACDEFGHIKLMNPQRSTVWY")
+
+
+class GermlineSegment(NamedTuple):
+    allele: str
+    junction_part: str
+
+
+def generate_tcrs(
+    num_tcrs: int, species: Species = "homosapiens", seed: int = 0
+) -> DataFrame:
+    """
+    Generate `num_tcrs` paired-chain TCRs for `species` in the format SCEPTR
+    takes as input.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+
+    for chain in ("A", "B"):
+        v_alleles, cdr3s, j_alleles = _generate_chains(num_tcrs, species, chain, rng)
+        columns[f"TR{chain}V"] = v_alleles
+        columns[f"CDR3{chain}"] = cdr3s
+        columns[f"TR{chain}J"] = j_alleles
+
+    return DataFrame(
+        columns, columns=["TRAV", "CDR3A", "TRAJ", "TRBV", "CDR3B", "TRBJ"]
+    )
+
+
+def _generate_chains(
+    num_tcrs: int, species: Species, chain: Chain, rng: np.random.Generator
+) -> Tuple[List[str], List[str], List[str]]:
+    v_segments = _get_v_segments(species, chain)
+    j_segments = _get_j_segments(species, chain)
+    v_usage = _get_gene_usage(len(v_segments), rng)
+    j_usage = _get_gene_usage(len(j_segments), rng)
+
+    mean_length, sd_length = JUNCTION_LENGTH_DISTRIBUTIONS[chain]
+    junction_lengths = np.clip(
+        np.rint(rng.normal(mean_length, sd_length, size=num_tcrs)).astype(int),
+        MIN_JUNCTION_LENGTH,
+        MAX_JUNCTION_LENGTH,
+    )
+
+    v_choices = rng.choice(len(v_segments), size=num_tcrs, p=v_usage)
+    j_choices = rng.choice(len(j_segments), size=num_tcrs, p=j_usage)
+
+    cdr3s = [
+        _recombine(
+            v_segments[v_idx].junction_part,
+            j_segments[j_idx].junction_part,
+            junction_length,
+            rng,
+        )
+        for v_idx, j_idx, junction_length in zip(v_choices, j_choices, junction_lengths)
+    ]
+
+    return (
+        [v_segments[idx].allele for idx in v_choices],
+        cdr3s,
+        [j_segments[idx].allele for idx in j_choices],
+    )
+
+
+def _recombine(
+    v_part: str, j_part: str, junction_length: int, rng: np.random.Generator
+) -> str:
+    """
+    Trim the germline V and J ends, keeping the conserved Cys and Phe/Trp,
+    until they fit within `junction_length`, then fill the gap between them
+    with non-templated residues.
+    """
+    v_trim, j_trim = rng.integers(0, MAX_GERMLINE_TRIM + 1, size=2)
+    v_part = v_part[: max(1, len(v_part) - v_trim)]
+    j_part = j_part[min(len(j_part) - 1, j_trim) :]
+
+    while len(v_part) + len(j_part) > junction_length:
+        if len(v_part) > 1 and (len(v_part) >= len(j_part) or len(j_part) == 1):
+            v_part = v_part[:-1]
+        else:
+            j_part = j_part[1:]
+
+    num_non_templated = junction_length - len(v_part) - len(j_part)
+    non_templated = "".join(
+        rng.choice(
+            list(NON_TEMPLATED_RESIDUES),
+            size=num_non_templated,
+            p=NON_TEMPLATED_WEIGHTS,
+        )
+    )
+
+    return v_part + non_templated + j_part
+
+
+def _get_gene_usage(num_genes: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Real repertoires use a few genes heavily and most sparingly, so draw a
+    skewed usage profile rather than sampling genes uniformly.
+    """
+    return rng.dirichlet(np.full(num_genes, 0.5))
+
+
+@lru_cache
+def _get_v_segments(species: Species, chain: Chain) -> List[GermlineSegment]:
+    segments = []
+
+    for allele in _get_first_functional_alleles(species, f"TR{chain}V"):
+        sequences = tt.tr.get_aa_sequence(allele, species=species)
+        framework_length = sum(
+            len(sequences.get(region, ""))
+            for region in ("FR1-IMGT", "CDR1-IMGT", "FR2-IMGT", "CDR2-IMGT")
+        )
+        fr3 = sequences.get("FR3-IMGT", "")
+
+        if not fr3.endswith("C"):
+            continue
+
+        junction_part = "C" + sequences["V-REGION"][framework_length + len(fr3) :]
+
+        if set(junction_part) <= AMINO_ACIDS:
+            segments.append(GermlineSegment(allele, junction_part))
+
+    return segments
+
+
+@lru_cache
+def _get_j_segments(species: Species, chain: Chain) -> List[GermlineSegment]:
+    segments = []
+
+    for allele in _get_first_functional_alleles(species, f"TR{chain}J"):
+        j_region = tt.tr.get_aa_sequence(allele, species=species)["J-REGION"]
+        motif = re.search("[FW]G.G", j_region)
+
+        if motif is None:
+            continue
+
+        junction_part = j_region[: motif.start() + 1]
+
+        if set(junction_part) <= AMINO_ACIDS:
+            segments.append(GermlineSegment(allele, junction_part))
+
+    return segments
+
+
+def _get_first_functional_alleles(species: Species, gene_prefix: str) -> List[str]:
+    alleles = tt.tr.query(
+        species=species,
+        contains_pattern=gene_prefix,
+        functionality="F",
+        precision="allele",
+    )
+    first_alleles = {}
+
+    for allele in sorted(alleles):
+        gene = allele.split("*")[0]
+        first_alleles.setdefault(gene, allele)
+
+    return sorted(first_alleles.values())
@@ -4,14 +4,29 @@ alignment-free TCR analysis. The root module provides easy access to SCEPTR
 through a functional API which uses the default model.
 """
 
-from sceptr import variant
-from sceptr.model import Sceptr, ResidueRepresentations
-import libtcrlm
-import numpy as np
-from numpy.typing import NDArray
-from pandas import DataFrame
-from typing import Optional, Literal
-
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional, Literal, Tuple, Union
+
+if TYPE_CHECKING:
+    import numpy as np
+    from numpy.typing import NDArray
+    from pandas import DataFrame
+    from scipy.sparse import csr_array
+    from sceptr.model import (
+        Sceptr,
+        ResidueRepresentations,
+        RaggedResidueRepresentations,
+    )
+
+
+_LAZY_SUBMODULES = ("index", "model", "store", "variant")
+_LAZY_MODEL_ATTRIBUTES = (
+    "Sceptr",
+    "ResidueRepresentations",
+    "RaggedResidueRepresentations",
+)
 
 _DEFAULT_MODEL: Optional[Sceptr] = None
 _USE_HARDWARE_ACCELERATION = True
@@ -75,6 +90,8 @@ def setup(species: Literal["homosapiens", "musmusculus"]):
 
     >>> sceptr.setup("homosapiens")
     """
+    import libtcrlm
+
     libtcrlm.setup(species)
 
 
@@ -127,6 +144,246 @@ def calc_pdist_vector(instances: DataFrame) -> NDArray[np.float32]:
     return _get_default_model().calc_pdist_vector(instances)
 
 
+def calc_nearest_neighbours(
+    anchors: DataFrame, comparisons: DataFrame, k: int
+) -> Tuple[NDArray[np.int64], NDArray[np.float32]]:
+    """
+    For each TCR in `anchors`, find the `k` closest TCRs in `comparisons`,
+    without ever computing the full cdist matrix between the two collections.
+
+    Parameters
+    ----------
+    anchors : DataFrame
+        DataFrame specifying the anchor TCRs, for which nearest neighbours are
+        to be found. It must be in the :ref:`prescribed format <data_format>`.
+
+    comparisons : DataFrame
+        DataFrame specifying the comparison TCRs, among which nearest
+        neighbours are to be found. It must be in the :ref:`prescribed format
+        <data_format>`.
+
+    k : int
+        The number of nearest neighbours to find for each anchor. Must not
+        exceed the number of TCRs in `comparisons`.
+
+    Returns
+    -------
+    Tuple[NDArray[numpy.int64], NDArray[numpy.float32]]
+        A tuple of two 2D numpy ndarrays, both of shape :math:`(X, k)` where
+        :math:`X` is the number of TCRs in `anchors`. The first contains the
+        (zero-based) positional indices of the nearest neighbours of each
+        anchor within `comparisons`, and the second contains the corresponding
+        distances. Neighbours are sorted from nearest to furthest.
+    """
+    return _get_default_model().calc_nearest_neighbours(anchors, comparisons, k)
+
+
+def calc_cdist_radius_graph(
+    anchors: DataFrame, comparisons: DataFrame, radius: float
+) -> csr_array:
+    """
+    Find all pairs of TCRs between two collections that lie within a given
+    distance of each other, and return them as a sparse matrix. Memory use
+    grows with the number of neighbouring pairs rather than with the size of
+    the full cdist matrix.
+
+    Parameters
+    ----------
+    anchors : DataFrame
+        DataFrame specifying the first (anchor) collection of input TCRs. It
+        must be in the :ref:`prescribed format <data_format>`.
+
+    comparisons : DataFrame
+        DataFrame specifying the second (comparison) collection of input TCRs.
+        It must be in the :ref:`prescribed format <data_format>`.
+
+    radius : float
+        Pairs of TCRs at a distance less than or equal to `radius` are
+        considered neighbours.
+
+    Returns
+    -------
+    scipy.sparse.csr_array
+        A sparse array in compressed sparse row format, of shape :math:`(X,
+        Y)` where :math:`X` is the number of TCRs in `anchors` and :math:`Y` is
+        the number of TCRs in `comparisons`. Entry :math:`(i, j)` is stored if
+        and only if the :math:`i`-th anchor and the :math:`j`-th comparison TCR
+        are neighbours, in which case its value is the distance between them.
+    """
+    return _get_default_model().calc_cdist_radius_graph(anchors, comparisons, radius)
+
+
+def calc_pdist_radius_graph(instances: DataFrame, radius: float) -> csr_array:
+    r"""
+    Find all pairs of TCRs within a collection that lie within a given distance
+    of each other, and return them as a sparse matrix. Memory use grows with
+    the number of neighbouring pairs rather than with the size of the full
+    pdist vector.
+
+    Parameters
+    ----------
+    instances : DataFrame
+        DataFrame specifying the input TCRs. It must be in the :ref:`prescribed
+        format <data_format>`.
+
+    radius : float
+        Pairs of TCRs at a distance less than or equal to `radius` are
+        considered neighbours.
+
+    Returns
+    -------
+    scipy.sparse.csr_array
+        A symmetric sparse array in compressed sparse row format, of shape
+        :math:`(N, N)` where :math:`N` is the number of TCRs in `instances`.
+        Entry :math:`(i, j)` is stored if and only if :math:`i \neq j` and the
+        :math:`i`-th and :math:`j`-th TCRs are neighbours, in which case its
+        value is the distance between them.
+    """
+    return _get_default_model().calc_pdist_radius_graph(instances, radius)
+
+
+def calc_cdist_histogram(
+    anchors: DataFrame,
+    comparisons: DataFrame,
+    bins: Optional[Iterable[float]] = None,
+    per_anchor: bool = False,
+) -> NDArray[np.int64]:
+    """
+    Count the distances between two collections of TCRs into bins, in the
+    manner of :py:func:`numpy.histogram`. Distances are counted as they are
+    computed, so the full cdist matrix is never held in memory.
+
+    Parameters
+    ----------
+    anchors : DataFrame
+        DataFrame specifying the first (anchor) collection of input TCRs. It
+        must be in the :ref:`prescribed format <data_format>`.
+
+    comparisons : DataFrame
+        DataFrame specifying the second (comparison) collection of input TCRs.
+        It must be in the :ref:`prescribed format <data_format>`.
+
+    bins : Iterable[float] or None
+        Monotonically increasing bin edges. Defaults to 20 bins of width 0.1
+        spanning 0 to 2.
+
+    per_anchor : bool
+        If True, return a separate histogram for each anchor TCR. Defaults to
+        False.
+
+    Returns
+    -------
+    NDArray[numpy.int64]
+        An array of shape :math:`(B,)` holding the number of distances falling
+        in each of the :math:`B` bins, or of shape :math:`(X, B)` if
+        `per_anchor` is set, where :math:`X` is the number of TCRs in
+        `anchors`.
+    """
+    return _get_default_model().calc_cdist_histogram(
+        anchors, comparisons, bins, per_anchor
+    )
+
+
+def calc_pdist_histogram(
+    instances: DataFrame,
+    bins: Optional[Iterable[float]] = None,
+    per_instance: bool = False,
+) -> NDArray[np.int64]:
+    """
+    Count the distances between each pair of TCRs in the input data into bins,
+    in the manner of :py:func:`numpy.histogram`. Memory use grows only
+    linearly with the number of TCRs.
+
+    Parameters
+    ----------
+    instances : DataFrame
+        DataFrame specifying the input TCRs. It must be in the :ref:`prescribed
+        format <data_format>`.
+
+    bins : Iterable[float] or None
+        Monotonically increasing bin edges. Defaults to 20 bins of width 0.1
+        spanning 0 to 2.
+
+    per_instance : bool
+        If True, return a separate histogram for each TCR, of its distances to
+        all other TCRs in `instances`. Defaults to False.
+
+    Returns
+    -------
+    NDArray[numpy.int64]
+        An array of shape :math:`(B,)` holding the number of pairs of TCRs
+        whose distance falls in each of the :math:`B` bins, or of shape
+        :math:`(N, B)` if `per_instance` is set, where :math:`N` is the number
+        of TCRs in `instances`.
+    """
+    return _get_default_model().calc_pdist_histogram(instances, bins, per_instance)
+
+
+def calc_cdist_neighbour_counts(
+    anchors: DataFrame,
+    comparisons: Union[DataFrame, List[DataFrame]],
+    radii: Union[float, Iterable[float]],
+) -> Union[NDArray[np.int64], List[NDArray[np.int64]]]:
+    """
+    Count, for each anchor TCR, the number of comparison TCRs within one or
+    more distances of it. Only the counts are kept, so memory use grows only
+    linearly with the number of TCRs.
+
+    Parameters
+    ----------
+    anchors : DataFrame
+        DataFrame specifying the anchor TCRs to count neighbours for. It must
+        be in the :ref:`prescribed format <data_format>`.
+
+    comparisons : DataFrame or List[DataFrame]
+        DataFrame specifying the comparison TCRs to count as neighbours, or a
+        list of such DataFrames. They must be in the :ref:`prescribed format
+        <data_format>`.
+
+    radii : float or Iterable[float]
+        One or more non-negative distances. Comparison TCRs at a distance less
+        than or equal to a radius from an anchor TCR are counted as its
+        neighbours.
+
+    Returns
+    -------
+    NDArray[numpy.int64] or List[NDArray[numpy.int64]]
+        An array of shape :math:`(X,)` if `radii` is a single number, or of
+        shape :math:`(X, R)` for :math:`R` radii, where :math:`X` is the number
+        of TCRs in `anchors`. If `comparisons` is a list, a list of such arrays
+        is returned, one per comparison DataFrame.
+    """
+    return _get_default_model().calc_cdist_neighbour_counts(anchors, comparisons, radii)
+
+
+def calc_pdist_neighbour_counts(
+    instances: DataFrame, radii: Union[float, Iterable[float]]
+) -> NDArray[np.int64]:
+    """
+    Count, for each TCR in the input data, the number of other TCRs in the
+    input data within one or more distances of it. Memory use grows only
+    linearly with the number of TCRs.
+
+    Parameters
+    ----------
+    instances : DataFrame
+        DataFrame specifying the input TCRs. It must be in the :ref:`prescribed
+        format <data_format>`.
+
+    radii : float or Iterable[float]
+        One or more non-negative distances. TCRs at a distance less than or
+        equal to a radius from one another are counted as neighbours.
+
+    Returns
+    -------
+    NDArray[numpy.int64]
+        An array of shape :math:`(N,)` if `radii` is a single number, or of
+        shape :math:`(N, R)` for :math:`R` radii, where :math:`N` is the number
+        of TCRs in `instances`.
+    """
+    return _get_default_model().calc_pdist_neighbour_counts(instances, radii)
+
+
 def calc_vector_representations(instances: DataFrame) -> NDArray[np.float32]:
     """
     Map TCRs to their corresponding vector representations.
@@ -147,7 +404,12 @@ def calc_vector_representations(instances: DataFrame) -> NDArray[np.float32]:
     return _get_default_model().calc_vector_representations(instances)
 
 
-def calc_residue_representations(instances: DataFrame) -> ResidueRepresentations:
+def calc_residue_representations(
+    instances: DataFrame,
+    ragged: bool = False,
+    compartments: Union[Iterable[Union[str, int]], str, int, None] = None,
+    pooling: Optional[Literal["mean", "max"]] = None,
+) -> Union[ResidueRepresentations, RaggedResidueRepresentations, NDArray]:
     """
     Map each TCR to a set of amino acid residue-level representations. The
     residue-level representations are the output of the penultimate
@@ -160,16 +422,33 @@ def calc_residue_representations(instances: DataFrame) -> ResidueRepresentations
     instances : DataFrame
         DataFrame specifying the input TCRs. It must be in the :ref:`prescribed
         format <data_format>`.
+    ragged : bool
+        If True, return the representations in the compact
+        :py:class:`~sceptr.model.RaggedResidueRepresentations` layout, which
+        stores no padding. Defaults to False.
+    compartments : str, int, an iterable of these, or None
+        If given, only residues from these CDR loops are kept, such as
+        ``"CDR3B"`` or ``["CDR3A", "CDR3B"]``. Defaults to all CDR loops.
+    pooling : "mean", "max" or None
+        If given, the residue representations of each selected CDR loop are
+        pooled into a single vector by taking their elementwise mean or
+        maximum, and an array of these vectors is returned instead. Cannot be
+        combined with `ragged`. Defaults to None.
 
     Returns
     -------
-    :py:class:`~sceptr.model.ResidueRepresentations`
+    :py:class:`~sceptr.model.ResidueRepresentations`, :py:class:`~sceptr.model.RaggedResidueRepresentations` or NDArray
         An array of representation vectors for each amino acid residue in the
         tokenised forms of the input TCRs. For details on how to interpret/use
         this output, please refer to the documentation for
-        :py:class:`~sceptr.model.ResidueRepresentations`.
+        :py:class:`~sceptr.model.ResidueRepresentations` and
+        :py:class:`~sceptr.model.RaggedResidueRepresentations`. If `pooling`
+        is set, a numpy float array of pooled vectors, as described in
+        :py:meth:`sceptr.model.Sceptr.calc_residue_representations`.
     """
-    return _get_default_model().calc_residue_representations(instances)
+    return _get_default_model().calc_residue_representations(
+        instances, ragged, compartments, pooling
+    )
 
 
 def enable_hardware_acceleration() -> None:
@@ -227,6 +506,23 @@ def _get_default_model() -> Sceptr:
     global _DEFAULT_MODEL
 
     if _DEFAULT_MODEL is None:
+        from sceptr import variant
+
         _DEFAULT_MODEL = variant.default()
 
     return _DEFAULT_MODEL
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Import submodules and the model classes on first access, so that importing
+    the package does not pull in torch, pandas or libtcrlm until a model is
+    actually needed.
+    """
+    if name in _LAZY_SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+
+    if name in _LAZY_MODEL_ATTRIBUTES:
+        return getattr(importlib.import_module(f"{__name__}.model"), name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,89 @@
+from libtcrlm.tokeniser.token_indices import DefaultTokenIndex
+import numpy as np
+from numpy.typing import NDArray
+import torch
+from torch import LongTensor
+from typing import Callable, Iterable, List, Optional
+
+
+class TokenisedTcrs:
+    """
+    A compact, unpadded store of tokenised TCRs. The tokens of all TCRs are
+    kept in one flat tensor, and padded batches are assembled on demand for
+    arbitrary subsets of TCRs.
+    """
+
+    def __init__(self, tokens: LongTensor, lengths: NDArray[np.int64]) -> None:
+        self.tokens = tokens
+        self.lengths = lengths
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+
+    @classmethod
+    def from_tensors(cls, tokenised_tcrs: Iterable[LongTensor]) -> "TokenisedTcrs":
+        tokenised_tcrs = list(tokenised_tcrs)
+        lengths = np.array([len(t) for t in tokenised_tcrs], dtype=np.int64)
+        tokens = torch.concatenate(tokenised_tcrs, dim=0)
+        return cls(tokens, lengths)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def get_padded_batch(self, indices: NDArray[np.int64]) -> LongTensor:
+        """
+        Assemble a padded batch of the TCRs at `indices`, in that order. The
+        batch is only as wide as its longest member.
+        """
+        lengths = self.lengths[indices]
+        num_tokens = int(lengths.sum())
+
+        padded_batch = torch.full(
+            (len(indices), int(lengths.max()), self.tokens.shape[1]),
+            DefaultTokenIndex.NULL,
+            dtype=torch.long,
+        )
+
+        row_indices = np.repeat(np.arange(len(indices)), lengths)
+        batch_offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        col_indices = np.arange(num_tokens) - batch_offsets
+        source_indices = np.repeat(self.offsets[indices], lengths) + col_indices
+
+        padded_batch[row_indices, col_indices] = self.tokens[source_indices]
+
+        return padded_batch
+
+
+def schedule_batches(
+    lengths: NDArray[np.int64],
+    batch_size: int,
+    token_budget: Optional[int] = None,
+    get_max_rows: Optional[Callable[[int], int]] = None,
+) -> List[NDArray[np.int64]]:
+    """
+    Split the TCRs with the given token `lengths` into batches of similar
+    length, so that little compute is spent on padding. TCRs are sorted from
+    longest to shortest, and chunked either into batches of `batch_size` rows,
+    or, if `token_budget` is set, into batches whose padded size (rows times
+    longest member) stays within the budget. If `get_max_rows` is given, it
+    takes precedence, and is called with the length of the longest member of
+    each batch to get the number of rows the batch may hold. Every batch holds
+    at least one TCR. Returns a list of index arrays into `lengths`.
+    """
+    order = np.argsort(-lengths, kind="stable")
+
+    if token_budget is None and get_max_rows is None:
+        return [
+            order[idx : idx + batch_size] for idx in range(0, len(order), batch_size)
+        ]
+
+    if get_max_rows is None:
+        get_max_rows = lambda longest_in_batch: token_budget // longest_in_batch
+
+    batches = []
+    idx = 0
+    while idx < len(order):
+        longest_in_batch = int(lengths[order[idx]])
+        num_rows = max(1, get_max_rows(longest_in_batch))
+        batches.append(order[idx : idx + num_rows])
+        idx += num_rows
+
+    return batches
@@ -0,0 +1,171 @@
+import json
+import numpy as np
+from numpy.typing import NDArray
+import os
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+
+OUTPUT_DTYPES = (np.float32, np.float16)
+
+
+class DistanceOutput:
+    """
+    An output array that distance matrices are written into in blocks of rows,
+    along with the bookkeeping needed to resume writing after an
+    interruption. For outputs backed by a file, the number of rows completed so
+    far is recorded in a progress file next to it, which is removed once all
+    rows are written.
+    """
+
+    def __init__(
+        self,
+        array: NDArray,
+        progress_path: Optional[Path],
+        signature: dict,
+        num_rows_done: int,
+    ) -> None:
+        self.array = array
+        self.num_rows_done = num_rows_done
+        self._progress_path = progress_path
+        self._signature = signature
+
+    @classmethod
+    def open(
+        cls,
+        out: Union[NDArray, str, os.PathLike],
+        shape: Tuple[int, ...],
+        num_rows: int,
+        default_dtype: np.dtype,
+        signature: dict,
+        resume: bool,
+    ) -> "DistanceOutput":
+        """
+        Open `out`, which is either an array of the given `shape` to write
+        into, or a path at which to create a ``.npy`` file of the given shape
+        and `default_dtype`. The output is written in `num_rows` rows of
+        distances. If `resume` is set, rows already written by an earlier
+        interrupted call with the same `signature` are skipped, and a file
+        with no progress recorded is taken to be complete.
+        """
+        if isinstance(out, np.ndarray):
+            return cls._open_array(out, shape, signature, resume)
+
+        if not isinstance(out, (str, os.PathLike)):
+            raise TypeError(
+                f"out must be a numpy array, a path or None. Got {type(out)}."
+            )
+
+        return cls._open_path(
+            Path(out), shape, num_rows, default_dtype, signature, resume
+        )
+
+    @classmethod
+    def _open_array(
+        cls, out: NDArray, shape: Tuple[int, ...], signature: dict, resume: bool
+    ) -> "DistanceOutput":
+        if out.shape != shape:
+            raise ValueError(
+                f"out must have shape {shape} to hold the result. Got {out.shape}."
+            )
+
+        if out.dtype not in OUTPUT_DTYPES:
+            raise ValueError(
+                f"out must have dtype float32 or float16. Got {out.dtype}."
+            )
+
+        filename = getattr(out, "filename", None)
+
+        if filename is None:
+            if resume:
+                raise ValueError(
+                    "Resuming requires out to be a path or a numpy.memmap."
+                )
+
+            return cls(out, None, signature, 0)
+
+        progress_path = _get_progress_path(Path(filename))
+        signature = {**signature, "dtype": out.dtype.name}
+        num_rows_done = (
+            _read_progress(progress_path, signature)
+            if resume and progress_path.exists()
+            else 0
+        )
+        return cls(out, progress_path, signature, num_rows_done)
+
+    @classmethod
+    def _open_path(
+        cls,
+        path: Path,
+        shape: Tuple[int, ...],
+        num_rows: int,
+        dtype: np.dtype,
+        signature: dict,
+        resume: bool,
+    ) -> "DistanceOutput":
+        progress_path = _get_progress_path(path)
+        signature = {**signature, "dtype": np.dtype(dtype).name}
+
+        if resume and path.exists():
+            array = np.lib.format.open_memmap(path, mode="r+")
+
+            if array.shape != shape or array.dtype != dtype:
+                raise ValueError(
+                    f"Cannot resume writing to {path}: it holds an array of shape {array.shape} and dtype {array.dtype}, but shape {shape} and dtype {np.dtype(dtype)} are needed."
+                )
+
+            num_rows_done = (
+                _read_progress(progress_path, signature)
+                if progress_path.exists()
+                else num_rows
+            )
+            return cls(array, progress_path, signature, num_rows_done)
+
+        array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+        output = cls(array, progress_path, signature, 0)
+        output.record_progress(0)
+        return output
+
+    def record_progress(self, num_rows_done: int) -> None:
+        self.num_rows_done = num_rows_done
+
+        if self._progress_path is None:
+            return
+
+        if isinstance(self.array, np.memmap):
+            self.array.flush()
+
+        temporary_path = self._progress_path.with_name(
+            self._progress_path.name + ".tmp"
+        )
+        with open(temporary_path, "w") as f:
+            json.dump({**self._signature, "num_rows_done": num_rows_done}, f)
+
+        os.replace(temporary_path, self._progress_path)
+
+    def finish(self) -> NDArray:
+        if self._progress_path is not None:
+            if isinstance(self.array, np.memmap):
+                self.array.flush()
+
+            self._progress_path.unlink(missing_ok=True)
+
+        return self.array
+
+
+def _get_progress_path(path: Path) -> Path:
+    return path.with_name(path.name + ".progress")
+
+
+def _read_progress(progress_path: Path, signature: dict) -> int:
+    with open(progress_path, "r") as f:
+        progress = json.load(f)
+
+    num_rows_done = progress.pop("num_rows_done")
+
+    if progress != signature:
+        raise ValueError(
+            f"Cannot resume: {progress_path} records progress on a different computation ({progress}) than the one requested ({signature})."
+        )
+
+    return num_rows_done
@@ -0,0 +1,183 @@
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+from numpy.typing import NDArray
+from typing import TYPE_CHECKING, Hashable, List, NamedTuple, Optional, Tuple
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+
+TCR_COLUMNS = ("TRAV", "CDR3A", "TRAJ", "TRBV", "CDR3B", "TRBJ")
+GENE_COLUMNS = ("TRAV", "TRAJ", "TRBV", "TRBJ")
+
+
+class EmbeddingCacheInfo(NamedTuple):
+    """
+    Statistics describing the state of an embedding cache.
+
+    Attributes
+    ----------
+    hits : int
+        Number of TCR lookups that were answered from the cache.
+    misses : int
+        Number of TCR lookups that required running the model.
+    num_entries : int
+        Number of TCR embeddings currently held in the cache.
+    num_bytes : int
+        Total size in bytes of the embeddings currently held in the cache.
+    max_entries : Optional[int]
+        Maximum number of embeddings the cache will hold, if bounded.
+    max_bytes : Optional[int]
+        Maximum total size in bytes of the embeddings the cache will hold, if
+        bounded.
+    """
+
+    hits: int
+    misses: int
+    num_entries: int
+    num_bytes: int
+    max_entries: Optional[int]
+    max_bytes: Optional[int]
+
+
+class EmbeddingCache:
+    """
+    A least-recently-used cache of TCR embeddings, bounded by entry count
+    and/or by the total number of bytes held.
+    """
+
+    def __init__(
+        self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None
+    ) -> None:
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, NDArray[np.float32]] = OrderedDict()
+        self._num_bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Optional[NDArray[np.float32]]:
+        embedding = self._entries.get(key)
+
+        if embedding is None:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return embedding
+
+    def put(self, key: Hashable, embedding: NDArray[np.float32]) -> None:
+        if key in self._entries:
+            self._num_bytes -= self._entries.pop(key).nbytes
+
+        self._entries[key] = embedding
+        self._num_bytes += embedding.nbytes
+        self._evict_until_within_bounds()
+
+    def info(self) -> EmbeddingCacheInfo:
+        return EmbeddingCacheInfo(
+            hits=self._hits,
+            misses=self._misses,
+            num_entries=len(self._entries),
+            num_bytes=self._num_bytes,
+            max_entries=self._max_entries,
+            max_bytes=self._max_bytes,
+        )
+
+    def _evict_until_within_bounds(self) -> None:
+        while self._entries and self._is_over_bounds():
+            _, evicted = self._entries.popitem(last=False)
+            self._num_bytes -= evicted.nbytes
+
+    def _is_over_bounds(self) -> bool:
+        if self._max_entries is not None and len(self._entries) > self._max_entries:
+            return True
+
+        if self._max_bytes is not None and self._num_bytes > self._max_bytes:
+            return True
+
+        return False
+
+
+def get_tcr_keys(
+    instances: "DataFrame", species: str
+) -> List[Tuple[Optional[str], ...]]:
+    """
+    Generate a hashable key for each TCR in `instances`, consisting of the
+    values in its TRAV, CDR3A, TRAJ, TRBV, CDR3B and TRBJ columns. Values are
+    normalised so that TCRs which SCEPTR reads identically get the same key:
+
+    - Missing columns, NA values and empty strings are all represented as
+      ``None``.
+    - Gene symbols are written as the gene name and a two-digit allele number.
+      Symbols without an allele number are given the first functional allele
+      of the gene in `species`, as SCEPTR assumes when reading them, so that
+      ``TRAV1-1`` and ``TRAV1-1*01`` share a key. Symbols that are not
+      recognised are kept as they are.
+    - CDR3 sequences are kept as they are.
+    """
+    tcr_columns = instances.reindex(columns=list(TCR_COLUMNS)).astype(object)
+    tcr_columns = tcr_columns.where(tcr_columns.notna() & (tcr_columns != ""), None)
+
+    for column in GENE_COLUMNS:
+        symbols = tcr_columns[column]
+        is_present = symbols.notna()
+
+        if is_present.any():
+            present_symbols = symbols[is_present]
+            normalised_symbols = {
+                symbol: _normalise_gene_symbol(symbol, species)
+                for symbol in present_symbols.unique()
+            }
+            tcr_columns.loc[is_present, column] = present_symbols.map(
+                normalised_symbols
+            )
+
+    return list(tcr_columns.itertuples(index=False, name=None))
+
+
+@lru_cache(maxsize=None)
+def _normalise_gene_symbol(symbol: str, species: str) -> str:
+    import tidytcells as tt
+
+    gene, _, allele = str(symbol).partition("*")
+
+    if allele:
+        return f"{gene}*{int(allele):02d}" if allele.isdigit() else symbol
+
+    functional_alleles = tt.tr.query(
+        species=species,
+        contains_pattern=gene,
+        precision="allele",
+        functionality="F",
+    )
+    allele_nums = [
+        int(allele_symbol.split("*")[1])
+        for allele_symbol in functional_alleles
+        if allele_symbol.split("*")[0] == gene
+    ]
+
+    if not allele_nums:
+        return symbol
+
+    return f"{gene}*{min(allele_nums):02d}"
+
+
+def deduplicate_tcr_keys(
+    keys: List[Tuple[Optional[str], ...]],
+) -> Tuple[NDArray[np.int64], NDArray[np.int64]]:
+    """
+    Collapse identical TCR keys. Returns the positions of the first occurrence
+    of each distinct key (in order of first occurrence), and an inverse index
+    mapping each input position to its distinct key.
+    """
+    key_to_unique_idx = {}
+    inverse = np.fromiter(
+        (key_to_unique_idx.setdefault(key, len(key_to_unique_idx)) for key in keys),
+        dtype=np.int64,
+        count=len(keys),
+    )
+    _, first_positions = np.unique(inverse, return_index=True)
+    return first_positions, inverse
@@ -0,0 +1,105 @@
+import json
+from libtcrlm.bert import Bert
+import os
+import torch
+from torch import FloatTensor, LongTensor
+from torch.nn import Module
+from typing import Tuple, Union
+
+
+FORMAT_VERSION = 1
+
+# Dynamic shapes and saving extra files alongside exported programs need at
+# least this version of torch
+MIN_TORCH_VERSION = (2, 2)
+
+_METADATA_FILENAME = "sceptr_metadata.json"
+
+
+class VectorRepresentationGraph(Module):
+    """
+    Wraps the vector representation forward pass of a model, so that it can be
+    captured as a single graph. Token embeddings are cast to `compute_dtype`
+    before the self-attention stack, and representations are returned in
+    float32.
+    """
+
+    def __init__(self, bert: Bert, compute_dtype: torch.dtype) -> None:
+        super().__init__()
+        self.bert = bert
+        self.compute_dtype = compute_dtype
+
+    def forward(self, tokenised_tcrs: LongTensor) -> FloatTensor:
+        raw_token_embeddings = self.bert._embed(tokenised_tcrs).to(self.compute_dtype)
+        padding_mask = self.bert._get_padding_mask(tokenised_tcrs)
+        representations = (
+            self.bert._vector_representation_delegate.get_vector_representations_of(
+                raw_token_embeddings, padding_mask
+            )
+        )
+        return representations.float()
+
+
+def export_inference_graph(
+    path: Union[str, os.PathLike],
+    bert: Bert,
+    compute_dtype: torch.dtype,
+    example_batch: LongTensor,
+    metadata: dict,
+) -> None:
+    """
+    Capture the vector representation forward pass of `bert` with
+    torch.export, keeping the batch and sequence length dimensions of its
+    input dynamic, and save it to `path` along with `metadata`.
+    """
+    check_torch_version()
+    from torch.export import Dim, export
+
+    graph = VectorRepresentationGraph(bert, compute_dtype).eval()
+
+    with torch.no_grad():
+        exported_program = export(
+            graph,
+            (example_batch,),
+            dynamic_shapes={
+                "tokenised_tcrs": {0: Dim("batch"), 1: Dim("sequence_length")}
+            },
+        )
+
+    metadata = {"format_version": FORMAT_VERSION, **metadata}
+    torch.export.save(
+        exported_program,
+        path,
+        extra_files={_METADATA_FILENAME: json.dumps(metadata)},
+    )
+
+
+def load_inference_graph(path: Union[str, os.PathLike]) -> Tuple[Module, dict]:
+    """
+    Load a graph saved by `export_inference_graph`, returning it as a callable
+    module along with its metadata.
+    """
+    check_torch_version()
+    extra_files = {_METADATA_FILENAME: ""}
+    exported_program = torch.export.load(path, extra_files=extra_files)
+
+    if not extra_files[_METADATA_FILENAME]:
+        raise ValueError(f"{path} is not a SCEPTR inference graph.")
+
+    metadata = json.loads(extra_files[_METADATA_FILENAME])
+
+    if metadata["format_version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported inference graph format version: {metadata['format_version']}."
+        )
+
+    return exported_program.module(), metadata
+
+
+def check_torch_version() -> None:
+    torch_version = tuple(int(part) for part in torch.__version__.split(".")[:2])
+
+    if torch_version < MIN_TORCH_VERSION:
+        raise RuntimeError(
+            f"Exporting and loading inference graphs requires torch {'.'.join(map(str, MIN_TORCH_VERSION))} or later, but torch {torch.__version__} is installed."
+        )
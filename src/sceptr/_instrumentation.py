@@ -0,0 +1,180 @@
+from contextlib import nullcontext
+import time
+import torch
+from typing import Callable, Dict, NamedTuple, Optional
+
+
+STAGES = ("parse", "tokenise", "pad", "transfer", "forward", "distance", "output")
+
+
+class StageStats(NamedTuple):
+    """
+    Accumulated timings of one pipeline stage.
+
+    Attributes
+    ----------
+    num_calls : int
+        Number of times the stage ran.
+    seconds : float
+        Total wall time spent in the stage.
+    """
+
+    num_calls: int
+    seconds: float
+
+
+class InstrumentationStats(NamedTuple):
+    """
+    Where a :py:class:`~sceptr.model.Sceptr` instance has spent its time since
+    instrumentation was enabled.
+
+    The pipeline stages are:
+
+    - ``parse``: reading TCRs from DataFrames into libtcrlm TCR objects
+    - ``tokenise``: converting TCRs into tokens
+    - ``pad``: assembling padded batches of tokens
+    - ``transfer``: moving batches to the compute device
+    - ``forward``: running the model
+    - ``distance``: computing distances between representations
+    - ``output``: converting results to numpy arrays
+
+    Attributes
+    ----------
+    stages : Dict[str, StageStats]
+        Call counts and total wall time for each pipeline stage.
+    num_rows : int
+        Number of TCRs parsed.
+    num_tokens : int
+        Number of tokens produced by tokenisation.
+    num_padding_tokens : int
+        Number of padding tokens added when assembling batches.
+    """
+
+    stages: Dict[str, StageStats]
+    num_rows: int
+    num_tokens: int
+    num_padding_tokens: int
+
+
+class StageEvent(NamedTuple):
+    """
+    A record of a single run of a pipeline stage, as passed to instrumentation
+    hooks.
+
+    Attributes
+    ----------
+    stage : str
+        The name of the stage (see
+        :py:class:`~sceptr.model.InstrumentationStats`).
+    seconds : float
+        Wall time spent in this run of the stage.
+    num_rows : int
+        Number of TCRs parsed during this run.
+    num_tokens : int
+        Number of tokens produced during this run.
+    num_padding_tokens : int
+        Number of padding tokens added during this run.
+    """
+
+    stage: str
+    seconds: float
+    num_rows: int
+    num_tokens: int
+    num_padding_tokens: int
+
+
+class StageCounters:
+    """
+    Counters that code running inside a stage can increment.
+    """
+
+    __slots__ = ("num_rows", "num_tokens", "num_padding_tokens")
+
+    def __init__(self) -> None:
+        self.num_rows = 0
+        self.num_tokens = 0
+        self.num_padding_tokens = 0
+
+
+# Returned in place of a timed stage when instrumentation is off. Counts written
+# to its counters are simply never read.
+DISABLED_STAGE = nullcontext(StageCounters())
+
+
+class Instrumentation:
+    """
+    Accumulates per-stage timings and counters, and passes a
+    :py:class:`StageEvent` to `hook` (if given) at the end of every stage.
+    """
+
+    def __init__(self, hook: Optional[Callable[[StageEvent], None]] = None) -> None:
+        self._hook = hook
+        self._num_calls = {stage: 0 for stage in STAGES}
+        self._seconds = {stage: 0.0 for stage in STAGES}
+        self._num_rows = 0
+        self._num_tokens = 0
+        self._num_padding_tokens = 0
+
+    def stage(self, name: str, device: torch.device) -> "_TimedStage":
+        return _TimedStage(self, name, device)
+
+    def get_stats(self) -> InstrumentationStats:
+        return InstrumentationStats(
+            stages={
+                stage: StageStats(self._num_calls[stage], self._seconds[stage])
+                for stage in STAGES
+            },
+            num_rows=self._num_rows,
+            num_tokens=self._num_tokens,
+            num_padding_tokens=self._num_padding_tokens,
+        )
+
+    def _record(self, name: str, seconds: float, counters: StageCounters) -> None:
+        self._num_calls[name] += 1
+        self._seconds[name] += seconds
+        self._num_rows += counters.num_rows
+        self._num_tokens += counters.num_tokens
+        self._num_padding_tokens += counters.num_padding_tokens
+
+        if self._hook is not None:
+            self._hook(
+                StageEvent(
+                    stage=name,
+                    seconds=seconds,
+                    num_rows=counters.num_rows,
+                    num_tokens=counters.num_tokens,
+                    num_padding_tokens=counters.num_padding_tokens,
+                )
+            )
+
+
+class _TimedStage:
+    """
+    Times the code in its context. CUDA kernels run asynchronously, so on CUDA
+    devices the device is synchronised on entry and exit for the wall time to
+    be attributed to the right stage.
+    """
+
+    __slots__ = ("_instrumentation", "_name", "_synchronise", "_counters", "_start")
+
+    def __init__(
+        self, instrumentation: Instrumentation, name: str, device: torch.device
+    ) -> None:
+        self._instrumentation = instrumentation
+        self._name = name
+        self._synchronise = device.type == "cuda"
+        self._counters = StageCounters()
+
+    def __enter__(self) -> StageCounters:
+        if self._synchronise:
+            torch.cuda.synchronize()
+
+        self._start = time.perf_counter()
+        return self._counters
+
+    def __exit__(self, *exc_info) -> None:
+        if self._synchronise:
+            torch.cuda.synchronize()
+
+        seconds = time.perf_counter() - self._start
+        self._instrumentation._record(self._name, seconds, self._counters)
@@ -0,0 +1,75 @@
+from libtcrlm.bert import Bert
+import torch
+from torch.nn import TransformerEncoderLayer
+
+
+# Scales the activation estimate up to cover allocator overhead and
+# temporaries that are not modelled explicitly
+SAFETY_FACTOR = 1.25
+
+TOKEN_INDEX_BYTES = 8
+
+
+class ActivationMemoryModel:
+    """
+    Estimates the peak memory needed to run a padded batch through a model,
+    from the model's shape. Without gradients, activations are freed layer by
+    layer, so the peak is set by the largest single layer: its input and
+    output, the query, key and value projections, the attention weights
+    (which grow with the square of the batch width) and the feed-forward
+    hidden layer.
+
+    Shapes are read from attributes that both float and dynamically quantised
+    layers have, so that quantised models can be estimated too.
+    """
+
+    def __init__(self, bert: Bert, compute_dtype: torch.dtype) -> None:
+        encoder_layers = [
+            module
+            for module in bert.modules()
+            if isinstance(module, TransformerEncoderLayer)
+        ]
+        first_layer = encoder_layers[0]
+        initial_projector = getattr(
+            bert._self_attention_stack, "_initial_projector", None
+        )
+
+        self.d_model = first_layer.linear1.in_features
+        self.num_heads = first_layer.self_attn.num_heads
+        self.d_feedforward = first_layer.linear1.out_features
+        self.d_embedding = getattr(initial_projector, "in_features", self.d_model)
+        self.element_size = max(
+            torch.empty(0, dtype=compute_dtype).element_size(),
+            torch.empty(0, dtype=torch.float32).element_size(),
+        )
+
+    def estimate_batch_bytes(self, num_rows: int, width: int) -> int:
+        per_token_elements = (
+            2 * self.d_embedding + 6 * self.d_model + self.d_feedforward
+        )
+        attention_elements = 2 * self.num_heads * width * width
+        activation_bytes = (
+            num_rows
+            * (width * per_token_elements + attention_elements)
+            * self.element_size
+        )
+        token_bytes = num_rows * width * 4 * TOKEN_INDEX_BYTES
+
+        return int(SAFETY_FACTOR * (activation_bytes + token_bytes))
+
+    def get_max_rows(self, width: int, memory_budget: float) -> int:
+        """
+        The largest number of rows of the given width whose estimated memory
+        use fits within `memory_budget` bytes, and at least one.
+        """
+        return max(1, int(memory_budget // self.estimate_batch_bytes(1, width)))
+
+
+def is_out_of_memory_error(error: BaseException) -> bool:
+    if isinstance(error, torch.cuda.OutOfMemoryError):
+        return True
+
+    message = str(error)
+    return isinstance(error, RuntimeError) and (
+        "out of memory" in message or "can't allocate memory" in message
+    )
@@ -1,16 +1,97 @@
 from importlib import resources
 import json
+from libtcrlm.bert import Bert
 from libtcrlm.config_reader import ConfigReader
+from libtcrlm.tokeniser import Tokeniser
 import logging
+import os
 import sceptr
+from sceptr._snapshot import load_snapshot as read_snapshot
 from sceptr.model import Sceptr
+import threading
 import torch
+from typing import Dict, List, NamedTuple, Optional, Union
 
 
 logger = logging.getLogger(__name__)
 
 
+class LoadedVariant(NamedTuple):
+    name: str
+    tokeniser: Tokeniser
+    bert: Bert
+
+
+_LOADED_VARIANTS: Dict[str, LoadedVariant] = {}
+_LOADED_VARIANTS_LOCK = threading.Lock()
+
+
 def load_variant(model_name: str) -> Sceptr:
+    """
+    Return a new `Sceptr` instance of the named variant. The tokeniser and
+    weights of each variant are loaded once per process and shared, read-only,
+    by every instance of that variant until it is evicted with
+    `evict_variants`.
+    """
+    with _LOADED_VARIANTS_LOCK:
+        loaded_variant = _LOADED_VARIANTS.get(model_name)
+
+        if loaded_variant is None:
+            loaded_variant = _read_variant(model_name)
+            _LOADED_VARIANTS[model_name] = loaded_variant
+
+    model = Sceptr(
+        name=loaded_variant.name,
+        tokeniser=loaded_variant.tokeniser,
+        bert=loaded_variant.bert,
+    )
+
+    if sceptr._USE_HARDWARE_ACCELERATION:
+        model.enable_hardware_acceleration()
+
+    return model
+
+
+def load_snapshot(path: Union[str, os.PathLike]) -> Sceptr:
+    logger.debug(f"Loading SCEPTR snapshot: {path}")
+
+    snapshot = read_snapshot(path)
+    model = Sceptr(name=snapshot.name, tokeniser=snapshot.tokeniser, bert=snapshot.bert)
+    model._germline_cdr_tables = snapshot.germline_cdr_tables
+
+    if sceptr._USE_HARDWARE_ACCELERATION:
+        model.enable_hardware_acceleration()
+
+    return model
+
+
+def evict_variants(name: Optional[str] = None) -> List[str]:
+    """
+    Drop loaded variants from the process-wide registry, so that their weights
+    can be freed once no `Sceptr` instance refers to them any more. If `name`
+    is given, only the variant with that model name is evicted. Returns the
+    names of the evicted variants.
+    """
+    with _LOADED_VARIANTS_LOCK:
+        evicted = [
+            model_name
+            for model_name, loaded_variant in _LOADED_VARIANTS.items()
+            if name is None or loaded_variant.name == name
+        ]
+        evicted_names = [
+            _LOADED_VARIANTS.pop(model_name).name for model_name in evicted
+        ]
+
+    logger.debug(f"Evicted SCEPTR variants: {evicted_names}")
+    return evicted_names
+
+
+def get_loaded_variant_names() -> List[str]:
+    with _LOADED_VARIANTS_LOCK:
+        return [loaded_variant.name for loaded_variant in _LOADED_VARIANTS.values()]
+
+
+def _read_variant(model_name: str) -> LoadedVariant:
     logger.debug(f"Loading SCEPTR variant: {model_name}")
 
     model_save_dir = resources.files(__name__) / model_name
@@ -18,19 +99,18 @@ def load_variant(model_name: str) -> Sceptr:
     with (model_save_dir / "config.json").open("r") as f:
         config = json.load(f)
 
-    with (model_save_dir / "state_dict.pt").open("rb") as f:
-        state_dict = torch.load(f, weights_only=True)
+    # Memory mapping the weights lets processes forked after loading share
+    # their pages rather than each holding a copy. Loading with mmap and
+    # assign needs torch 2.1 or later, which is the declared minimum.
+    with resources.as_file(model_save_dir / "state_dict.pt") as state_dict_path:
+        state_dict = torch.load(state_dict_path, mmap=True, weights_only=True)
 
     config_reader = ConfigReader(config)
 
     name = config_reader.get_model_name()
     tokeniser = config_reader.get_tokeniser()
     bert = config_reader.get_bert()
-    bert.load_state_dict(state_dict)
+    bert.load_state_dict(state_dict, assign=True)
+    bert.requires_grad_(False)
 
-    model = Sceptr(name=name, tokeniser=tokeniser, bert=bert)
-
-    if sceptr._USE_HARDWARE_ACCELERATION:
-        model.enable_hardware_acceleration()
-
-    return model
+    return LoadedVariant(name=name, tokeniser=tokeniser, bert=bert.eval())
@@ -0,0 +1,109 @@
+import torch
+from torch import FloatTensor, LongTensor
+
+
+ANCHOR_BLOCK_SIZE = 256
+
+
+def count_neighbours(
+    anchor_representations: FloatTensor,
+    comparison_representations: FloatTensor,
+    comparison_weights: torch.Tensor,
+    radii: FloatTensor,
+    max_block_elements: int,
+    exclude_self: bool = False,
+) -> torch.Tensor:
+    """
+    For each anchor, count the comparisons within each of the `radii` of it,
+    weighting each comparison by `comparison_weights`. If `exclude_self` is
+    set, anchors and comparisons must be the same, and no anchor is counted as
+    its own neighbour. Returns float64 counts of shape (num_anchors,
+    num_radii).
+
+    Representations are projected onto their first principal component. As
+    the projection cannot lengthen distances, a comparison whose projection
+    lies further than the largest radius from an anchor's cannot be its
+    neighbour. Comparisons are sorted by their projection and anchors are
+    processed in blocks of similar projection, so that the comparisons each
+    block needs to be checked against form a contiguous window. Distances are
+    computed for the window only, a chunk of at most `max_block_elements`
+    distances at a time. Blocks are processed one after another, each
+    distance computation being parallelised by torch itself.
+    """
+    num_anchors = len(anchor_representations)
+    counts = torch.zeros(
+        (num_anchors, len(radii)),
+        dtype=torch.float64,
+        device=anchor_representations.device,
+    )
+
+    if num_anchors == 0 or len(comparison_representations) == 0:
+        return counts
+
+    direction = get_principal_direction(comparison_representations)
+    comparison_keys = comparison_representations @ direction
+    comparison_order = torch.argsort(comparison_keys, stable=True)
+    comparison_keys = comparison_keys[comparison_order]
+    comparison_representations = comparison_representations[comparison_order]
+    comparison_weights = comparison_weights[comparison_order].float()
+
+    if exclude_self:
+        anchor_keys = comparison_keys
+        anchor_order = torch.arange(num_anchors, device=counts.device)
+        anchor_representations = comparison_representations
+    else:
+        anchor_keys = anchor_representations @ direction
+        anchor_order = torch.argsort(anchor_keys)
+
+    max_radius = radii.max().item()
+    chunk_size = max(1, max_block_elements // ANCHOR_BLOCK_SIZE)
+
+    for block in torch.split(anchor_order, ANCHOR_BLOCK_SIZE):
+        block_keys = anchor_keys[block]
+        window_start = torch.searchsorted(
+            comparison_keys, block_keys.min() - max_radius
+        ).item()
+        window_stop = torch.searchsorted(
+            comparison_keys, block_keys.max() + max_radius, right=True
+        ).item()
+        block_counts = torch.zeros_like(counts[block])
+
+        for chunk_start in range(window_start, window_stop, chunk_size):
+            chunk = slice(chunk_start, min(chunk_start + chunk_size, window_stop))
+            distances = torch.cdist(
+                anchor_representations[block], comparison_representations[chunk], p=2
+            )
+
+            if exclude_self:
+                _mask_self_distances(distances, block, chunk)
+
+            for radius_idx, radius in enumerate(radii):
+                block_counts[:, radius_idx] += (distances <= radius).float() @ (
+                    comparison_weights[chunk]
+                )
+
+        if exclude_self:
+            counts[comparison_order[block]] = block_counts
+        else:
+            counts[block] = block_counts
+
+    return counts
+
+
+def get_principal_direction(representations: FloatTensor) -> FloatTensor:
+    centred = representations - representations.mean(dim=0)
+    _, eigenvectors = torch.linalg.eigh(centred.T @ centred)
+    return eigenvectors[:, -1]
+
+
+def _mask_self_distances(
+    distances: FloatTensor, block: LongTensor, chunk: slice
+) -> None:
+    """
+    Set the distances between each anchor in `block` and itself to infinity,
+    where the anchors are the comparisons and `block` holds their positions.
+    """
+    columns = block - chunk.start
+    is_in_chunk = (columns >= 0) & (columns < distances.shape[1])
+    rows = torch.arange(len(block), device=distances.device)
+    distances[rows[is_in_chunk], columns[is_in_chunk]] = torch.inf
@@ -0,0 +1,143 @@
+from concurrent.futures import ProcessPoolExecutor, wait
+import libtcrlm
+from libtcrlm import schema
+import math
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from pandas import DataFrame
+from sceptr._quantisation import quantise_linear_layers
+import torch
+from torch import FloatTensor
+from typing import TYPE_CHECKING, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from sceptr.model import Sceptr
+
+
+CHUNKS_PER_WORKER = 4
+
+_WORKER_MODEL: Optional["Sceptr"] = None
+
+
+class InferencePool:
+    """
+    A pool of worker processes, each holding its own copy of a model, which
+    compute TCR representations in parallel on the CPU. Workers write their
+    results straight into a shared memory block, so representations are never
+    pickled back to the parent process. If `quantised_layers` is given, each
+    worker quantises those layers of its float copy of the model.
+    """
+
+    def __init__(
+        self,
+        model: "Sceptr",
+        num_workers: int,
+        num_threads_per_worker: int,
+        quantised_layers: Optional[Sequence[str]] = None,
+    ) -> None:
+        self.num_workers = num_workers
+        self._d_model = model._bert.d_model
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initialise_worker,
+            initargs=(model, num_threads_per_worker, quantised_layers),
+        )
+
+    def calc_representations(
+        self,
+        instances: DataFrame,
+        batch_size: int,
+        token_budget: Optional[int],
+        memory_budget: Optional[int] = None,
+    ) -> FloatTensor:
+        num_instances = len(instances)
+        shape = (num_instances, self._d_model)
+        shared_memory = SharedMemory(create=True, size=max(1, math.prod(shape) * 4))
+
+        try:
+            chunk_size = self._get_chunk_size(num_instances, batch_size)
+            futures = [
+                self._executor.submit(
+                    _calc_representations_in_worker,
+                    instances.iloc[idx : idx + chunk_size],
+                    schema.tcr.SPECIES,
+                    batch_size,
+                    token_budget,
+                    memory_budget,
+                    shared_memory.name,
+                    shape,
+                    idx,
+                )
+                for idx in range(0, num_instances, chunk_size)
+            ]
+
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                raise
+
+            output = np.ndarray(shape, dtype=np.float32, buffer=shared_memory.buf)
+            return torch.from_numpy(output.copy())
+
+        finally:
+            shared_memory.close()
+            shared_memory.unlink()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_chunk_size(self, num_instances: int, batch_size: int) -> int:
+        target_chunk_size = math.ceil(
+            num_instances / (self.num_workers * CHUNKS_PER_WORKER)
+        )
+        num_batches_per_chunk = max(1, math.ceil(target_chunk_size / batch_size))
+        return num_batches_per_chunk * batch_size
+
+
+def _initialise_worker(
+    model: "Sceptr", num_threads: int, quantised_layers: Optional[Sequence[str]]
+) -> None:
+    global _WORKER_MODEL
+
+    torch.set_num_threads(num_threads)
+
+    if quantised_layers is not None:
+        model._float_bert = model._bert
+        model._bert = quantise_linear_layers(model._bert, quantised_layers)
+        model._is_quantised = True
+        model._quantised_layers = tuple(quantised_layers)
+
+    _WORKER_MODEL = model
+
+
+def _calc_representations_in_worker(
+    instances: DataFrame,
+    species: str,
+    batch_size: int,
+    token_budget: Optional[int],
+    memory_budget: Optional[int],
+    shared_memory_name: str,
+    shape: Tuple[int, int],
+    row_offset: int,
+) -> None:
+    if schema.tcr.SPECIES != species:
+        libtcrlm.setup(species)
+
+    _WORKER_MODEL._batch_size = batch_size
+    _WORKER_MODEL._token_budget = token_budget
+    _WORKER_MODEL._memory_budget = memory_budget
+    representations = _WORKER_MODEL._calc_uncached_torch_representations(instances)
+
+    shared_memory = SharedMemory(name=shared_memory_name)
+    try:
+        output = np.ndarray(shape, dtype=np.float32, buffer=shared_memory.buf)
+        output[row_offset : row_offset + len(instances)] = representations.numpy()
+        del output
+    finally:
+        shared_memory.close()
@@ -0,0 +1,251 @@
+import copy
+from libtcrlm.bert import Bert
+import numpy as np
+from numpy.typing import NDArray
+import torch
+from torch import Tensor
+from torch.ao.quantization import per_channel_dynamic_qconfig, quantize_dynamic
+from torch.nn import (
+    Linear,
+    Module,
+    MultiheadAttention,
+    TransformerEncoder,
+    TransformerEncoderLayer,
+)
+from torch.nn import functional as F
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+import warnings
+
+
+class QuantisationReport(NamedTuple):
+    """
+    How far the vector representations produced by a quantised model variant
+    deviate from those of the original float32 variant, measured over a
+    bundled reference set of TCRs.
+
+    Attributes
+    ----------
+    max_l2_deviation : float
+        The largest L2 distance between the quantised and float32
+        representations of any reference TCR.
+    mean_l2_deviation : float
+        The mean L2 distance between the quantised and float32
+        representations over all reference TCRs.
+    num_reference_tcrs : int
+        The number of TCRs in the reference set.
+    quantised_layers : Tuple[str, ...]
+        The names of the linear layers running with int8 weights.
+    float_layers : Tuple[str, ...]
+        The names of the linear layers kept in float32, because quantising
+        them was found to shift the representations by more than the
+        tolerance.
+    """
+
+    max_l2_deviation: float
+    mean_l2_deviation: float
+    num_reference_tcrs: int
+    quantised_layers: Tuple[str, ...]
+    float_layers: Tuple[str, ...]
+
+
+def calc_quantised_bert(
+    bert: Bert,
+    tolerance: float,
+    calc_reference_representations: Callable[[Bert], NDArray[np.float32]],
+) -> Tuple[Bert, QuantisationReport]:
+    """
+    Quantise the linear layers of the self-attention stack of `bert` to int8,
+    keeping in float32 any layer which, when quantised on its own, moves the
+    reference representations by more than `tolerance` in mean L2 distance.
+    The original model is left untouched.
+    """
+    float_representations = calc_reference_representations(bert)
+    quantised_layers = []
+    float_layers = []
+
+    for layer_name in get_linear_layer_names(bert):
+        representations = calc_reference_representations(
+            quantise_linear_layers(bert, [layer_name])
+        )
+        l2_deviations = _calc_l2_deviations(representations, float_representations)
+
+        if l2_deviations.mean() <= tolerance:
+            quantised_layers.append(layer_name)
+        else:
+            float_layers.append(layer_name)
+
+    quantised_bert = quantise_linear_layers(bert, quantised_layers)
+    l2_deviations = _calc_l2_deviations(
+        calc_reference_representations(quantised_bert), float_representations
+    )
+    report = QuantisationReport(
+        max_l2_deviation=float(l2_deviations.max()),
+        mean_l2_deviation=float(l2_deviations.mean()),
+        num_reference_tcrs=len(l2_deviations),
+        quantised_layers=tuple(quantised_layers),
+        float_layers=tuple(float_layers),
+    )
+
+    return quantised_bert, report
+
+
+def get_linear_layer_names(bert: Bert) -> List[str]:
+    """
+    List the linear layers of the self-attention stack that can be dynamically
+    quantised. torch's multi-head attention modules read their input and
+    output projection weights directly, so they are replaced by
+    `_SelfAttention` modules in quantised copies, and their projections are
+    listed under the names they have there.
+    """
+    layer_names = []
+
+    for name, module in bert._self_attention_stack.named_modules():
+        if type(module) is Linear:
+            layer_names.append(name)
+        elif isinstance(module, MultiheadAttention):
+            layer_names.extend((f"{name}.in_proj", f"{name}.out_proj"))
+
+    return layer_names
+
+
+def quantise_linear_layers(bert: Bert, layer_names: Iterable[str]) -> Bert:
+    """
+    Return a copy of `bert` where the named linear layers of the
+    self-attention stack hold int8 weights and run with dynamically quantised
+    activations.
+
+    The self-attention stack is quantised in place, as the vector
+    representation delegate of `bert` holds its own reference to it. The fused
+    fast path of torch's transformer layers and torch's multi-head attention
+    read linear layer weights directly, so the quantised copy runs the
+    unfused layer forward with `_SelfAttention` in place of multi-head
+    attention.
+    """
+    quantised_bert = copy.deepcopy(bert).to("cpu")
+
+    for module in quantised_bert.modules():
+        if isinstance(module, TransformerEncoder):
+            module.use_nested_tensor = False
+        elif isinstance(module, TransformerEncoderLayer):
+            module.__class__ = _UnfusedTransformerEncoderLayer
+            module.self_attn = _SelfAttention(module.self_attn)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        quantize_dynamic(
+            quantised_bert._self_attention_stack,
+            {layer_name: per_channel_dynamic_qconfig for layer_name in layer_names},
+            dtype=torch.qint8,
+            inplace=True,
+        )
+
+    return quantised_bert.eval()
+
+
+class _UnfusedTransformerEncoderLayer(TransformerEncoderLayer):
+    def forward(
+        self,
+        src: Tensor,
+        src_mask: Optional[Tensor] = None,
+        src_key_padding_mask: Optional[Tensor] = None,
+        is_causal: bool = False,
+    ) -> Tensor:
+        x = src
+
+        if self.norm_first:
+            x = x + self._sa_block(
+                self.norm1(x), src_mask, src_key_padding_mask, is_causal=is_causal
+            )
+            x = x + self._ff_block(self.norm2(x))
+        else:
+            x = self.norm1(
+                x
+                + self._sa_block(x, src_mask, src_key_padding_mask, is_causal=is_causal)
+            )
+            x = self.norm2(x + self._ff_block(x))
+
+        return x
+
+
+class _SelfAttention(Module):
+    """
+    Multi-head self-attention computing the same function as a given torch
+    `MultiheadAttention` module, with its input and output projections held
+    as plain linear layers so that they can be dynamically quantised.
+    """
+
+    def __init__(self, attention: MultiheadAttention) -> None:
+        super().__init__()
+        embed_dim = attention.embed_dim
+        has_bias = attention.in_proj_bias is not None
+
+        self.embed_dim = embed_dim
+        self.num_heads = attention.num_heads
+        self.batch_first = attention.batch_first
+        self.dropout = attention.dropout
+
+        self.in_proj = Linear(embed_dim, 3 * embed_dim, bias=has_bias)
+        self.in_proj.weight = attention.in_proj_weight
+        self.in_proj.bias = attention.in_proj_bias
+
+        self.out_proj = Linear(embed_dim, embed_dim, bias=has_bias)
+        self.out_proj.weight = attention.out_proj.weight
+        self.out_proj.bias = attention.out_proj.bias
+
+    def forward(
+        self,
+        query: Tensor,
+        key: Tensor,
+        value: Tensor,
+        key_padding_mask: Optional[Tensor] = None,
+        need_weights: bool = False,
+        attn_mask: Optional[Tensor] = None,
+        is_causal: bool = False,
+    ) -> Tuple[Tensor, None]:
+        x = query if self.batch_first else query.transpose(0, 1)
+        batch_size, num_tokens, embed_dim = x.shape
+        head_dim = embed_dim // self.num_heads
+
+        q, k, v = (
+            projection.view(batch_size, num_tokens, self.num_heads, head_dim).transpose(
+                1, 2
+            )
+            for projection in self.in_proj(x).chunk(3, dim=-1)
+        )
+
+        mask = None
+        if attn_mask is not None:
+            mask = _to_additive_mask(attn_mask, q.dtype)
+        if key_padding_mask is not None:
+            padding_mask = _to_additive_mask(key_padding_mask, q.dtype)[:, None, None]
+            mask = padding_mask if mask is None else mask + padding_mask
+
+        attended = F.scaled_dot_product_attention(
+            q,
+            k,
+            v,
+            attn_mask=mask,
+            dropout_p=self.dropout if self.training else 0.0,
+            is_causal=is_causal and mask is None,
+        )
+        output = self.out_proj(
+            attended.transpose(1, 2).reshape(batch_size, num_tokens, embed_dim)
+        )
+
+        if not self.batch_first:
+            output = output.transpose(0, 1)
+
+        return output, None
+
+
+def _to_additive_mask(mask: Tensor, dtype: torch.dtype) -> Tensor:
+    if mask.dtype == torch.bool:
+        return torch.zeros(mask.shape, dtype=dtype).masked_fill(mask, -torch.inf)
+
+    return mask.to(dtype)
+
+
+def _calc_l2_deviations(
+    representations: NDArray[np.float32], float_representations: NDArray[np.float32]
+) -> NDArray[np.float32]:
+    return np.linalg.norm(representations - float_representations, axis=1)
@@ -0,0 +1,15 @@
+from importlib import resources
+import pandas as pd
+from pandas import DataFrame
+
+
+def load_reference_tcrs() -> DataFrame:
+    """
+    Load the bundled set of synthetic human TCRs used as a fixed reference
+    when measuring how far approximate inference modes drift from full
+    precision inference. The TCRs were generated by the benchmark suite's
+    synthetic repertoire generator, so they carry functional V and J alleles
+    and CDR3s assembled from their germline ends.
+    """
+    with (resources.files(__name__) / "reference_tcrs.csv").open("r") as f:
+        return pd.read_csv(f)
@@ -0,0 +1,48 @@
+from libtcrlm.bert import Bert
+from libtcrlm.tokeniser import Tokeniser
+import os
+from sceptr._tokenisation import GermlineCdrTable
+import torch
+from typing import Dict, NamedTuple, Union
+
+
+FORMAT_VERSION = 1
+
+
+class Snapshot(NamedTuple):
+    name: str
+    tokeniser: Tokeniser
+    bert: Bert
+    germline_cdr_tables: Dict[str, GermlineCdrTable]
+
+
+def save_snapshot(path: Union[str, os.PathLike], snapshot: Snapshot) -> None:
+    """
+    Pickle a fully built model into a single file. The modules are stored as
+    they are, so that loading them neither parses a config nor runs their
+    constructors, and the weights are read straight into their final tensors.
+    """
+    torch.save({"format_version": FORMAT_VERSION, **snapshot._asdict()}, path)
+
+
+def load_snapshot(path: Union[str, os.PathLike]) -> Snapshot:
+    """
+    Load a model saved by `save_snapshot` onto the CPU. The weights are memory
+    mapped rather than copied into freshly allocated memory, which needs torch
+    2.1 or later.
+
+    The whole file is unpickled, so loading it can run arbitrary code. Only
+    snapshots from a trusted source, such as ones saved by the caller, may be
+    passed in.
+    """
+    contents = torch.load(path, map_location="cpu", mmap=True, weights_only=False)
+
+    if not isinstance(contents, dict) or "format_version" not in contents:
+        raise ValueError(f"{path} is not a SCEPTR snapshot.")
+
+    if contents["format_version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported snapshot format version: {contents['format_version']}."
+        )
+
+    return Snapshot(**{field: contents[field] for field in Snapshot._fields})
@@ -0,0 +1,278 @@
+from enum import Enum
+from libtcrlm import schema
+from libtcrlm.schema.tcr import Tcr, Tcrv
+from libtcrlm.tokeniser import (
+    Tokeniser,
+    CdrTokeniser,
+    AlphaCdrTokeniser,
+    BetaCdrTokeniser,
+    Cdr3Tokeniser,
+    BetaCdr3Tokeniser,
+)
+from libtcrlm.tokeniser.token_indices import (
+    AminoAcidTokenIndex,
+    CdrCompartmentIndex,
+    Cdr3CompartmentIndex,
+    SingleChainCdrCompartmentIndex,
+)
+import numpy as np
+from numpy.typing import NDArray
+from sceptr._batching import TokenisedTcrs
+import tidytcells as tt
+import torch
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+
+class Segment(Enum):
+    CDR1A = "CDR1A"
+    CDR2A = "CDR2A"
+    CDR3A = "CDR3A"
+    CDR1B = "CDR1B"
+    CDR2B = "CDR2B"
+    CDR3B = "CDR3B"
+
+
+class TokenisationScheme(NamedTuple):
+    """
+    Describes how a libtcrlm tokeniser lays out a TCR: which sequences it
+    reads in which order, the compartment index it gives each, whether it
+    drops null (``*``) residues, and the message it raises for empty TCRs.
+    """
+
+    segments: Sequence[Segment]
+    compartment_indices: Optional[Sequence[int]]
+    drops_null_tokens: bool
+    empty_tcr_message: str
+
+
+TOKENISATION_SCHEMES = {
+    CdrTokeniser: TokenisationScheme(
+        segments=(
+            Segment.CDR1A,
+            Segment.CDR2A,
+            Segment.CDR3A,
+            Segment.CDR1B,
+            Segment.CDR2B,
+            Segment.CDR3B,
+        ),
+        compartment_indices=(
+            CdrCompartmentIndex.CDR1A,
+            CdrCompartmentIndex.CDR2A,
+            CdrCompartmentIndex.CDR3A,
+            CdrCompartmentIndex.CDR1B,
+            CdrCompartmentIndex.CDR2B,
+            CdrCompartmentIndex.CDR3B,
+        ),
+        drops_null_tokens=True,
+        empty_tcr_message="tcr {} does not contain any TCR information",
+    ),
+    AlphaCdrTokeniser: TokenisationScheme(
+        segments=(Segment.CDR1A, Segment.CDR2A, Segment.CDR3A),
+        compartment_indices=(
+            SingleChainCdrCompartmentIndex.CDR1,
+            SingleChainCdrCompartmentIndex.CDR2,
+            SingleChainCdrCompartmentIndex.CDR3,
+        ),
+        drops_null_tokens=True,
+        empty_tcr_message="tcr {} does not contain any TRA information",
+    ),
+    BetaCdrTokeniser: TokenisationScheme(
+        segments=(Segment.CDR1B, Segment.CDR2B, Segment.CDR3B),
+        compartment_indices=(
+            SingleChainCdrCompartmentIndex.CDR1,
+            SingleChainCdrCompartmentIndex.CDR2,
+            SingleChainCdrCompartmentIndex.CDR3,
+        ),
+        drops_null_tokens=True,
+        empty_tcr_message="tcr {} does not contain any TRB information",
+    ),
+    Cdr3Tokeniser: TokenisationScheme(
+        segments=(Segment.CDR3A, Segment.CDR3B),
+        compartment_indices=(Cdr3CompartmentIndex.CDR3A, Cdr3CompartmentIndex.CDR3B),
+        drops_null_tokens=False,
+        empty_tcr_message="tcr {} does not contain any TCR information",
+    ),
+    BetaCdr3Tokeniser: TokenisationScheme(
+        segments=(Segment.CDR3B,),
+        compartment_indices=None,
+        drops_null_tokens=False,
+        empty_tcr_message="tcr {} does not contain beta junction information",
+    ),
+}
+
+
+class GermlineCdrTable:
+    """
+    The germline CDR1 and CDR2 sequences of V gene alleles for one species.
+    Each allele is looked up in the IMGT reference data the first time it is
+    seen, and the result is reused for every later TCR using that allele.
+    """
+
+    def __init__(self, species: str) -> None:
+        self.species = species
+        self._cdrs: Dict[Tuple[str, int], Tuple[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._cdrs)
+
+    def get_cdrs(self, tcrv: Tcrv) -> Tuple[Optional[str], Optional[str]]:
+        if tcrv.gene is None:
+            return (None, None)
+
+        key = (tcrv.gene.name, tcrv.allele_num)
+        cdrs = self._cdrs.get(key)
+
+        if cdrs is None:
+            cdrs = (tcrv.cdr1_sequence, tcrv.cdr2_sequence)
+            self._cdrs[key] = cdrs
+
+        return cdrs
+
+    def populate(self) -> None:
+        """
+        Look up every functional TRAV and TRBV allele of the species up front,
+        so that the table can be saved with a model and no lookups are needed
+        after it is loaded. SCEPTR must be set up for the table's species.
+        """
+        functional_alleles = tt.tr.query(
+            species=self.species,
+            contains_pattern="TR[AB]V",
+            functionality="F",
+            precision="allele",
+        )
+
+        for allele_symbol in functional_alleles:
+            gene_symbol, allele_num = allele_symbol.split("*")
+            gene_enum = (
+                schema.tcr.TravGene
+                if gene_symbol.startswith("TRAV")
+                else schema.tcr.TrbvGene
+            )
+
+            if gene_symbol in gene_enum.__members__:
+                self.get_cdrs(Tcrv(gene_enum[gene_symbol], int(allele_num)))
+
+
+def _get_token_lookup_table() -> NDArray[np.int64]:
+    lookup_table = np.full(256, -1, dtype=np.int64)
+    lookup_table[ord("*")] = AminoAcidTokenIndex.NULL
+
+    for token in AminoAcidTokenIndex:
+        if len(token.name) == 1:
+            lookup_table[ord(token.name)] = token.value
+
+    return lookup_table
+
+
+TOKEN_LOOKUP_TABLE = _get_token_lookup_table()
+
+
+def tokenise_tcrs(
+    tokeniser: Tokeniser,
+    tcrs: Sequence[Tcr],
+    germline_cdr_table: Optional[GermlineCdrTable] = None,
+) -> TokenisedTcrs:
+    """
+    Tokenise a collection of TCRs in one go. For the tokenisers in libtcrlm,
+    the amino acid sequences of each TCR are gathered column by column and
+    converted into a single flat token array using vectorised operations,
+    producing exactly the same tokens as calling `tokeniser.tokenise` on each
+    TCR. Other tokenisers fall back to tokenising TCR by TCR.
+
+    If `germline_cdr_table` is given, CDR1 and CDR2 sequences are read from it
+    rather than looked up afresh for every TCR. It must be the table for the
+    species SCEPTR is currently set up for.
+    """
+    tcrs = list(tcrs)
+    scheme = TOKENISATION_SCHEMES.get(type(tokeniser))
+
+    if scheme is None:
+        return TokenisedTcrs.from_tensors(tokeniser.tokenise(tcr) for tcr in tcrs)
+
+    if germline_cdr_table is None:
+        germline_cdr_table = GermlineCdrTable(schema.tcr.SPECIES)
+
+    segment_columns = _get_segment_columns(tcrs, scheme.segments, germline_cdr_table)
+    return tokenise_segment_columns(segment_columns, scheme, tcrs)
+
+
+def _get_segment_columns(
+    tcrs: List[Tcr], segments: Sequence[Segment], germline_cdr_table: GermlineCdrTable
+) -> List[List[Optional[str]]]:
+    columns = {}
+
+    if Segment.CDR1A in segments or Segment.CDR2A in segments:
+        alpha_cdrs = [germline_cdr_table.get_cdrs(tcr._trav) for tcr in tcrs]
+        columns[Segment.CDR1A] = [cdr1 for cdr1, _ in alpha_cdrs]
+        columns[Segment.CDR2A] = [cdr2 for _, cdr2 in alpha_cdrs]
+
+    if Segment.CDR1B in segments or Segment.CDR2B in segments:
+        beta_cdrs = [germline_cdr_table.get_cdrs(tcr._trbv) for tcr in tcrs]
+        columns[Segment.CDR1B] = [cdr1 for cdr1, _ in beta_cdrs]
+        columns[Segment.CDR2B] = [cdr2 for _, cdr2 in beta_cdrs]
+
+    columns[Segment.CDR3A] = [tcr.junction_a_sequence for tcr in tcrs]
+    columns[Segment.CDR3B] = [tcr.junction_b_sequence for tcr in tcrs]
+
+    return [columns[segment] for segment in segments]
+
+
+def tokenise_segment_columns(
+    segment_columns: List[List[Optional[str]]],
+    scheme: TokenisationScheme,
+    tcrs: Sequence[Tcr],
+) -> TokenisedTcrs:
+    num_tcrs = len(tcrs)
+    num_segments = len(segment_columns)
+
+    segments = [
+        "" if sequence is None else sequence
+        for tcr_segments in zip(*segment_columns)
+        for sequence in tcr_segments
+    ]
+    segment_lengths = np.fromiter(
+        (len(sequence) for sequence in segments), dtype=np.int64, count=len(segments)
+    )
+    characters = np.frombuffer("".join(segments).encode("ascii"), dtype=np.uint8)
+    token_indices = TOKEN_LOOKUP_TABLE[characters]
+
+    if np.any(token_indices == -1):
+        bad_character = chr(characters[np.argmax(token_indices == -1)])
+        raise KeyError(bad_character)
+
+    segment_starts = np.cumsum(segment_lengths) - segment_lengths
+    token_positions = (
+        np.arange(len(characters)) - np.repeat(segment_starts, segment_lengths) + 1
+    )
+    cdr_lengths = np.repeat(segment_lengths, segment_lengths)
+    tcr_indices = np.repeat(
+        np.arange(num_tcrs),
+        segment_lengths.reshape(num_tcrs, num_segments).sum(axis=1),
+    )
+
+    residue_columns = [token_indices, token_positions, cdr_lengths]
+    if scheme.compartment_indices is not None:
+        compartments = np.tile(np.asarray(scheme.compartment_indices), num_tcrs)
+        residue_columns.append(np.repeat(compartments, segment_lengths))
+
+    residue_tokens = np.stack(residue_columns, axis=1)
+
+    if scheme.drops_null_tokens:
+        is_not_null = token_indices != AminoAcidTokenIndex.NULL
+        residue_tokens = residue_tokens[is_not_null]
+        tcr_indices = tcr_indices[is_not_null]
+
+    num_residues_per_tcr = np.bincount(tcr_indices, minlength=num_tcrs)
+
+    if np.any(num_residues_per_tcr == 0):
+        empty_tcr = tcrs[int(np.argmax(num_residues_per_tcr == 0))]
+        raise RuntimeError(scheme.empty_tcr_message.format(empty_tcr))
+
+    lengths = num_residues_per_tcr + 1
+    offsets = np.cumsum(lengths) - lengths
+
+    tokens = np.zeros((int(lengths.sum()), residue_tokens.shape[1]), dtype=np.int64)
+    tokens[offsets, 0] = AminoAcidTokenIndex.CLS
+    tokens[np.arange(len(residue_tokens)) + tcr_indices + 1] = residue_tokens
+
+    return TokenisedTcrs(torch.from_numpy(tokens), lengths)
@@ -0,0 +1,533 @@
+"""
+Searching a large database of TCRs for the nearest neighbours of each of a
+handful of query TCRs does not need every query-database distance to be
+computed. This submodule provides :py:class:`~sceptr.index.SceptrIndex`, an
+approximate nearest-neighbour index over SCEPTR representations which only
+compares each query against the parts of the database closest to it.
+"""
+
+import json
+from libtcrlm import schema
+import numbers
+import numpy as np
+from numpy.typing import NDArray
+import os
+from pandas import DataFrame
+from pathlib import Path
+from sceptr.store import EmbeddingStore
+import torch
+from torch import FloatTensor, LongTensor
+from typing import TYPE_CHECKING, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from sceptr.model import Sceptr
+
+
+FORMAT_VERSION = 1
+NUM_PROBES_DEFAULT = 8
+NUM_KMEANS_ITERATIONS = 20
+NUM_TRAINING_SAMPLES_PER_LIST = 256
+# Largest number of distances computed at a time when comparing many TCRs
+# against the cluster centroids or the whole database
+SEARCH_TILE_ELEMENTS = 2**24
+
+_METADATA_FILENAME = "metadata.json"
+_CENTROIDS_FILENAME = "centroids.npy"
+_REPRESENTATIONS_FILENAME = "representations.npy"
+_POSITIONS_FILENAME = "positions.npy"
+_LIST_OFFSETS_FILENAME = "list_offsets.npy"
+
+
+class SceptrIndex:
+    """
+    An approximate nearest-neighbour index over the vector representations of
+    a database of TCRs, as produced by a particular SCEPTR model variant.
+
+    The index is an inverted file: the database representations are clustered
+    with k-means, and each representation is filed under its closest cluster
+    centroid. A query is compared exactly against the representations filed
+    under its :py:meth:`num_probes <sceptr.index.SceptrIndex.set_num_probes>`
+    closest centroids only. Probing more lists raises recall at the cost of
+    search time, and probing all of them gives the exact result. How close to
+    exact a given setting is can be measured with
+    :py:meth:`~sceptr.index.SceptrIndex.calc_recall`.
+
+    Distances are the same L2 distances as computed by
+    :py:meth:`~sceptr.model.Sceptr.calc_cdist_matrix`.
+
+    Attributes
+    ----------
+    model : :py:class:`~sceptr.model.Sceptr`
+        The model variant used to compute the representations of database and
+        query TCRs.
+
+    num_lists : int
+        The number of clusters the database is divided into.
+
+    num_probes : int
+        The number of clusters searched per query.
+
+    Examples
+    --------
+    >>> from sceptr import variant
+    >>> from sceptr.index import SceptrIndex
+    >>> model = variant.default()
+    >>> index = SceptrIndex.build(model, database_tcrs) # doctest: +SKIP
+    >>> indices, distances = index.search(query_tcrs, k=10) # doctest: +SKIP
+
+    Indices can be saved to and loaded from disk.
+
+    >>> index.save("database_index") # doctest: +SKIP
+    >>> index = SceptrIndex.load("database_index", model) # doctest: +SKIP
+    """
+
+    model: "Sceptr"
+    num_lists: int
+    num_probes: int
+
+    def __init__(
+        self,
+        model: "Sceptr",
+        centroids: FloatTensor,
+        representations: FloatTensor,
+        positions: LongTensor,
+        list_offsets: LongTensor,
+        num_probes: int = NUM_PROBES_DEFAULT,
+    ) -> None:
+        self.model = model
+        self.num_lists = len(centroids)
+        self._centroids = centroids
+        self._representations = representations
+        self._positions = positions
+        self._list_offsets = list_offsets
+        self.set_num_probes(num_probes)
+
+    @classmethod
+    def build(
+        cls,
+        model: "Sceptr",
+        instances: Union[DataFrame, EmbeddingStore],
+        num_lists: Optional[int] = None,
+        num_probes: int = NUM_PROBES_DEFAULT,
+        seed: int = 0,
+    ) -> "SceptrIndex":
+        """
+        Compute the representations of the TCRs in `instances` with `model`,
+        and index them.
+
+        Parameters
+        ----------
+        model : :py:class:`~sceptr.model.Sceptr`
+            The model variant used to compute representations.
+
+        instances : DataFrame or EmbeddingStore
+            DataFrame specifying the database TCRs. It must be in the
+            :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        num_lists : Optional[int]
+            The number of clusters to divide the database into. Defaults to
+            four times the square root of the number of database TCRs.
+
+        num_probes : int
+            The number of clusters to search per query. Defaults to 8.
+
+        seed : int
+            Seed for the random sampling and initialisation of k-means.
+
+        Returns
+        -------
+        :py:class:`~sceptr.index.SceptrIndex`
+        """
+        num_instances = len(instances)
+
+        if num_instances == 0:
+            raise ValueError("Cannot build an index over zero TCRs.")
+
+        if num_lists is None:
+            num_lists = int(4 * np.sqrt(num_instances))
+
+        if not isinstance(num_lists, int):
+            raise TypeError(f"num_lists must be an int. Got {type(num_lists)}.")
+
+        if num_lists < 1 or num_lists > num_instances:
+            raise ValueError(
+                f"num_lists must be between 1 and the number of TCRs ({num_instances}). Got {num_lists}."
+            )
+
+        representations = torch.from_numpy(
+            model.calc_vector_representations(instances).astype(np.float32)
+        )
+        generator = torch.Generator().manual_seed(seed)
+        centroids = _train_kmeans(representations, num_lists, generator)
+        assignments = _assign_to_nearest(representations, centroids)
+
+        positions = torch.argsort(assignments, stable=True)
+        list_sizes = torch.bincount(assignments, minlength=num_lists)
+        list_offsets = torch.zeros(num_lists + 1, dtype=torch.long)
+        list_offsets[1:] = torch.cumsum(list_sizes, dim=0)
+
+        return cls(
+            model,
+            centroids,
+            representations[positions].contiguous(),
+            positions,
+            list_offsets,
+            num_probes,
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike], model: "Sceptr") -> "SceptrIndex":
+        """
+        Load an index saved with :py:meth:`~sceptr.index.SceptrIndex.save`.
+        The indexed representations are memory mapped rather than read into
+        memory.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            The directory holding the index.
+
+        model : :py:class:`~sceptr.model.Sceptr`
+            The model variant used to build the index, which will be used to
+            compute the representations of query TCRs.
+
+        Returns
+        -------
+        :py:class:`~sceptr.index.SceptrIndex`
+
+        Raises
+        ------
+        ValueError
+            If the index was built with a different model variant, or for a
+            different species than SCEPTR is currently set up for.
+        """
+        path = Path(path)
+
+        with open(path / _METADATA_FILENAME, "r") as f:
+            metadata = json.load(f)
+
+        if metadata["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported index format version: {metadata['format_version']}."
+            )
+
+        if (
+            metadata["model_name"] != model.name
+            or metadata["dim"] != model._bert.d_model
+        ):
+            raise ValueError(
+                f"The index at {path} was built with {metadata['model_name']} (dim {metadata['dim']}), and cannot be used with {model.name} (dim {model._bert.d_model})."
+            )
+
+        if metadata["species"] != schema.tcr.SPECIES:
+            raise ValueError(
+                f"The index at {path} was built for {metadata['species']} TCRs, but SCEPTR is currently set up for {schema.tcr.SPECIES}."
+            )
+
+        def load_array(filename: str) -> torch.Tensor:
+            return torch.from_numpy(np.load(path / filename, mmap_mode="c"))
+
+        return cls(
+            model,
+            load_array(_CENTROIDS_FILENAME),
+            load_array(_REPRESENTATIONS_FILENAME),
+            load_array(_POSITIONS_FILENAME),
+            load_array(_LIST_OFFSETS_FILENAME),
+            metadata["num_probes"],
+        )
+
+    def __len__(self) -> int:
+        return len(self._representations)
+
+    def set_num_probes(self, num_probes: int) -> None:
+        """
+        Set the number of clusters searched per query. Higher values give
+        results closer to the exact nearest neighbours, but take longer.
+
+        Parameters
+        ----------
+        num_probes : int
+            Must be between 1 and
+            :py:attr:`~sceptr.index.SceptrIndex.num_lists`.
+        """
+        if not isinstance(num_probes, int):
+            raise TypeError(f"num_probes must be an int. Got {type(num_probes)}.")
+
+        if num_probes < 1 or num_probes > self.num_lists:
+            raise ValueError(
+                f"num_probes must be between 1 and the number of lists ({self.num_lists}). Got {num_probes}."
+            )
+
+        self.num_probes = num_probes
+
+    def save(self, path: Union[str, os.PathLike]) -> None:
+        """
+        Save the index to a new directory at `path`.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            The directory to save the index to. It must not already exist.
+        """
+        path = Path(path)
+        path.mkdir(parents=True)
+
+        np.save(path / _CENTROIDS_FILENAME, self._centroids.numpy())
+        np.save(path / _REPRESENTATIONS_FILENAME, self._representations.numpy())
+        np.save(path / _POSITIONS_FILENAME, self._positions.numpy())
+        np.save(path / _LIST_OFFSETS_FILENAME, self._list_offsets.numpy())
+
+        with open(path / _METADATA_FILENAME, "w") as f:
+            json.dump(
+                {
+                    "format_version": FORMAT_VERSION,
+                    "model_name": self.model.name,
+                    "dim": self.model._bert.d_model,
+                    "species": schema.tcr.SPECIES,
+                    "num_probes": self.num_probes,
+                },
+                f,
+                indent=4,
+            )
+
+    def search(
+        self, instances: Union[DataFrame, EmbeddingStore], k: int
+    ) -> Tuple[NDArray[np.int64], NDArray[np.float32]]:
+        """
+        For each query TCR in `instances`, find (approximately) the `k`
+        closest TCRs in the index.
+
+        Parameters
+        ----------
+        instances : DataFrame or EmbeddingStore
+            DataFrame specifying the query TCRs. It must be in the
+            :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        k : int
+            The number of nearest neighbours to find for each query.
+
+        Returns
+        -------
+        Tuple[NDArray[numpy.int64], NDArray[numpy.float32]]
+            A tuple of two 2D numpy ndarrays, both of shape :math:`(X, k)`
+            where :math:`X` is the number of TCRs in `instances`. The first
+            contains the (zero-based) positional indices of the nearest
+            neighbours of each query among the TCRs the index was built from,
+            and the second contains the corresponding distances. Neighbours
+            are sorted from nearest to furthest. If the searched clusters hold
+            fewer than `k` TCRs in total, the remaining slots are filled with
+            index -1 and distance infinity.
+        """
+        k = self._check_k(k)
+        query_representations = self._calc_query_representations(instances)
+        nn_indices, nn_distances = self._search(query_representations, k)
+        return nn_indices.numpy(), nn_distances.numpy()
+
+    def calc_recall(self, instances: Union[DataFrame, EmbeddingStore], k: int) -> float:
+        """
+        Measure how well :py:meth:`~sceptr.index.SceptrIndex.search` recovers
+        the exact `k` nearest neighbours of the query TCRs in `instances`, at
+        the current number of probes. The exact neighbours are found by
+        comparing every query against every indexed TCR.
+
+        Parameters
+        ----------
+        instances : DataFrame or EmbeddingStore
+            DataFrame specifying the query TCRs. It must be in the
+            :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        k : int
+            The number of nearest neighbours to consider.
+
+        Returns
+        -------
+        float
+            The recall@k: the fraction of exact `k` nearest neighbours found
+            by the approximate search, averaged over queries. Indexed TCRs
+            tied in distance with the `k`-th exact nearest neighbour count as
+            exact nearest neighbours.
+        """
+        k = self._check_k(k)
+        query_representations = self._calc_query_representations(instances)
+        _, approximate_distances = self._search(query_representations, k)
+        _, exact_distances = self._search_exhaustively(query_representations, k)
+
+        kth_exact_distances = exact_distances[:, -1:]
+        num_found = (approximate_distances <= kth_exact_distances).sum(dim=1)
+
+        return float(num_found.double().mean() / k)
+
+    def _check_k(self, k: int) -> int:
+        if not isinstance(k, numbers.Integral) or isinstance(k, bool):
+            raise TypeError(f"k must be an int. Got {type(k)}.")
+
+        if k < 1 or k > len(self):
+            raise ValueError(
+                f"k must be between 1 and the number of indexed TCRs ({len(self)}). Got {k}."
+            )
+
+        return int(k)
+
+    def _calc_query_representations(
+        self, instances: Union[DataFrame, EmbeddingStore]
+    ) -> FloatTensor:
+        return torch.from_numpy(
+            self.model.calc_vector_representations(instances).astype(np.float32)
+        )
+
+    def _search(
+        self, query_representations: FloatTensor, k: int
+    ) -> Tuple[LongTensor, FloatTensor]:
+        """
+        Search list by list rather than query by query: each probed list is
+        compared in one go against all the queries probing it, and the
+        running k nearest neighbours of those queries are updated.
+        """
+        num_queries = len(query_representations)
+        nn_distances = torch.full((num_queries, k), torch.inf)
+        nn_indices = torch.full((num_queries, k), -1, dtype=torch.long)
+
+        probed_list_ids = _find_nearest(
+            query_representations, self._centroids, self.num_probes
+        ).flatten()
+        order = torch.argsort(probed_list_ids, stable=True)
+        probing_queries = torch.div(order, self.num_probes, rounding_mode="floor")
+        probed_list_ids = probed_list_ids[order]
+        lists, num_queries_per_list = torch.unique_consecutive(
+            probed_list_ids, return_counts=True
+        )
+
+        query_offset = 0
+        for list_id, num_probing_queries in zip(
+            lists.tolist(), num_queries_per_list.tolist()
+        ):
+            queries = probing_queries[query_offset : query_offset + num_probing_queries]
+            query_offset += num_probing_queries
+
+            list_start = int(self._list_offsets[list_id])
+            list_end = int(self._list_offsets[list_id + 1])
+
+            if list_start == list_end:
+                continue
+
+            _update_nearest_neighbours(
+                nn_indices,
+                nn_distances,
+                queries,
+                torch.cdist(
+                    query_representations[queries],
+                    self._representations[list_start:list_end],
+                    p=2,
+                ),
+                self._positions[list_start:list_end],
+            )
+
+        return nn_indices, nn_distances
+
+    def _search_exhaustively(
+        self, query_representations: FloatTensor, k: int
+    ) -> Tuple[LongTensor, FloatTensor]:
+        num_queries = len(query_representations)
+        nn_distances = torch.full((num_queries, k), torch.inf)
+        nn_indices = torch.full((num_queries, k), -1, dtype=torch.long)
+        all_queries = torch.arange(num_queries)
+        tile_size = _get_tile_size(num_queries)
+
+        for idx in range(0, len(self), tile_size):
+            _update_nearest_neighbours(
+                nn_indices,
+                nn_distances,
+                all_queries,
+                torch.cdist(
+                    query_representations,
+                    self._representations[idx : idx + tile_size],
+                    p=2,
+                ),
+                self._positions[idx : idx + tile_size],
+            )
+
+        return nn_indices, nn_distances
+
+
+def _train_kmeans(
+    representations: FloatTensor, num_lists: int, generator: torch.Generator
+) -> FloatTensor:
+    num_samples = min(len(representations), num_lists * NUM_TRAINING_SAMPLES_PER_LIST)
+    sample = representations[
+        torch.randperm(len(representations), generator=generator)[:num_samples]
+    ]
+    centroids = sample[
+        torch.randperm(num_samples, generator=generator)[:num_lists]
+    ].clone()
+
+    for _ in range(NUM_KMEANS_ITERATIONS):
+        assignments = _assign_to_nearest(sample, centroids)
+        cluster_sizes = torch.bincount(assignments, minlength=num_lists)
+        cluster_sums = torch.zeros_like(centroids).index_add_(0, assignments, sample)
+
+        # Clusters left empty keep their previous centroid
+        is_populated = cluster_sizes > 0
+        centroids[is_populated] = cluster_sums[is_populated] / cluster_sizes[
+            is_populated
+        ].unsqueeze(1)
+
+    return centroids
+
+
+def _assign_to_nearest(
+    representations: FloatTensor, centroids: FloatTensor
+) -> LongTensor:
+    return _find_nearest(representations, centroids, 1).squeeze(1)
+
+
+def _find_nearest(
+    representations: FloatTensor, centroids: FloatTensor, num_nearest: int
+) -> LongTensor:
+    tile_size = _get_tile_size(len(centroids))
+    nearest = [
+        torch.topk(
+            torch.cdist(representations[idx : idx + tile_size], centroids, p=2),
+            num_nearest,
+            dim=1,
+            largest=False,
+        ).indices
+        for idx in range(0, len(representations), tile_size)
+    ]
+    return (
+        torch.concatenate(nearest)
+        if nearest
+        else torch.empty((0, num_nearest), dtype=torch.long)
+    )
+
+
+def _get_tile_size(num_columns: int) -> int:
+    """
+    The number of rows to compare against `num_columns` others at a time, so
+    that each tile of distances holds at most `SEARCH_TILE_ELEMENTS`.
+    """
+    return max(1, SEARCH_TILE_ELEMENTS // max(1, num_columns))
+
+
+def _update_nearest_neighbours(
+    nn_indices: LongTensor,
+    nn_distances: FloatTensor,
+    queries: LongTensor,
+    cdist_tile: FloatTensor,
+    tile_positions: LongTensor,
+) -> None:
+    k = nn_indices.shape[1]
+    candidate_distances = torch.concatenate((nn_distances[queries], cdist_tile), dim=1)
+    candidate_indices = torch.concatenate(
+        (nn_indices[queries], tile_positions.expand_as(cdist_tile)), dim=1
+    )
+
+    nn_distances[queries], top_k = torch.topk(
+        candidate_distances, k, dim=1, largest=False, sorted=True
+    )
+    nn_indices[queries] = torch.gather(candidate_indices, 1, top_k)
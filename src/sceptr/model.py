@@ -1,17 +1,67 @@
 from libtcrlm.bert import Bert
 from libtcrlm.tokeniser import Tokeniser, CdrTokeniser
-from libtcrlm.tokeniser.token_indices import DefaultTokenIndex
+import libtcrlm
 from libtcrlm import schema
+import copy
 import logging
+import numbers
 import numpy as np
 from numpy.typing import NDArray
-from pandas import DataFrame
+import os
+import pandas as pd
+from pandas import DataFrame, Series
+from sceptr._parallel import InferencePool
+from sceptr._batching import TokenisedTcrs, schedule_batches
+from sceptr._distance_output import DistanceOutput
+from sceptr._export import export_inference_graph, load_inference_graph
+from sceptr._embedding_cache import (
+    TCR_COLUMNS,
+    EmbeddingCache,
+    EmbeddingCacheInfo,
+    deduplicate_tcr_keys,
+    get_tcr_keys,
+)
+from sceptr._instrumentation import (
+    DISABLED_STAGE,
+    Instrumentation,
+    InstrumentationStats,
+    StageCounters,
+    StageEvent,
+)
+from sceptr._memory import ActivationMemoryModel, is_out_of_memory_error
+from sceptr._neighbours import count_neighbours
+from sceptr._quantisation import QuantisationReport, calc_quantised_bert
+from sceptr._reference_data import load_reference_tcrs
+from sceptr._snapshot import Snapshot, save_snapshot
+from sceptr._tokenisation import GermlineCdrTable, tokenise_tcrs
+from sceptr.store import EmbeddingStore
+from scipy.sparse import csr_array
+import sys
 import torch
-from torch import FloatTensor
-from torch.nn import utils
+from torch import FloatTensor, LongTensor
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+)
 
 
 BATCH_SIZE_DEFAULT = 512
+TILE_SIZE_DEFAULT = 4096
+# Number of distances gathered at a time when scattering the distances between
+# distinct TCRs into a pdist vector, small enough to stay cache friendly
+PDIST_SCATTER_BLOCK_ELEMENTS = 2**22
+COMPUTE_PRECISIONS = {"float32": torch.float32, "bfloat16": torch.bfloat16}
+OUTPUT_PRECISIONS = {"float32": torch.float32, "float16": torch.float16}
+COMPARTMENTS = ("CDR1A", "CDR2A", "CDR3A", "CDR1B", "CDR2B", "CDR3B")
+POOLING_METHODS = ("mean", "max")
 
 
 logger = logging.getLogger(__name__)
@@ -139,6 +189,200 @@ class ResidueRepresentations:
     def __repr__(self) -> str:
         return f"ResidueRepresentations[num_tcrs: {self.representation_array.shape[0]}, rep_dim: {self.representation_array.shape[2]}]"
 
+    def to_ragged(self) -> "RaggedResidueRepresentations":
+        """
+        Convert to the compact :py:class:`~sceptr.model.RaggedResidueRepresentations`
+        layout, dropping padding.
+
+        Returns
+        -------
+        :py:class:`~sceptr.model.RaggedResidueRepresentations`
+            The same residue representations, without padding.
+        """
+        is_residue = self.compartment_mask != 0
+        offsets = np.zeros(len(is_residue) + 1, dtype=np.int64)
+        np.cumsum(is_residue.sum(axis=1), out=offsets[1:])
+
+        return RaggedResidueRepresentations(
+            self.representation_array[is_residue],
+            offsets,
+            self.compartment_mask[is_residue].astype(np.uint8),
+        )
+
+
+class RaggedResidueRepresentations:
+    """
+    A compact form of :py:class:`~sceptr.model.ResidueRepresentations` which
+    stores no padding. The representations of all residues of all TCRs are
+    held back to back in a single flat array, and an array of offsets marks
+    where each TCR's residues begin and end. Instances of this class can be
+    obtained by passing ``ragged=True`` to
+    :py:func:`sceptr.calc_residue_representations` or to the method of the
+    same name on the :py:class:`~sceptr.model.Sceptr` class.
+
+    When the input TCRs vary in length, this takes far less memory than the
+    padded layout, whose size is set by the longest TCR in the input.
+
+    Attributes
+    ----------
+    values : NDArray[numpy.float32]
+        A numpy float array of shape :math:`(R, D)` where :math:`R` is the
+        total number of residues across all input TCRs, and :math:`D` is the
+        dimensionality of the model variant that produced the result. The
+        residues of each TCR are stored contiguously, in the order of the input
+        TCRs. If a reduced output precision is set on the model, the array has
+        that precision instead.
+
+    offsets : NDArray[numpy.int64]
+        A numpy integer array of shape :math:`(N + 1,)` where :math:`N` is the
+        number of input TCRs. The residues of the :math:`i`-th TCR are found in
+        rows ``offsets[i]`` to ``offsets[i + 1]`` of `values`.
+
+    compartments : NDArray[numpy.uint8]
+        A numpy integer array of shape :math:`(R,)` mapping each row of
+        `values` to the CDR loop it is from, with the same values as the
+        `compartment_mask` of :py:class:`~sceptr.model.ResidueRepresentations`
+        (1 for CDR1A, through to 6 for CDR3B). Within each TCR, residues are
+        grouped by CDR loop, in that order.
+
+    Examples
+    --------
+    Using the same ``tcrs`` as in the example for
+    :py:class:`~sceptr.model.ResidueRepresentations`:
+
+    >>> res_reps = sceptr.calc_residue_representations(tcrs, ragged=True)
+    >>> print(res_reps)
+    RaggedResidueRepresentations[num_tcrs: 4, num_residues: 221, rep_dim: 64]
+
+    The residue representations of a single TCR, or of a single CDR loop of a
+    single TCR, are views into `values`:
+
+    >>> res_reps.get_tcr(0).shape
+    (57, 64)
+    >>> res_reps.get_tcr(0, compartment="CDR3B").shape
+    (14, 64)
+
+    The CDR3B residue representations of all TCRs can be gathered together:
+
+    >>> cdr3b_reps = res_reps.get_compartment("CDR3B")
+    >>> cdr3b_reps.values.shape
+    (56, 64)
+
+    And the padded layout can be recovered with
+    :py:meth:`~sceptr.model.RaggedResidueRepresentations.to_padded`.
+    """
+
+    values: NDArray[np.float32]
+    offsets: NDArray[np.int64]
+    compartments: NDArray[np.uint8]
+
+    def __init__(
+        self,
+        values: NDArray[np.float32],
+        offsets: NDArray[np.int64],
+        compartments: NDArray[np.uint8],
+    ) -> None:
+        self.values = values
+        self.offsets = offsets
+        self.compartments = compartments
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __repr__(self) -> str:
+        return f"RaggedResidueRepresentations[num_tcrs: {len(self)}, num_residues: {self.values.shape[0]}, rep_dim: {self.values.shape[1]}]"
+
+    def get_tcr(self, idx: int, compartment: Union[str, int, None] = None) -> NDArray:
+        """
+        Get the residue representations of a single TCR.
+
+        Parameters
+        ----------
+        idx : int
+            The position of the TCR in the input.
+        compartment : str, int or None
+            If given, only the residues from this CDR loop are returned. Can be
+            a name such as ``"CDR3B"``, or the corresponding compartment value.
+
+        Returns
+        -------
+        NDArray
+            A view into `values` of shape :math:`(L, D)`, where :math:`L` is the
+            number of selected residues.
+        """
+        if not -len(self) <= idx < len(self):
+            raise IndexError(f"TCR index {idx} is out of range for {len(self)} TCRs.")
+
+        idx %= len(self)
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+
+        if compartment is None:
+            return self.values[start:end]
+
+        compartment = _get_compartment_value(compartment)
+        tcr_compartments = self.compartments[start:end]
+        compartment_start = start + np.searchsorted(tcr_compartments, compartment)
+        compartment_end = start + np.searchsorted(
+            tcr_compartments, compartment, side="right"
+        )
+        return self.values[compartment_start:compartment_end]
+
+    def get_compartment(
+        self, compartment: Union[str, int]
+    ) -> "RaggedResidueRepresentations":
+        """
+        Gather the residue representations from one CDR loop of every TCR.
+
+        Parameters
+        ----------
+        compartment : str or int
+            A CDR loop name such as ``"CDR3B"``, or the corresponding
+            compartment value.
+
+        Returns
+        -------
+        :py:class:`~sceptr.model.RaggedResidueRepresentations`
+            The residue representations of the selected CDR loop, with one
+            entry per input TCR.
+        """
+        is_selected = self.compartments == _get_compartment_value(compartment)
+        num_selected_before = np.zeros(len(is_selected) + 1, dtype=np.int64)
+        np.cumsum(is_selected, out=num_selected_before[1:])
+
+        return RaggedResidueRepresentations(
+            self.values[is_selected],
+            num_selected_before[self.offsets],
+            self.compartments[is_selected],
+        )
+
+    def to_padded(self) -> ResidueRepresentations:
+        """
+        Convert to the padded :py:class:`~sceptr.model.ResidueRepresentations`
+        layout.
+
+        Returns
+        -------
+        :py:class:`~sceptr.model.ResidueRepresentations`
+            The same residue representations, padded to the length of the
+            longest TCR.
+        """
+        num_residues = np.diff(self.offsets)
+        max_num_residues = int(num_residues.max(initial=0))
+        tcr_indices = np.repeat(np.arange(len(self)), num_residues)
+        positions = np.arange(len(self.values)) - np.repeat(
+            self.offsets[:-1], num_residues
+        )
+
+        representation_array = np.zeros(
+            (len(self), max_num_residues, self.values.shape[1]),
+            dtype=self.values.dtype,
+        )
+        compartment_mask = np.zeros((len(self), max_num_residues), dtype=np.int64)
+        representation_array[tcr_indices, positions] = self.values
+        compartment_mask[tcr_indices, positions] = self.compartments
+
+        return ResidueRepresentations(representation_array, compartment_mask)
+
 
 class Sceptr:
     """
@@ -158,9 +402,23 @@ class Sceptr:
     def __init__(self, name: str, tokeniser: Tokeniser, bert: Bert) -> None:
         self.name = name
         self._tokeniser = tokeniser
-        self._bert = bert.eval()
+        self._bert = bert.eval() if bert.training else bert
         self._device = torch.device("cpu")
         self._batch_size = BATCH_SIZE_DEFAULT
+        self._token_budget = None
+        self._memory_budget = None
+        self._memory_estimate_scale = 1.0
+        self._tile_size = TILE_SIZE_DEFAULT
+        self._embedding_cache = None
+        self._inference_pool = None
+        self._germline_cdr_tables = {}
+        self._float_bert = None
+        self._is_quantised = False
+        self._quantised_layers = ()
+        self._compute_dtype = torch.float32
+        self._output_dtype = torch.float32
+        self._inference_graph = None
+        self._instrumentation = None
 
     def enable_hardware_acceleration(self) -> None:
         """
@@ -169,8 +427,17 @@ class Sceptr:
         toggling the package-level setting, see
         :py:func:`sceptr.enable_hardware_acceleration`.
         """
-        self._device = _get_hardware_accelerated_device()
-        self._bert.to(self._device)
+        device = _get_hardware_accelerated_device()
+
+        if self._is_quantised and device.type != "cpu":
+            raise RuntimeError(
+                f"Quantisation is only supported on the CPU. Call disable_quantisation on {self.name} first."
+            )
+
+        self._device = device
+        self._bert = _get_bert_on_device(self._bert, self._device)
+        if self._inference_graph is not None:
+            self._inference_graph.to(self._device)
         logger.debug(
             f"enable_hardware_acceleration called on {self} ({self.name}), setting device to {self._device}"
         )
@@ -182,7 +449,9 @@ class Sceptr:
         :py:func:`sceptr.disable_hardware_acceleration`.
         """
         self._device = torch.device("cpu")
-        self._bert.to(self._device)
+        self._bert = _get_bert_on_device(self._bert, self._device)
+        if self._inference_graph is not None:
+            self._inference_graph.to(self._device)
         logger.debug(
             f"disable_hardware_acceleration called on {self} ({self.name}), setting device to cpu"
         )
@@ -198,165 +467,578 @@ class Sceptr:
 
         self._batch_size = batch_size
 
-    def calc_vector_representations(self, instances: DataFrame) -> NDArray[np.float32]:
+    def set_token_budget(self, token_budget: Optional[int]) -> None:
         """
-        Map TCRs to their corresponding vector representations.
+        Set a budget on the number of tokens (including padding) processed per
+        batch. When a token budget is set, it replaces the fixed batch size: a
+        batch of short TCRs will hold many rows, while a batch of long TCRs
+        will hold few. Passing ``None`` reverts to the fixed batch size set via
+        :py:meth:`~sceptr.model.Sceptr.set_batch_size`. By default, no token
+        budget is set.
+
+        .. note ::
+            Regardless of this setting, input TCRs are always grouped into
+            batches of similar length before being sent through the model, and
+            the results are returned in the original input order.
+        """
+        if token_budget is not None and not isinstance(token_budget, int):
+            raise TypeError(
+                f"The token budget must be an int or None. Got {type(token_budget)}."
+            )
+
+        if token_budget is not None and token_budget < 1:
+            raise ValueError(
+                f"The token budget must be a positive integer. Got {token_budget}."
+            )
+
+        self._token_budget = token_budget
+
+    def set_memory_budget(self, memory_budget: Union[int, str, None]) -> None:
+        """
+        Set a budget, in bytes, on the memory used to process each batch. When
+        a memory budget is set, it replaces both the fixed batch size and the
+        token budget: the number of TCRs in each batch is chosen from an
+        estimate of the memory a batch needs, given the current model variant
+        and compute precision, and the length of the longest TCR in the batch.
+        As the cost of self-attention grows with the square of TCR length,
+        batches of long TCRs are made much smaller than batches of short ones.
+
+        If a batch still runs out of memory, it is split in half and retried,
+        and all later batches are made smaller to match.
+
+        Passing ``"auto"`` sets the budget to half of the memory currently
+        free on the device in use (split between workers when
+        :py:meth:`~sceptr.model.Sceptr.enable_multiprocessing` is on),
+        measured afresh on every call. On the CPU, free memory is taken to be
+        the memory the kernel reports as available in ``/proc/meminfo``, which
+        includes reclaimable page cache, or else the free memory reported
+        through ``os.sysconf``. On platforms that report neither, computing
+        representations on the CPU with an ``"auto"`` budget raises a
+        ``RuntimeError``, and an explicit budget must be given instead.
+        Passing ``None`` reverts to the batch size or token budget. By
+        default, no memory budget is set.
 
         Parameters
         ----------
-        instances : DataFrame
-            DataFrame specifying the input TCRs. It must be in the
-            :ref:`prescribed format <data_format>`.
+        memory_budget : int, "auto" or None
+            The budget in bytes, ``"auto"``, or ``None``.
+        """
+        if memory_budget is not None and memory_budget != "auto":
+            if not isinstance(memory_budget, int):
+                raise TypeError(
+                    f'The memory budget must be an int, "auto" or None. Got {type(memory_budget)}.'
+                )
+
+            if memory_budget < 1:
+                raise ValueError(
+                    f"The memory budget must be a positive integer. Got {memory_budget}."
+                )
+
+        self._memory_budget = memory_budget
+        self._memory_estimate_scale = 1.0
+
+    def set_tile_size(self, tile_size: int) -> None:
+        """
+        Set the tile size used by methods that compute distances block by
+        block, such as :py:meth:`~sceptr.model.Sceptr.calc_nearest_neighbours`.
+        Distances are computed between at most `tile_size` anchor TCRs and
+        `tile_size` comparison TCRs at a time, so peak memory use grows with
+        the square of this value. By default, the tile size is set to 4096.
+        """
+        if not isinstance(tile_size, int):
+            raise TypeError(f"The tile size must be an int. Got {type(tile_size)}.")
+
+        if tile_size < 1:
+            raise ValueError(
+                f"The tile size must be a positive integer. Got {tile_size}."
+            )
+
+        self._tile_size = tile_size
+
+    def set_compute_precision(self, precision: str) -> None:
+        """
+        Set the floating point precision used for the forward pass of the
+        model. Setting this to ``"bfloat16"`` runs the model with bfloat16
+        weights and activations, which is faster on hardware with native
+        bfloat16 support (e.g. recent CPUs with AVX-512 BF16 or AMX, and most
+        recent GPUs), at the cost of a small amount of accuracy in the
+        resulting representations. Representations are always collected, and
+        distances always computed, in float32. By default, the compute
+        precision is ``"float32"``.
+
+        .. note ::
+            Any embedding cache set up by
+            :py:meth:`~sceptr.model.Sceptr.enable_embedding_cache` is emptied
+            when the compute precision changes.
+
+        Parameters
+        ----------
+        precision : str
+            Either ``"float32"`` or ``"bfloat16"``.
+        """
+        compute_dtype = _get_precision_dtype(precision, COMPUTE_PRECISIONS)
+
+        if compute_dtype == self._compute_dtype:
+            return
+
+        if self._is_quantised:
+            raise RuntimeError(
+                f"Reduced precision computation cannot be combined with quantisation. Call disable_quantisation on {self.name} first."
+            )
+
+        if self._float_bert is not None:
+            self._bert = _get_bert_on_device(self._float_bert, self._device)
+            self._float_bert = None
+
+        if compute_dtype != torch.float32:
+            self._float_bert = self._bert
+            self._bert = copy.deepcopy(self._bert).to(compute_dtype)
+
+        self._compute_dtype = compute_dtype
+        self._reset_embedding_cache()
+
+    def set_output_precision(self, precision: str) -> None:
+        """
+        Set the floating point precision of the arrays returned by
+        :py:meth:`~sceptr.model.Sceptr.calc_vector_representations`,
+        :py:meth:`~sceptr.model.Sceptr.iter_vector_representations`,
+        :py:meth:`~sceptr.model.Sceptr.calc_residue_representations`,
+        :py:meth:`~sceptr.model.Sceptr.calc_cdist_matrix`,
+        :py:meth:`~sceptr.model.Sceptr.calc_pdist_vector` and the distances
+        returned by :py:meth:`~sceptr.model.Sceptr.calc_nearest_neighbours`.
+        Setting this to ``"float16"`` halves the memory needed to hold the
+        results. Distances are still computed in float32, and only rounded to
+        float16 once computed, so nearest neighbour rankings are unaffected. By
+        default, the output precision is ``"float32"``.
+
+        Parameters
+        ----------
+        precision : str
+            Either ``"float32"`` or ``"float16"``.
+        """
+        self._output_dtype = _get_precision_dtype(precision, OUTPUT_PRECISIONS)
+
+    def enable_embedding_cache(
+        self, max_entries: Optional[int] = 1_000_000, max_bytes: Optional[int] = None
+    ) -> None:
+        """
+        Keep the vector representations of TCRs seen by this `Sceptr` instance
+        in a least-recently-used cache, so that TCRs seen in previous calls to
+        :py:meth:`~sceptr.model.Sceptr.calc_vector_representations`,
+        :py:meth:`~sceptr.model.Sceptr.calc_cdist_matrix`,
+        :py:meth:`~sceptr.model.Sceptr.calc_pdist_vector` and other methods
+        working with vector representations are not re-processed by the model.
+        Calling this method on an instance with an existing cache replaces it
+        with a new, empty cache. By default, the cache is disabled.
+
+        TCRs are identified by the values in their TRAV, CDR3A, TRAJ, TRBV,
+        CDR3B and TRBJ columns, along with the species that SCEPTR is
+        currently :py:func:`set up <sceptr.setup>` for. Missing columns, NA
+        values and empty strings are all treated as missing values, and are
+        equal to one another. Gene symbols are compared by gene and allele,
+        where a symbol without an allele number stands for the first
+        functional allele of its gene, as SCEPTR assumes when reading it. For
+        example, ``TRAV1-1`` and ``TRAV1-1*01`` identify the same TCR. CDR3
+        sequences are compared exactly as given. The same rule decides which
+        TCRs are processed only once within a call, and which TCRs match the
+        contents of an :py:class:`~sceptr.store.EmbeddingStore`.
+
+        Parameters
+        ----------
+        max_entries : Optional[int]
+            The maximum number of TCR representations to hold in the cache. If
+            ``None``, the number of entries is unbounded. Defaults to one
+            million.
+
+        max_bytes : Optional[int]
+            The maximum total size in bytes of the TCR representations held in
+            the cache. If ``None``, the total size is unbounded. Defaults to
+            ``None``.
+        """
+        self._embedding_cache = EmbeddingCache(max_entries, max_bytes)
+
+    def disable_embedding_cache(self) -> None:
+        """
+        Disable and discard the embedding cache set up by
+        :py:meth:`~sceptr.model.Sceptr.enable_embedding_cache`.
+        """
+        self._embedding_cache = None
+
+    def get_embedding_cache_info(self) -> Optional[EmbeddingCacheInfo]:
+        """
+        Get statistics on the embedding cache set up by
+        :py:meth:`~sceptr.model.Sceptr.enable_embedding_cache`.
 
         Returns
         -------
-        NDArray[numpy.float32]
-            A 2D numpy ndarray object where every row vector corresponds to a
-            row in `instances`. The returned array will have shape :math:`(N,
-            D)` where :math:`N` is the number of TCRs in `instances` and
-            :math:`D` is the dimensionality of the current model variant.
+        Optional[EmbeddingCacheInfo]
+            A named tuple with the fields ``hits``, ``misses``,
+            ``num_entries``, ``num_bytes``, ``max_entries`` and ``max_bytes``,
+            or ``None`` if the embedding cache is disabled.
         """
-        torch_representations = self._calc_torch_representations(instances)
-        return torch_representations.cpu().numpy()
+        if self._embedding_cache is None:
+            return None
 
-    @torch.no_grad()
-    def calc_residue_representations(
-        self, instances: DataFrame
-    ) -> ResidueRepresentations:
+        return self._embedding_cache.info()
+
+    def enable_instrumentation(
+        self, hook: Optional[Callable[[StageEvent], None]] = None
+    ) -> None:
         """
-        Map each TCR to a set of amino acid residue-level representations. The
-        residue-level representations are the output of the penultimate
-        self-attention layer, as also used by the
-        :py:func:`~sceptr.variant.average_pooling` variant when generating TCR
-        receptor-level representations.
+        Start recording where this `Sceptr` instance spends its time. Wall
+        time and call counts are accumulated per pipeline stage (parsing,
+        tokenisation, padding, device transfer, the model forward pass,
+        distance computation and output conversion), along with the number of
+        TCRs, tokens and padding tokens processed. Any previously recorded
+        statistics are discarded. By default, instrumentation is disabled.
 
         .. note ::
-            This method is currently only supported on SCEPTR model variants
-            such as the default one that 1) use both the alpha and beta chains,
-            and 2) take into account all three CDR loops from each chain.
+            On CUDA devices, the device is synchronised at the start and end of
+            every stage so that time is attributed to the right stage, which
+            may slow computation down slightly. Work done in worker processes
+            set up with
+            :py:meth:`~sceptr.model.Sceptr.enable_multiprocessing` is not
+            broken down into stages.
 
         Parameters
         ----------
-        instances : DataFrame
-            DataFrame specifying the input TCRs. It must be in the
-            :ref:`prescribed format <data_format>`.
+        hook : Optional[Callable[[StageEvent], None]]
+            If given, called at the end of every stage with a named tuple
+            with the fields ``stage``, ``seconds``, ``num_rows``,
+            ``num_tokens`` and ``num_padding_tokens`` describing that run of
+            the stage, e.g. to feed the measurements into a metrics system.
+        """
+        if hook is not None and not callable(hook):
+            raise TypeError(f"hook must be callable. Got {type(hook)}.")
+
+        self._instrumentation = Instrumentation(hook)
+
+    def disable_instrumentation(self) -> None:
+        """
+        Stop recording and discard the statistics collected since
+        :py:meth:`~sceptr.model.Sceptr.enable_instrumentation` was called.
+        """
+        self._instrumentation = None
+
+    def get_instrumentation_stats(self) -> Optional[InstrumentationStats]:
+        """
+        Get the statistics recorded since
+        :py:meth:`~sceptr.model.Sceptr.enable_instrumentation` was called.
 
         Returns
         -------
-        :py:class:`~sceptr.model.ResidueRepresentations`
-            An array of representation vectors for each amino acid residue in
-            the tokenised forms of the input TCRs. For details on how to
-            interpret/use this output, please refer to the documentation for
-            :py:class:`~sceptr.model.ResidueRepresentations`.
+        Optional[InstrumentationStats]
+            A named tuple with the fields ``stages``, ``num_rows``,
+            ``num_tokens`` and ``num_padding_tokens``, where ``stages`` maps
+            each stage name to a named tuple with the fields ``num_calls`` and
+            ``seconds``. ``None`` if instrumentation is disabled.
         """
-        if not isinstance(self._tokeniser, CdrTokeniser):
-            raise NotImplementedError(
-                "The calc_residue_representations method is currently only supported on SCEPTR model variants that 1) use both the alpha and beta chains, and 2) take into account all three CDR loops from each chain."
-            )
+        if self._instrumentation is None:
+            return None
 
-        instances = instances.copy()
+        return self._instrumentation.get_stats()
 
-        for col in ("TRAV", "CDR3A", "TRAJ", "TRBV", "CDR3B", "TRBJ"):
-            if col not in instances:
-                instances[col] = None
+    def enable_multiprocessing(
+        self, num_workers: Optional[int] = None, num_threads_per_worker: int = 1
+    ) -> None:
+        """
+        Compute TCR vector representations in parallel over a pool of worker
+        processes on the CPU. Each worker holds its own copy of this model
+        variant and writes its results directly into shared memory. This is
+        useful on many-core machines without hardware acceleration, where a
+        single process is limited by Python-level preprocessing. Calling this
+        method on an instance with an existing pool replaces it. By default,
+        multiprocessing is disabled.
 
-        tcrs = schema.generate_tcr_series(instances)
+        .. note ::
+            Workers receive a copy of the model as it is when this method is
+            called. Changes to the batch size or token budget are picked up by
+            the workers automatically, but other changes to the model require
+            this method to be called again. Workers of a quantised model (see
+            :py:meth:`~sceptr.model.Sceptr.enable_quantisation`) quantise the
+            same layers of their own float copy of the model.
 
-        residue_reps_collection = []
-        compartment_masks_collection = []
+        Parameters
+        ----------
+        num_workers : Optional[int]
+            The number of worker processes. Defaults to the number of CPUs.
 
-        for idx in range(0, len(tcrs), self._batch_size):
-            batch = tcrs.iloc[idx : idx + self._batch_size]
-            tokenised_batch = [self._tokeniser.tokenise(tcr) for tcr in batch]
-            padded_batch = utils.rnn.pad_sequence(
-                sequences=tokenised_batch,
-                batch_first=True,
-                padding_value=DefaultTokenIndex.NULL,
-            ).to(self._device)
+        num_threads_per_worker : int
+            The number of threads each worker lets torch use for intra-op
+            parallelism. Defaults to 1.
+        """
+        if num_workers is None:
+            num_workers = os.cpu_count()
+
+        for arg_name, value in (
+            ("num_workers", num_workers),
+            ("num_threads_per_worker", num_threads_per_worker),
+        ):
+            if not isinstance(value, int):
+                raise TypeError(f"{arg_name} must be an int. Got {type(value)}.")
+            if value < 1:
+                raise ValueError(f"{arg_name} must be a positive integer. Got {value}.")
+
+        self.disable_multiprocessing()
+
+        # Quantised layers cannot be sent to worker processes, so workers are
+        # given the float model and quantise the same layers themselves
+        bert = self._float_bert if self._is_quantised else self._bert
+        cpu_bert = copy.deepcopy(bert).to("cpu")
+        worker_model = Sceptr(name=self.name, tokeniser=self._tokeniser, bert=cpu_bert)
+        worker_model._compute_dtype = self._compute_dtype
+        self._inference_pool = InferencePool(
+            worker_model,
+            num_workers,
+            num_threads_per_worker,
+            self._quantised_layers if self._is_quantised else None,
+        )
+        logger.debug(
+            f"enable_multiprocessing called on {self} ({self.name}), using {num_workers} workers with {num_threads_per_worker} threads each"
+        )
 
-            raw_token_embeddings = self._bert._embed(padded_batch)
-            padding_mask = self._bert._get_padding_mask(padded_batch)
+    def disable_multiprocessing(self) -> None:
+        """
+        Shut down the worker pool set up by
+        :py:meth:`~sceptr.model.Sceptr.enable_multiprocessing`, and go back to
+        computing representations in the current process.
+        """
+        if self._inference_pool is not None:
+            self._inference_pool.shutdown()
+            self._inference_pool = None
 
-            residue_reps = self._bert._self_attention_stack.get_token_embeddings_at_penultimate_layer(
-                raw_token_embeddings, padding_mask
+    def enable_quantisation(self, tolerance: float = 0.02) -> QuantisationReport:
+        """
+        Run the linear layers of the self-attention stack with int8 weights and
+        dynamically quantised activations. This trades a small amount of
+        accuracy in the resulting representations for faster inference on the
+        CPU. By default, quantisation is disabled.
+
+        The linear layers include the input and output projections of each
+        attention module, whose weights torch's multi-head attention reads
+        directly. In the quantised model, each such module is replaced with an
+        equivalent one that applies them as ordinary linear layers.
+
+        Representations of a bundled reference set of synthetic human TCRs,
+        with functional V and J genes and CDR3s built from their germline
+        sequences, are used to decide which layers to quantise, and to report
+        the resulting accuracy cost. Each linear layer is first quantised on
+        its own, and layers that shift the reference representations by more
+        than `tolerance` (in mean L2 distance) are kept in float32. The
+        deviation between the representations of the fully float32 model and
+        the final quantised model is then reported.
+
+        .. note ::
+            Quantised inference is only supported on the CPU. Any embedding
+            cache set up by
+            :py:meth:`~sceptr.model.Sceptr.enable_embedding_cache` is emptied,
+            and an existing worker pool set up by
+            :py:meth:`~sceptr.model.Sceptr.enable_multiprocessing` keeps using
+            the model it was given until that method is called again.
+
+        Parameters
+        ----------
+        tolerance : float
+            The largest mean L2 deviation over the reference TCRs that
+            quantising any single layer is allowed to cause. Since
+            representations have unit length, distances between them range
+            from 0 to 2. Defaults to 0.02.
+
+        Returns
+        -------
+        QuantisationReport
+            A named tuple with the fields ``max_l2_deviation``,
+            ``mean_l2_deviation``, ``num_reference_tcrs``,
+            ``quantised_layers`` and ``float_layers``, describing how far the
+            quantised representations of the reference TCRs are from their
+            float32 counterparts, and which layers were quantised.
+        """
+        if not isinstance(tolerance, (int, float)):
+            raise TypeError(f"The tolerance must be a float. Got {type(tolerance)}.")
+
+        if tolerance < 0:
+            raise ValueError(f"The tolerance must be non-negative. Got {tolerance}.")
+
+        if self._compute_dtype != torch.float32:
+            raise RuntimeError(
+                f"Quantisation cannot be combined with reduced precision computation. Set the compute precision of {self.name} back to float32 first."
             )
-            residue_reps = residue_reps[:, 1:, :]
 
-            compartment_masks = padded_batch[:, 1:, 3]
+        if self._device.type != "cpu":
+            raise RuntimeError(
+                f"Quantisation is only supported on the CPU, but {self.name} is on {self._device}. Call disable_hardware_acceleration first."
+            )
 
-            residue_reps_collection.append(residue_reps)
-            compartment_masks_collection.append(compartment_masks)
+        self.disable_quantisation()
 
-        residue_reps_combined = (
-            torch.concatenate(residue_reps_collection, dim=0).cpu().numpy()
-        )
-        compartment_masks_combined = (
-            torch.concatenate(compartment_masks_collection, dim=0).cpu().numpy()
+        tokenised_reference_tcrs = self._tokenise_reference_tcrs()
+        quantised_bert, report = calc_quantised_bert(
+            self._bert,
+            tolerance,
+            lambda bert: self._calc_representations_with(
+                bert, tokenised_reference_tcrs
+            ),
         )
 
-        return ResidueRepresentations(residue_reps_combined, compartment_masks_combined)
+        self._float_bert = self._bert
+        self._bert = quantised_bert
+        self._is_quantised = True
+        self._quantised_layers = report.quantised_layers
+        self._reset_embedding_cache()
 
-    @torch.no_grad()
-    def _calc_torch_representations(self, instances: DataFrame) -> FloatTensor:
-        instances = instances.copy()
+        logger.debug(
+            f"enable_quantisation called on {self} ({self.name}), quantised {len(report.quantised_layers)} of {len(report.quantised_layers) + len(report.float_layers)} linear layers, max L2 deviation {report.max_l2_deviation:.2e}, mean L2 deviation {report.mean_l2_deviation:.2e}"
+        )
+        return report
 
-        for col in ("TRAV", "CDR3A", "TRAJ", "TRBV", "CDR3B", "TRBJ"):
-            if col not in instances:
-                instances[col] = None
+    def disable_quantisation(self) -> None:
+        """
+        Go back to running the original float32 model after a call to
+        :py:meth:`~sceptr.model.Sceptr.enable_quantisation`.
+        """
+        if self._is_quantised:
+            self._bert = self._float_bert
+            self._float_bert = None
+            self._is_quantised = False
+            self._quantised_layers = ()
+            self._reset_embedding_cache()
+
+    def export_inference_graph(self, path: Union[str, os.PathLike]) -> None:
+        """
+        Capture the forward pass that maps tokenised TCRs to vector
+        representations as a single graph with ``torch.export``, and save it to
+        `path` (conventionally with the extension ``.pt2``). The batch size and
+        sequence length of the graph's input are kept dynamic, so that it can
+        run batches of any shape. The graph can later be loaded onto an
+        instance of the same model variant with
+        :py:meth:`~sceptr.model.Sceptr.load_inference_graph`.
+
+        The current compute precision (see
+        :py:meth:`~sceptr.model.Sceptr.set_compute_precision`) is captured in
+        the graph. Quantised models cannot be exported.
 
-        tcrs = schema.generate_tcr_series(instances)
+        .. note ::
+            Exporting and loading inference graphs requires torch 2.2 or
+            later.
 
-        representations = []
-        for idx in range(0, len(tcrs), self._batch_size):
-            batch = tcrs.iloc[idx : idx + self._batch_size]
-            tokenised_batch = [self._tokeniser.tokenise(tcr) for tcr in batch]
-            padded_batch = utils.rnn.pad_sequence(
-                sequences=tokenised_batch,
-                batch_first=True,
-                padding_value=DefaultTokenIndex.NULL,
-            )
-            batch_representation = self._bert.get_vector_representations_of(
-                padded_batch.to(self._device)
+        Parameters
+        ----------
+        path : str or os.PathLike
+            The file to save the graph to.
+        """
+        if self._is_quantised:
+            raise RuntimeError(
+                f"Quantised models cannot be exported. Call disable_quantisation on {self.name} first."
             )
-            representations.append(batch_representation)
 
-        return torch.concatenate(representations, dim=0)
+        example_batch = self._tokenise_reference_tcrs().get_padded_batch(np.arange(2))
+        compute_precision = next(
+            precision
+            for precision, dtype in COMPUTE_PRECISIONS.items()
+            if dtype == self._compute_dtype
+        )
 
-    def calc_cdist_matrix(
-        self, anchors: DataFrame, comparisons: DataFrame
-    ) -> NDArray[np.float32]:
+        export_inference_graph(
+            path,
+            self._bert,
+            self._compute_dtype,
+            example_batch.to(self._device),
+            {
+                "model_name": self.name,
+                "dim": self._bert.d_model,
+                "compute_precision": compute_precision,
+            },
+        )
+
+    def load_inference_graph(self, path: Union[str, os.PathLike]) -> None:
         """
-        Generate a cdist matrix between two collections of TCRs.
+        Compute vector representations by running a graph saved by
+        :py:meth:`~sceptr.model.Sceptr.export_inference_graph`, instead of the
+        eager-mode model. This avoids the per-operation Python overhead of the
+        eager-mode model, and produces the same representations up to floating
+        point rounding. By default, no graph is used.
+
+        .. note ::
+            The graph replaces the forward pass used for vector
+            representations only, and runs with the compute precision it was
+            exported with. It is not used by
+            :py:meth:`~sceptr.model.Sceptr.calc_residue_representations`, by
+            worker processes set up with
+            :py:meth:`~sceptr.model.Sceptr.enable_multiprocessing`, or by
+            quantised models. Any embedding cache set up by
+            :py:meth:`~sceptr.model.Sceptr.enable_embedding_cache` is emptied.
 
         Parameters
         ----------
-        anchors : DataFrame
-            DataFrame specifying the first (anchor) collection of input TCRs.
-            It must be in the :ref:`prescribed format <data_format>`.
+        path : str or os.PathLike
+            The file holding the graph.
+
+        Raises
+        ------
+        ValueError
+            If the graph was exported from a different model variant.
+        RuntimeError
+            If the installed version of torch is older than 2.2.
+        """
+        graph, metadata = load_inference_graph(path)
 
-        comparisons : DataFrame
-            DataFrame specifying the second (comparison) collection of input
-            TCRs. It must be in the :ref:`prescribed format <data_format>`.
+        if metadata["model_name"] != self.name or metadata["dim"] != self._bert.d_model:
+            raise ValueError(
+                f"The inference graph at {path} was exported from {metadata['model_name']} (dim {metadata['dim']}), and cannot be used with {self.name} (dim {self._bert.d_model})."
+            )
 
-        Returns
-        -------
-        NDArray[numpy.float32]
-            A 2D numpy ndarray representing a cdist matrix between TCRs from
-            `anchors` and `comparisons`. The returned array will have shape
-            :math:`(X, Y)` where :math:`X` is the number of TCRs in `anchors`
-            and :math:`Y` is the number of TCRs in `comparisons`.
+        self._inference_graph = graph.to(self._device)
+        self._reset_embedding_cache()
+        logger.debug(
+            f"load_inference_graph called on {self} ({self.name}), loaded graph from {path}"
+        )
+
+    def disable_inference_graph(self) -> None:
         """
-        anchor_representations = self._calc_torch_representations(anchors)
-        comparison_representations = self._calc_torch_representations(comparisons)
-        cdist_matrix = torch.cdist(
-            anchor_representations, comparison_representations, p=2
+        Go back to computing vector representations with the eager-mode model
+        after a call to :py:meth:`~sceptr.model.Sceptr.load_inference_graph`.
+        """
+        if self._inference_graph is not None:
+            self._inference_graph = None
+            self._reset_embedding_cache()
+
+    def save_snapshot(self, path: Union[str, os.PathLike]) -> None:
+        """
+        Save this model, fully built, to a single snapshot file that can be
+        restored with :py:func:`sceptr.variant.load_snapshot`. Restoring a
+        snapshot skips reading the model config, constructing the model and
+        copying weights into it, and comes with the germline CDR1 and CDR2
+        sequences of every functional V allele already looked up, which cuts
+        the time from process start to the first representation.
+
+        The snapshot holds the float32 model on the CPU, regardless of the
+        device, compute precision or quantisation currently in use.
+
+        .. warning ::
+            Snapshots are pickle files. Only load snapshots from sources you
+            trust.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            The file to save the snapshot to.
+        """
+        bert = self._float_bert if self._float_bert is not None else self._bert
+        self._get_germline_cdr_table().populate()
+
+        save_snapshot(
+            path,
+            Snapshot(
+                name=self.name,
+                tokeniser=self._tokeniser,
+                bert=_get_bert_on_device(bert, torch.device("cpu")),
+                germline_cdr_tables=self._germline_cdr_tables,
+            ),
         )
-        return cdist_matrix.cpu().numpy()
 
-    def calc_pdist_vector(self, instances: DataFrame) -> NDArray[np.float32]:
-        r"""
-        Generate a pdist vector of distances between each pair of TCRs in the
-        input data.
+    def calc_vector_representations(self, instances: DataFrame) -> NDArray[np.float32]:
+        """
+        Map TCRs to their corresponding vector representations.
 
         Parameters
         ----------
@@ -367,22 +1049,1705 @@ class Sceptr:
         Returns
         -------
         NDArray[numpy.float32]
-            A 1D numpy ndarray representing a pdist vector of distances between
-            each pair of TCRs in `instances`. The returned array will have
-            shape :math:`(\frac{1}{2}N(N-1),)`, where :math:`N` is the number
-            of TCRs in `instances`.
+            A 2D numpy ndarray object where every row vector corresponds to a
+            row in `instances`. The returned array will have shape :math:`(N,
+            D)` where :math:`N` is the number of TCRs in `instances` and
+            :math:`D` is the dimensionality of the current model variant.
         """
-        representations = self._calc_torch_representations(instances)
-        pdist_vector = torch.pdist(representations, p=2)
-        return pdist_vector.cpu().numpy()
-
+        torch_representations = self._calc_torch_representations(instances)
+        return self._to_output_array(torch_representations)
 
-def _get_hardware_accelerated_device() -> torch.device:
-    if torch.cuda.is_available():
-        return torch.device("cuda")
+    def iter_vector_representations(
+        self,
+        source: Union[Iterable[DataFrame], str, os.PathLike],
+        chunk_size: int = 100_000,
+    ) -> Iterator[Tuple[Tuple[int, int], NDArray[np.float32]]]:
+        """
+        Map TCRs to their corresponding vector representations, streaming
+        through the input chunk by chunk. This allows repertoires far too large
+        to fit in memory to be processed with roughly constant memory use.
+
+        When batches are formed by the fixed batch size (see
+        :py:meth:`~sceptr.model.Sceptr.set_batch_size`), rows are carried over
+        between chunks so that every batch sent through the model except the
+        last is full, regardless of where the input chunk boundaries lie. When
+        a token budget (see :py:meth:`~sceptr.model.Sceptr.set_token_budget`)
+        or memory budget (see
+        :py:meth:`~sceptr.model.Sceptr.set_memory_budget`) is set, the number
+        of rows in each batch depends on the lengths of the TCRs in it, so each
+        chunk is processed as it arrives instead, with its TCRs grouped into
+        batches by length within the chunk.
+
+        Parameters
+        ----------
+        source : Iterable[DataFrame] or str or os.PathLike
+            Either an iterable of DataFrames, each in the :ref:`prescribed
+            format <data_format>`, or a path to a CSV file (or a TSV file, if
+            the path ends in ``.tsv``) holding TCR data in the prescribed
+            format, which will be read `chunk_size` rows at a time.
+
+        chunk_size : int
+            The number of rows to read at a time when `source` is a path.
+            Defaults to 100,000.
+
+        Yields
+        ------
+        Tuple[Tuple[int, int], NDArray[numpy.float32]]
+            Tuples of the form ``((start, stop), representations)``, where
+            ``representations`` is a 2D numpy ndarray holding the vector
+            representations of the rows at positions ``start`` (inclusive) to
+            ``stop`` (exclusive) of the overall input. Successive blocks cover
+            the input in order without gaps.
+
+        Examples
+        --------
+        >>> for (start, stop), representations in model.iter_vector_representations("repertoire.tsv"): # doctest: +SKIP
+        ...     output[start:stop] = representations
+        """
+        if isinstance(source, (str, os.PathLike)):
+            separator = "\t" if str(source).endswith(".tsv") else ","
+            source = pd.read_csv(source, sep=separator, chunksize=chunk_size)
+
+        buffered_chunks = []
+        num_buffered = 0
+        start = 0
+
+        for chunk in source:
+            buffered_chunks.append(chunk)
+            num_buffered += len(chunk)
+
+            if self._token_budget is not None or self._memory_budget is not None:
+                buffered = pd.concat(buffered_chunks)
+                stop = start + num_buffered
+
+                if num_buffered > 0:
+                    yield (start, stop), self.calc_vector_representations(buffered)
+
+                start = stop
+                buffered_chunks = []
+                num_buffered = 0
+                continue
+
+            if num_buffered < self._batch_size:
+                continue
+
+            buffered = pd.concat(buffered_chunks)
+            num_to_process = num_buffered - num_buffered % self._batch_size
+
+            yield (start, start + num_to_process), self.calc_vector_representations(
+                buffered.iloc[:num_to_process]
+            )
+
+            start += num_to_process
+            buffered_chunks = [buffered.iloc[num_to_process:]]
+            num_buffered -= num_to_process
+
+        if num_buffered > 0:
+            yield (start, start + num_buffered), self.calc_vector_representations(
+                pd.concat(buffered_chunks)
+            )
+
+    @torch.no_grad()
+    def calc_residue_representations(
+        self,
+        instances: DataFrame,
+        ragged: bool = False,
+        compartments: Union[Iterable[Union[str, int]], str, int, None] = None,
+        pooling: Optional[Literal["mean", "max"]] = None,
+    ) -> Union[ResidueRepresentations, RaggedResidueRepresentations, NDArray]:
+        """
+        Map each TCR to a set of amino acid residue-level representations. The
+        residue-level representations are the output of the penultimate
+        self-attention layer, as also used by the
+        :py:func:`~sceptr.variant.average_pooling` variant when generating TCR
+        receptor-level representations.
+
+        .. note ::
+            This method is currently only supported on SCEPTR model variants
+            such as the default one that 1) use both the alpha and beta chains,
+            and 2) take into account all three CDR loops from each chain.
+
+        Parameters
+        ----------
+        instances : DataFrame
+            DataFrame specifying the input TCRs. It must be in the
+            :ref:`prescribed format <data_format>`.
+        ragged : bool
+            If True, return the representations in the compact
+            :py:class:`~sceptr.model.RaggedResidueRepresentations` layout,
+            which stores no padding. Defaults to False.
+        compartments : str, int, an iterable of these, or None
+            If given, only residues from these CDR loops are kept, such as
+            ``"CDR3B"`` or ``["CDR3A", "CDR3B"]`` (see
+            :py:class:`~sceptr.model.ResidueRepresentations` for the loop names
+            and their compartment values). Other residues are discarded before
+            they leave the compute device. Defaults to all CDR loops.
+        pooling : "mean", "max" or None
+            If given, the residue representations of each selected CDR loop
+            are pooled into a single vector by taking their elementwise mean or
+            maximum, and an array of these vectors is returned instead. Cannot
+            be combined with `ragged`. Defaults to None.
+
+        Returns
+        -------
+        :py:class:`~sceptr.model.ResidueRepresentations`, :py:class:`~sceptr.model.RaggedResidueRepresentations` or NDArray
+            An array of representation vectors for each amino acid residue in
+            the tokenised forms of the input TCRs. For details on how to
+            interpret/use this output, please refer to the documentation for
+            :py:class:`~sceptr.model.ResidueRepresentations` and
+            :py:class:`~sceptr.model.RaggedResidueRepresentations`.
+
+            If `pooling` is set, a numpy float array of shape :math:`(N, C, D)`
+            instead, where :math:`N` is the number of input TCRs, :math:`C` is
+            the number of selected CDR loops, in the order CDR1A through to
+            CDR3B, and :math:`D` is the dimensionality of the model variant.
+            The vectors of CDR loops missing from a TCR (for example, when its
+            alpha chain is unknown) are filled with NaN.
+        """
+        if not isinstance(self._tokeniser, CdrTokeniser):
+            raise NotImplementedError(
+                "The calc_residue_representations method is currently only supported on SCEPTR model variants that 1) use both the alpha and beta chains, and 2) take into account all three CDR loops from each chain."
+            )
+
+        selected_compartments = _get_selected_compartment_values(compartments)
+
+        if pooling is not None:
+            if pooling not in POOLING_METHODS:
+                raise ValueError(
+                    f"Unrecognised pooling method: {pooling}. Must be one of {POOLING_METHODS} or None."
+                )
+
+            if ragged:
+                raise ValueError("ragged cannot be used together with pooling.")
+
+        tcrs = self._generate_tcr_series(instances)
+        tokenised_tcrs = self._tokenise(tcrs)
+
+        if pooling is not None:
+            return self._calc_pooled_residue_representations(
+                tokenised_tcrs, selected_compartments, pooling
+            )
+
+        ragged_reps = self._calc_ragged_residue_representations(
+            tokenised_tcrs, selected_compartments
+        )
+        return ragged_reps if ragged else ragged_reps.to_padded()
+
+    def _calc_ragged_residue_representations(
+        self, tokenised_tcrs: TokenisedTcrs, selected_compartments: List[int]
+    ) -> RaggedResidueRepresentations:
+        token_compartments = tokenised_tcrs.tokens[:, 3].numpy()
+        num_selected_before = np.zeros(len(token_compartments) + 1, dtype=np.int64)
+        np.cumsum(
+            np.isin(token_compartments, selected_compartments),
+            out=num_selected_before[1:],
+        )
+        num_residues = (
+            num_selected_before[tokenised_tcrs.offsets + tokenised_tcrs.lengths]
+            - num_selected_before[tokenised_tcrs.offsets]
+        )
+        offsets = np.zeros(len(tokenised_tcrs) + 1, dtype=np.int64)
+        np.cumsum(num_residues, out=offsets[1:])
+        selected_compartments = torch.tensor(selected_compartments, device=self._device)
+
+        values = np.empty(
+            (offsets[-1], self._bert.d_model),
+            dtype=torch.empty(0, dtype=self._output_dtype).numpy().dtype,
+        )
+        compartments = np.empty(offsets[-1], dtype=np.uint8)
+
+        for batch_indices, padded_batch, residue_reps in self._iter_batch_outputs(
+            tokenised_tcrs, self._get_residue_representations_of
+        ):
+            compartment_masks = padded_batch[:, 1:, 3]
+            is_residue = torch.isin(compartment_masks, selected_compartments)
+
+            batch_num_residues = num_residues[batch_indices]
+            destinations = np.repeat(
+                offsets[batch_indices]
+                - (np.cumsum(batch_num_residues) - batch_num_residues),
+                batch_num_residues,
+            ) + np.arange(batch_num_residues.sum())
+
+            values[destinations] = self._to_output_array(residue_reps[is_residue])
+            compartments[destinations] = compartment_masks[is_residue].cpu().numpy()
+
+        return RaggedResidueRepresentations(values, offsets, compartments)
+
+    def _calc_pooled_residue_representations(
+        self,
+        tokenised_tcrs: TokenisedTcrs,
+        selected_compartments: List[int],
+        pooling: Literal["mean", "max"],
+    ) -> NDArray:
+        pooled_reps = np.empty(
+            (len(tokenised_tcrs), len(selected_compartments), self._bert.d_model),
+            dtype=torch.empty(0, dtype=self._output_dtype).numpy().dtype,
+        )
+
+        for batch_indices, padded_batch, residue_reps in self._iter_batch_outputs(
+            tokenised_tcrs, self._get_residue_representations_of
+        ):
+            compartment_masks = padded_batch[:, 1:, 3]
+            residue_reps = residue_reps.float()
+            batch_pooled_reps = []
+
+            for compartment in selected_compartments:
+                is_in_compartment = (compartment_masks == compartment).unsqueeze(-1)
+                num_residues = is_in_compartment.sum(dim=1)
+
+                if pooling == "mean":
+                    pooled = (residue_reps * is_in_compartment).sum(
+                        dim=1
+                    ) / num_residues
+                else:
+                    pooled = residue_reps.masked_fill(
+                        is_in_compartment.logical_not(), -torch.inf
+                    ).amax(dim=1)
+                    pooled = pooled.masked_fill(num_residues == 0, torch.nan)
+
+                batch_pooled_reps.append(pooled)
+
+            pooled_reps[batch_indices] = self._to_output_array(
+                torch.stack(batch_pooled_reps, dim=1)
+            )
+
+        return pooled_reps
+
+    def _calc_torch_representations(
+        self, instances: Union[DataFrame, EmbeddingStore]
+    ) -> FloatTensor:
+        (
+            unique_representations,
+            inverse,
+        ) = self._calc_deduplicated_torch_representations(instances)
+        return self._expand_deduplicated(unique_representations, inverse)
+
+    def _calc_deduplicated_torch_representations(
+        self, instances: Union[DataFrame, EmbeddingStore]
+    ) -> Tuple[FloatTensor, NDArray[np.int64]]:
+        """
+        Compute the representations of the distinct TCRs in `instances`, so
+        that the model only runs once per distinct TCR. Returns the
+        representations of the distinct TCRs in order of first occurrence, and
+        an inverse index mapping each row of `instances` to its representation.
+        Embedding stores are read directly, as they hold distinct TCRs only.
+        """
+        if isinstance(instances, EmbeddingStore):
+            instances.check_compatible_with(self)
+            representations = torch.from_numpy(instances._memory_map(mode="c"))
+            return representations.to(self._device), np.arange(len(instances))
+
+        keys = get_tcr_keys(instances, schema.tcr.SPECIES)
+        first_positions, inverse = deduplicate_tcr_keys(keys)
+
+        if len(first_positions) < len(instances):
+            instances = instances.iloc[first_positions]
+            keys = [keys[idx] for idx in first_positions]
+
+        if self._embedding_cache is None:
+            return self._calc_uncached_torch_representations(instances), inverse
+
+        return self._calc_cached_torch_representations(instances, keys), inverse
+
+    def _calc_cached_torch_representations(
+        self, instances: DataFrame, tcr_keys: List[Tuple[Optional[str], ...]]
+    ) -> FloatTensor:
+        species = schema.tcr.SPECIES
+        keys = [(species, *tcr_key) for tcr_key in tcr_keys]
+        representations = [self._embedding_cache.get(key) for key in keys]
+        miss_positions = [
+            idx
+            for idx, representation in enumerate(representations)
+            if representation is None
+        ]
+
+        if miss_positions:
+            new_representations = self._calc_uncached_torch_representations(
+                instances.iloc[miss_positions]
+            )
+
+            for idx, representation in zip(
+                miss_positions, new_representations.cpu().numpy()
+            ):
+                representation = representation.copy()
+                representations[idx] = representation
+                self._embedding_cache.put(keys[idx], representation)
+
+        return torch.from_numpy(np.stack(representations)).to(self._device)
+
+    def _expand_deduplicated(
+        self, unique_values: torch.Tensor, inverse: NDArray[np.int64]
+    ) -> torch.Tensor:
+        if len(unique_values) == len(inverse):
+            return unique_values
+
+        return unique_values[torch.from_numpy(inverse).to(unique_values.device)]
+
+    @torch.no_grad()
+    def _calc_uncached_torch_representations(self, instances: DataFrame) -> FloatTensor:
+        if self._inference_pool is not None:
+            representations = self._inference_pool.calc_representations(
+                instances,
+                self._batch_size,
+                self._token_budget,
+                (
+                    None
+                    if self._memory_budget is None
+                    else self._get_memory_budget_bytes()
+                ),
+            )
+            return representations.to(self._device)
+
+        tcrs = self._generate_tcr_series(instances)
+        tokenised_tcrs = self._tokenise(tcrs)
+        return self._calc_representations_of_tokenised(tokenised_tcrs)
+
+    @torch.no_grad()
+    def _calc_representations_of_tokenised(
+        self, tokenised_tcrs: TokenisedTcrs
+    ) -> FloatTensor:
+        representations = torch.empty(
+            (len(tokenised_tcrs.lengths), self._bert.d_model), device=self._device
+        )
+
+        for batch_indices, _, batch_representation in self._iter_batch_outputs(
+            tokenised_tcrs, self._get_vector_representations_of
+        ):
+            representations[
+                torch.from_numpy(batch_indices).to(self._device)
+            ] = batch_representation.float()
+
+        return representations
+
+    def _iter_batch_outputs(
+        self,
+        tokenised_tcrs: TokenisedTcrs,
+        forward: Callable[[LongTensor], Any],
+    ) -> Iterator[Tuple[NDArray[np.int64], LongTensor, Any]]:
+        """
+        Run `forward` on each scheduled batch of `tokenised_tcrs`, yielding the
+        batch indices, the padded batch on the compute device, and the output.
+
+        Under a memory budget, a batch that runs out of memory is split in half
+        and retried, and the memory estimate is scaled up, so that any pending
+        batch too large under the new estimate is split before it is run.
+        """
+        get_max_rows = (
+            None
+            if self._memory_budget is None
+            else self._get_max_rows_within_memory_budget()
+        )
+        pending_batches = self._schedule_batches(tokenised_tcrs, get_max_rows)[::-1]
+
+        while pending_batches:
+            batch_indices = pending_batches.pop()
+
+            if get_max_rows is not None:
+                max_rows = get_max_rows(
+                    int(tokenised_tcrs.lengths[batch_indices].max())
+                )
+
+                if len(batch_indices) > max_rows:
+                    pending_batches.extend(
+                        np.array_split(
+                            batch_indices, -(-len(batch_indices) // max_rows)
+                        )[::-1]
+                    )
+                    continue
+
+            padded_batch = self._get_padded_batch(tokenised_tcrs, batch_indices)
+
+            with self._stage("transfer"):
+                padded_batch = padded_batch.to(self._device)
+
+            try:
+                with self._stage("forward"):
+                    output = forward(padded_batch)
+            except RuntimeError as error:
+                if (
+                    self._memory_budget is None
+                    or len(batch_indices) == 1
+                    or not is_out_of_memory_error(error)
+                ):
+                    raise
+
+                del padded_batch
+                self._handle_out_of_memory(len(batch_indices))
+                half = len(batch_indices) // 2
+                pending_batches.extend((batch_indices[half:], batch_indices[:half]))
+                continue
+
+            yield batch_indices, padded_batch, output
+
+    def _handle_out_of_memory(self, num_rows: int) -> None:
+        if self._device.type == "cuda":
+            torch.cuda.empty_cache()
+
+        self._memory_estimate_scale *= 2
+        logger.debug(
+            f"{self} ({self.name}) ran out of memory on a batch of {num_rows} TCRs, splitting it and scaling the memory estimate by {self._memory_estimate_scale}"
+        )
+
+    def _get_max_rows_within_memory_budget(self) -> Callable[[int], int]:
+        """
+        Get a function mapping a batch width to the largest number of rows of
+        that width that fit within the memory budget. The memory model and the
+        budget are worked out once, while the memory estimate scale is read on
+        every call, so that it follows any out of memory splits.
+        """
+        memory_model = ActivationMemoryModel(self._bert, self._compute_dtype)
+        memory_budget = self._get_memory_budget_bytes()
+
+        return lambda width: memory_model.get_max_rows(
+            width, memory_budget / self._memory_estimate_scale
+        )
+
+    def _get_memory_budget_bytes(self) -> int:
+        if self._memory_budget != "auto":
+            return self._memory_budget
+
+        num_processes = (
+            1 if self._inference_pool is None else self._inference_pool.num_workers
+        )
+        return _get_free_memory_bytes(self._device) // (2 * num_processes)
+
+    def _get_residue_representations_of(self, padded_batch: LongTensor) -> FloatTensor:
+        raw_token_embeddings = self._bert._embed(padded_batch).to(self._compute_dtype)
+        padding_mask = self._bert._get_padding_mask(padded_batch)
+        residue_reps = (
+            self._bert._self_attention_stack.get_token_embeddings_at_penultimate_layer(
+                raw_token_embeddings, padding_mask
+            )
+        )
+        return residue_reps[:, 1:, :] * padding_mask[:, 1:, None].logical_not()
+
+    def _get_vector_representations_of(self, padded_batch: LongTensor) -> FloatTensor:
+        """
+        Equivalent to `self._bert.get_vector_representations_of`, except that
+        token embeddings are cast to the compute precision of this instance
+        before being passed through the self-attention stack. If an inference
+        graph is loaded, it is run instead.
+        """
+        if self._inference_graph is not None and not self._is_quantised:
+            return self._inference_graph(padded_batch)
+
+        raw_token_embeddings = self._bert._embed(padded_batch).to(self._compute_dtype)
+        padding_mask = self._bert._get_padding_mask(padded_batch)
+        return self._bert._vector_representation_delegate.get_vector_representations_of(
+            raw_token_embeddings, padding_mask
+        )
+
+    def _calc_representations_with(
+        self, bert: Bert, tokenised_tcrs: TokenisedTcrs
+    ) -> NDArray[np.float32]:
+        model = Sceptr(name=self.name, tokeniser=self._tokeniser, bert=bert)
+        return model._calc_representations_of_tokenised(tokenised_tcrs).numpy()
+
+    def _to_output_array(self, values: FloatTensor) -> NDArray:
+        with self._stage("output"):
+            return values.to(self._output_dtype).cpu().numpy()
+
+    def _reset_embedding_cache(self) -> None:
+        if self._embedding_cache is not None:
+            self._embedding_cache = EmbeddingCache(
+                self._embedding_cache._max_entries, self._embedding_cache._max_bytes
+            )
+
+    def _generate_tcr_series(self, instances: DataFrame) -> Series:
+        with self._stage("parse") as counters:
+            counters.num_rows = len(instances)
+            tcr_columns = instances.reindex(columns=list(TCR_COLUMNS))
+            return schema.generate_tcr_series(tcr_columns)
+
+    def _tokenise_reference_tcrs(self) -> TokenisedTcrs:
+        """
+        Tokenise the bundled reference TCRs. These are human TCRs, so SCEPTR is
+        temporarily set up for Homo sapiens if needed.
+        """
+        species = schema.tcr.SPECIES
+
+        try:
+            if species != "homosapiens":
+                libtcrlm.setup("homosapiens")
+
+            reference_tcrs = self._generate_tcr_series(load_reference_tcrs())
+            return self._tokenise(reference_tcrs)
+        finally:
+            if species != "homosapiens":
+                libtcrlm.setup(species)
+
+    def _tokenise(self, tcrs: Series) -> TokenisedTcrs:
+        with self._stage("tokenise") as counters:
+            tokenised_tcrs = tokenise_tcrs(
+                self._tokeniser, tcrs, self._get_germline_cdr_table()
+            )
+            counters.num_tokens = int(tokenised_tcrs.lengths.sum())
+
+        return tokenised_tcrs
+
+    def _get_padded_batch(
+        self, tokenised_tcrs: TokenisedTcrs, batch_indices: NDArray[np.int64]
+    ) -> LongTensor:
+        with self._stage("pad") as counters:
+            padded_batch = tokenised_tcrs.get_padded_batch(batch_indices)
+            num_rows, batch_width = padded_batch.shape[:2]
+            num_tokens = int(tokenised_tcrs.lengths[batch_indices].sum())
+            counters.num_padding_tokens = num_rows * batch_width - num_tokens
+
+        return padded_batch
+
+    def _stage(self, name: str) -> ContextManager[StageCounters]:
+        if self._instrumentation is None:
+            return DISABLED_STAGE
+
+        return self._instrumentation.stage(name, self._device)
+
+    def _get_germline_cdr_table(self) -> GermlineCdrTable:
+        species = schema.tcr.SPECIES
+
+        if species not in self._germline_cdr_tables:
+            self._germline_cdr_tables[species] = GermlineCdrTable(species)
+
+        return self._germline_cdr_tables[species]
+
+    def _schedule_batches(
+        self,
+        tokenised_tcrs: TokenisedTcrs,
+        get_max_rows: Optional[Callable[[int], int]],
+    ) -> list:
+        if get_max_rows is not None:
+            return schedule_batches(
+                tokenised_tcrs.lengths, self._batch_size, get_max_rows=get_max_rows
+            )
+
+        return schedule_batches(
+            tokenised_tcrs.lengths, self._batch_size, self._token_budget
+        )
+
+    def calc_cdist_matrix(
+        self,
+        anchors: Union[DataFrame, EmbeddingStore],
+        comparisons: Union[DataFrame, EmbeddingStore],
+        out: Union[NDArray, str, os.PathLike, None] = None,
+        resume: bool = False,
+    ) -> NDArray[np.float32]:
+        """
+        Generate a cdist matrix between two collections of TCRs.
+
+        Parameters
+        ----------
+        anchors : DataFrame or EmbeddingStore
+            DataFrame specifying the first (anchor) collection of input TCRs.
+            It must be in the :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        comparisons : DataFrame or EmbeddingStore
+            DataFrame specifying the second (comparison) collection of input
+            TCRs. It must be in the :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        out : NDArray, str, os.PathLike or None
+            If given, the matrix is computed a block of rows at a time and
+            written straight into `out`, so that it never has to fit in memory
+            as a whole. This can be an array of the right shape and of dtype
+            float32 or float16, such as a :py:class:`numpy.memmap`, or a path
+            at which to create a ``.npy`` file (which can later be opened with
+            ``numpy.load(path, mmap_mode="r")``), in the model's
+            :py:meth:`output precision
+            <sceptr.model.Sceptr.set_output_precision>`. Peak memory use is
+            then set by :py:meth:`~sceptr.model.Sceptr.set_tile_size` rather
+            than by the size of the matrix. Defaults to None.
+
+        resume : bool
+            If True and `out` is a path or :py:class:`numpy.memmap`, resume an
+            earlier call with the same arguments that was interrupted, skipping
+            rows that it already wrote. Progress is recorded in a file next to
+            `out` with the suffix ``.progress``, which is removed when the
+            matrix is complete. Defaults to False.
+
+        Returns
+        -------
+        NDArray[numpy.float32]
+            A 2D numpy ndarray representing a cdist matrix between TCRs from
+            `anchors` and `comparisons`. The returned array will have shape
+            :math:`(X, Y)` where :math:`X` is the number of TCRs in `anchors`
+            and :math:`Y` is the number of TCRs in `comparisons`. If `out` is
+            given, the array written to is returned.
+        """
+        if resume and out is None:
+            raise ValueError("resume can only be used together with out.")
+
+        (
+            anchor_representations,
+            anchor_inverse,
+        ) = self._calc_deduplicated_torch_representations(anchors)
+        (
+            comparison_representations,
+            comparison_inverse,
+        ) = self._calc_deduplicated_torch_representations(comparisons)
+
+        if out is not None:
+            return self._write_cdist_matrix(
+                anchor_representations,
+                anchor_inverse,
+                comparison_representations,
+                comparison_inverse,
+                out,
+                resume,
+            )
+
+        with self._stage("distance"):
+            cdist_matrix = torch.cdist(
+                anchor_representations, comparison_representations, p=2
+            )
+            cdist_matrix = self._expand_deduplicated(cdist_matrix, anchor_inverse)
+            cdist_matrix = self._expand_deduplicated(
+                cdist_matrix.T, comparison_inverse
+            ).T
+
+        return self._to_output_array(cdist_matrix)
+
+    def calc_pdist_vector(
+        self,
+        instances: Union[DataFrame, EmbeddingStore],
+        out: Union[NDArray, str, os.PathLike, None] = None,
+        resume: bool = False,
+    ) -> NDArray[np.float32]:
+        r"""
+        Generate a pdist vector of distances between each pair of TCRs in the
+        input data.
+
+        Parameters
+        ----------
+        instances : DataFrame or EmbeddingStore
+            DataFrame specifying the input TCRs. It must be in the
+            :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        out : NDArray, str, os.PathLike or None
+            If given, the vector is computed a block at a time and written
+            straight into `out`, as described for
+            :py:meth:`~sceptr.model.Sceptr.calc_cdist_matrix`. Defaults to
+            None.
+
+        resume : bool
+            If True and `out` is a path or :py:class:`numpy.memmap`, resume an
+            earlier call with the same arguments that was interrupted, as
+            described for :py:meth:`~sceptr.model.Sceptr.calc_cdist_matrix`.
+            Defaults to False.
+
+        Returns
+        -------
+        NDArray[numpy.float32]
+            A 1D numpy ndarray representing a pdist vector of distances between
+            each pair of TCRs in `instances`. The returned array will have
+            shape :math:`(\frac{1}{2}N(N-1),)`, where :math:`N` is the number
+            of TCRs in `instances`. If `out` is given, the array written to is
+            returned.
+        """
+        if resume and out is None:
+            raise ValueError("resume can only be used together with out.")
+
+        representations, inverse = self._calc_deduplicated_torch_representations(
+            instances
+        )
+
+        if out is not None:
+            return self._write_pdist_vector(representations, inverse, out, resume)
+
+        num_unique = len(representations)
+        num_instances = len(inverse)
+
+        if num_unique**2 > num_instances * (num_instances - 1) // 2:
+            with self._stage("distance"):
+                representations = self._expand_deduplicated(representations, inverse)
+                pdist_vector = torch.pdist(representations, p=2)
+
+            return self._to_output_array(pdist_vector)
+
+        return self._calc_pdist_vector_from_unique(representations, inverse)
+
+    def _calc_pdist_vector_from_unique(
+        self, unique_representations: FloatTensor, inverse: NDArray[np.int64]
+    ) -> NDArray[np.float32]:
+        """
+        Compute the pdist vector over all TCRs when many of them are
+        duplicates, by computing distances between distinct TCRs only once and
+        then scattering them into the condensed layout.
+        """
+        with self._stage("distance"):
+            unique_cdist = torch.cdist(
+                unique_representations, unique_representations, p=2
+            ).cpu()
+            unique_cdist.fill_diagonal_(0)
+
+            unique_cdist = unique_cdist.numpy()
+            num_instances = len(inverse)
+            pdist_vector = np.empty(
+                num_instances * (num_instances - 1) // 2, dtype=np.float32
+            )
+            block_size = max(1, PDIST_SCATTER_BLOCK_ELEMENTS // max(num_instances, 1))
+
+            # Each block of rows of the full cdist matrix is gathered from the
+            # distinct TCR distances at once, and the part of it above the main
+            # diagonal is the next contiguous run of the pdist vector
+            for start in range(0, num_instances - 1, block_size):
+                stop = min(start + block_size, num_instances - 1)
+                block_distances = np.take(
+                    unique_cdist[inverse[start:stop]], inverse[start + 1 :], axis=1
+                )
+                block_rows = np.arange(start, stop)
+                block_cols = np.arange(start + 1, num_instances)
+                is_above_diagonal = block_rows[:, None] < block_cols[None, :]
+
+                offset_start = _get_condensed_offset(start, num_instances)
+                offset_stop = _get_condensed_offset(stop, num_instances)
+                pdist_vector[offset_start:offset_stop] = block_distances[
+                    is_above_diagonal
+                ]
+
+        return self._to_output_array(torch.from_numpy(pdist_vector))
+
+    def _write_cdist_matrix(
+        self,
+        anchor_representations: FloatTensor,
+        anchor_inverse: NDArray[np.int64],
+        comparison_representations: FloatTensor,
+        comparison_inverse: NDArray[np.int64],
+        out: Union[NDArray, str, os.PathLike],
+        resume: bool,
+    ) -> NDArray:
+        num_anchors = len(anchor_inverse)
+        num_comparisons = len(comparison_inverse)
+        output = self._open_distance_output(
+            out, "cdist", (num_anchors, num_comparisons), num_anchors, resume
+        )
+        anchor_inverse = torch.from_numpy(anchor_inverse).to(self._device)
+        comparison_inverse = torch.from_numpy(comparison_inverse).to(self._device)
+
+        for start, stop in self._iter_output_row_blocks(
+            output, num_anchors, lambda _: num_comparisons
+        ):
+            with self._stage("distance"):
+                cdist_block = torch.cdist(
+                    anchor_representations[anchor_inverse[start:stop]],
+                    comparison_representations,
+                    p=2,
+                )
+
+                if len(comparison_representations) < num_comparisons:
+                    cdist_block = cdist_block[:, comparison_inverse]
+
+            output.array[start:stop] = self._to_output_array(cdist_block)
+            output.record_progress(stop)
+
+        return output.finish()
+
+    def _write_pdist_vector(
+        self,
+        unique_representations: FloatTensor,
+        inverse: NDArray[np.int64],
+        out: Union[NDArray, str, os.PathLike],
+        resume: bool,
+    ) -> NDArray:
+        """
+        Write the pdist vector a block of rows of the (implicit) cdist matrix
+        at a time. The pairs of each row lie to the right of the main
+        diagonal, and rows follow one another in the condensed layout, so each
+        block of rows fills a contiguous stretch of the output.
+        """
+        num_instances = len(inverse)
+        output = self._open_distance_output(
+            out,
+            "pdist",
+            (num_instances * (num_instances - 1) // 2,),
+            num_instances,
+            resume,
+        )
+        inverse = torch.from_numpy(inverse).to(self._device)
+
+        for start, stop in self._iter_output_row_blocks(
+            output, num_instances, lambda start: num_instances - start - 1
+        ):
+            with self._stage("distance"):
+                row_inverse = inverse[start:stop]
+                column_inverse = inverse[start + 1 :]
+                cdist_block = torch.cdist(
+                    unique_representations[row_inverse],
+                    unique_representations[column_inverse],
+                    p=2,
+                )
+                cdist_block[row_inverse[:, None] == column_inverse[None, :]] = 0
+
+                rows = torch.arange(stop - start, device=self._device)
+                columns = torch.arange(num_instances - start - 1, device=self._device)
+                pdist_block = cdist_block[rows[:, None] <= columns[None, :]]
+
+            offset = start * (2 * num_instances - start - 1) // 2
+            output.array[offset : offset + len(pdist_block)] = self._to_output_array(
+                pdist_block
+            )
+            output.record_progress(stop)
+
+        return output.finish()
+
+    def _open_distance_output(
+        self,
+        out: Union[NDArray, str, os.PathLike],
+        kind: str,
+        shape: Tuple[int, ...],
+        num_rows: int,
+        resume: bool,
+    ) -> DistanceOutput:
+        return DistanceOutput.open(
+            out,
+            shape,
+            num_rows,
+            torch.empty(0, dtype=self._output_dtype).numpy().dtype,
+            {"kind": kind, "shape": list(shape), "model_name": self.name},
+            resume,
+        )
+
+    def _iter_output_row_blocks(
+        self,
+        output: DistanceOutput,
+        num_rows: int,
+        get_row_width: Callable[[int], int],
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        Yield the bounds of the blocks of rows still to be written to
+        `output`, where `get_row_width` gives the number of distances in each
+        row. Blocks hold about as many distances as a square tile, so that
+        peak memory does not grow with the number of TCRs.
+        """
+        start = output.num_rows_done
+
+        while start < num_rows:
+            block_size = max(1, self._tile_size**2 // max(1, get_row_width(start)))
+            stop = min(start + block_size, num_rows)
+            yield start, stop
+            start = stop
+
+    @torch.no_grad()
+    def calc_nearest_neighbours(
+        self,
+        anchors: Union[DataFrame, EmbeddingStore],
+        comparisons: Union[DataFrame, EmbeddingStore],
+        k: int,
+    ) -> Tuple[NDArray[np.int64], NDArray[np.float32]]:
+        """
+        For each TCR in `anchors`, find the `k` closest TCRs in `comparisons`.
+
+        Distances are computed tile by tile (see
+        :py:meth:`~sceptr.model.Sceptr.set_tile_size`) while keeping a running
+        record of the `k` nearest neighbours of each anchor, so the full cdist
+        matrix between `anchors` and `comparisons` is never held in memory.
+
+        Parameters
+        ----------
+        anchors : DataFrame or EmbeddingStore
+            DataFrame specifying the anchor TCRs, for which nearest neighbours
+            are to be found. It must be in the :ref:`prescribed format
+            <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        comparisons : DataFrame or EmbeddingStore
+            DataFrame specifying the comparison TCRs, among which nearest
+            neighbours are to be found. It must be in the :ref:`prescribed
+            format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        k : int
+            The number of nearest neighbours to find for each anchor. Must not
+            exceed the number of TCRs in `comparisons`.
+
+        Returns
+        -------
+        Tuple[NDArray[numpy.int64], NDArray[numpy.float32]]
+            A tuple of two 2D numpy ndarrays, both of shape :math:`(X, k)`
+            where :math:`X` is the number of TCRs in `anchors`. The first
+            contains the (zero-based) positional indices of the nearest
+            neighbours of each anchor within `comparisons`, and the second
+            contains the corresponding distances. Neighbours are sorted from
+            nearest to furthest.
+        """
+        if not isinstance(k, numbers.Integral) or isinstance(k, bool):
+            raise TypeError(f"k must be an int. Got {type(k)}.")
+
+        k = int(k)
+
+        if k < 1 or k > len(comparisons):
+            raise ValueError(
+                f"k must be between 1 and the number of comparison TCRs ({len(comparisons)}). Got {k}."
+            )
+
+        anchor_representations = self._calc_torch_representations(anchors)
+        comparison_representations = self._calc_torch_representations(comparisons)
+
+        num_anchors = len(anchor_representations)
+        nn_distances = torch.full((num_anchors, k), torch.inf, device=self._device)
+        nn_indices = torch.zeros(
+            (num_anchors, k), dtype=torch.long, device=self._device
+        )
+
+        for anchor_slice, comparison_slice, cdist_tile in self._iter_cdist_tiles(
+            anchor_representations, comparison_representations
+        ):
+            tile_indices = torch.arange(
+                comparison_slice.start, comparison_slice.stop, device=self._device
+            ).expand_as(cdist_tile)
+
+            candidate_distances = torch.concatenate(
+                (nn_distances[anchor_slice], cdist_tile), dim=1
+            )
+            candidate_indices = torch.concatenate(
+                (nn_indices[anchor_slice], tile_indices), dim=1
+            )
+
+            nn_distances[anchor_slice], top_k = torch.topk(
+                candidate_distances, k, dim=1, largest=False, sorted=True
+            )
+            nn_indices[anchor_slice] = torch.gather(candidate_indices, 1, top_k)
+
+        return nn_indices.cpu().numpy(), self._to_output_array(nn_distances)
+
+    def calc_cdist_radius_graph(
+        self,
+        anchors: Union[DataFrame, EmbeddingStore],
+        comparisons: Union[DataFrame, EmbeddingStore],
+        radius: float,
+    ) -> csr_array:
+        """
+        Find all pairs of TCRs between two collections that lie within a
+        given distance of each other, and return them as a sparse matrix.
+
+        Distances are computed tile by tile (see
+        :py:meth:`~sceptr.model.Sceptr.set_tile_size`), and only pairs within
+        `radius` are kept, so memory use grows with the number of neighbouring
+        pairs rather than with the size of the full cdist matrix.
+
+        Parameters
+        ----------
+        anchors : DataFrame or EmbeddingStore
+            DataFrame specifying the first (anchor) collection of input TCRs.
+            It must be in the :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        comparisons : DataFrame or EmbeddingStore
+            DataFrame specifying the second (comparison) collection of input
+            TCRs. It must be in the :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        radius : float
+            Pairs of TCRs at a distance less than or equal to `radius` are
+            considered neighbours.
+
+        Returns
+        -------
+        scipy.sparse.csr_array
+            A sparse array in compressed sparse row format, of shape
+            :math:`(X, Y)` where :math:`X` is the number of TCRs in `anchors`
+            and :math:`Y` is the number of TCRs in `comparisons`. Entry
+            :math:`(i, j)` is stored if and only if the :math:`i`-th anchor and
+            the :math:`j`-th comparison TCR are neighbours, in which case its
+            value is the distance between them. Note that neighbouring pairs at
+            a distance of exactly zero (e.g. identical TCRs) are stored as
+            explicit zeros.
+        """
+        anchor_representations = self._calc_torch_representations(anchors)
+        comparison_representations = self._calc_torch_representations(comparisons)
+        return self._calc_radius_graph(
+            anchor_representations, comparison_representations, radius
+        )
+
+    def calc_pdist_radius_graph(
+        self, instances: Union[DataFrame, EmbeddingStore], radius: float
+    ) -> csr_array:
+        r"""
+        Find all pairs of TCRs within a collection that lie within a given
+        distance of each other, and return them as a sparse matrix.
+
+        Distances are computed tile by tile (see
+        :py:meth:`~sceptr.model.Sceptr.set_tile_size`), and only pairs within
+        `radius` are kept, so memory use grows with the number of neighbouring
+        pairs rather than with the size of the full pdist vector.
+
+        Parameters
+        ----------
+        instances : DataFrame or EmbeddingStore
+            DataFrame specifying the input TCRs. It must be in the
+            :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        radius : float
+            Pairs of TCRs at a distance less than or equal to `radius` are
+            considered neighbours.
+
+        Returns
+        -------
+        scipy.sparse.csr_array
+            A symmetric sparse array in compressed sparse row format, of shape
+            :math:`(N, N)` where :math:`N` is the number of TCRs in
+            `instances`. Entry :math:`(i, j)` is stored if and only if
+            :math:`i \neq j` and the :math:`i`-th and :math:`j`-th TCRs are
+            neighbours, in which case its value is the distance between them.
+            Note that neighbouring pairs at a distance of exactly zero (e.g.
+            duplicate TCRs) are stored as explicit zeros.
+        """
+        representations = self._calc_torch_representations(instances)
+        return self._calc_radius_graph(
+            representations, representations, radius, exclude_self=True
+        )
+
+    @torch.no_grad()
+    def _calc_radius_graph(
+        self,
+        anchor_representations: FloatTensor,
+        comparison_representations: FloatTensor,
+        radius: float,
+        exclude_self: bool = False,
+    ) -> csr_array:
+        row_indices = [np.empty(0, dtype=np.int64)]
+        col_indices = [np.empty(0, dtype=np.int64)]
+        distances = [np.empty(0, dtype=np.float32)]
+
+        for anchor_slice, comparison_slice, cdist_tile in self._iter_cdist_tiles(
+            anchor_representations,
+            comparison_representations,
+            upper_triangle_only=exclude_self,
+        ):
+            within_radius = cdist_tile <= radius
+
+            if exclude_self:
+                within_radius &= self._get_upper_triangle_mask(
+                    anchor_slice, comparison_slice
+                )
+
+            tile_row_indices, tile_col_indices = torch.nonzero(
+                within_radius, as_tuple=True
+            )
+            distances.append(cdist_tile[within_radius].cpu().numpy())
+            row_indices.append((tile_row_indices + anchor_slice.start).cpu().numpy())
+            col_indices.append(
+                (tile_col_indices + comparison_slice.start).cpu().numpy()
+            )
+
+        row_indices = np.concatenate(row_indices, dtype=np.int64)
+        col_indices = np.concatenate(col_indices, dtype=np.int64)
+        distances = np.concatenate(distances, dtype=np.float32)
+
+        if exclude_self:
+            row_indices, col_indices = (
+                np.concatenate((row_indices, col_indices)),
+                np.concatenate((col_indices, row_indices)),
+            )
+            distances = np.concatenate((distances, distances))
+
+        ordering = np.lexsort((col_indices, row_indices))
+        indptr = np.zeros(len(anchor_representations) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(row_indices, minlength=len(anchor_representations)),
+            out=indptr[1:],
+        )
+
+        return csr_array(
+            (distances[ordering], col_indices[ordering], indptr),
+            shape=(len(anchor_representations), len(comparison_representations)),
+        )
+
+    def calc_cdist_histogram(
+        self,
+        anchors: Union[DataFrame, EmbeddingStore],
+        comparisons: Union[DataFrame, EmbeddingStore],
+        bins: Optional[Iterable[float]] = None,
+        per_anchor: bool = False,
+    ) -> NDArray[np.int64]:
+        """
+        Count the distances between two collections of TCRs into bins, in the
+        manner of :py:func:`numpy.histogram`.
+
+        Distances are computed tile by tile (see
+        :py:meth:`~sceptr.model.Sceptr.set_tile_size`) and counted as they
+        are computed, so the full cdist matrix is never held in memory.
+
+        Parameters
+        ----------
+        anchors : DataFrame or EmbeddingStore
+            DataFrame specifying the first (anchor) collection of input TCRs.
+            It must be in the :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        comparisons : DataFrame or EmbeddingStore
+            DataFrame specifying the second (comparison) collection of input
+            TCRs. It must be in the :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        bins : Iterable[float] or None
+            Monotonically increasing bin edges. As with
+            :py:func:`numpy.histogram`, all bins but the last are half-open,
+            the last bin also includes its right edge, and distances outside
+            the bins are not counted. Defaults to the model's
+            ``distance_bins``, 20 bins of width 0.1 spanning 0 to 2.
+
+        per_anchor : bool
+            If True, return a separate histogram for each anchor TCR, of its
+            distances to all comparison TCRs. Defaults to False.
+
+        Returns
+        -------
+        NDArray[numpy.int64]
+            An array of shape :math:`(B,)` holding the number of distances
+            falling in each of the :math:`B` bins, or of shape :math:`(X, B)`
+            if `per_anchor` is set, where :math:`X` is the number of TCRs in
+            `anchors`.
+        """
+        bin_edges = self._get_bin_edges(bins)
+        (
+            anchor_representations,
+            anchor_inverse,
+        ) = self._calc_deduplicated_torch_representations(anchors)
+        (
+            comparison_representations,
+            comparison_inverse,
+        ) = self._calc_deduplicated_torch_representations(comparisons)
+        comparison_counts = self._get_duplicate_counts(
+            comparison_inverse, len(comparison_representations)
+        )
+
+        histograms = torch.zeros(
+            (len(anchor_representations), len(bin_edges) - 1),
+            dtype=torch.float64,
+            device=self._device,
+        )
+
+        for anchor_slice, comparison_slice, cdist_tile in self._iter_cdist_tiles(
+            anchor_representations, comparison_representations
+        ):
+            bin_indices = _get_bin_indices(cdist_tile, bin_edges)
+            histograms[anchor_slice] += _count_bins(
+                bin_indices, comparison_counts[comparison_slice], len(bin_edges) - 1
+            )
+
+        if per_anchor:
+            histograms = self._expand_deduplicated(histograms, anchor_inverse)
+        else:
+            anchor_counts = self._get_duplicate_counts(
+                anchor_inverse, len(anchor_representations)
+            )
+            histograms = anchor_counts @ histograms
+
+        return self._to_histogram_output(histograms)
+
+    def calc_pdist_histogram(
+        self,
+        instances: Union[DataFrame, EmbeddingStore],
+        bins: Optional[Iterable[float]] = None,
+        per_instance: bool = False,
+    ) -> NDArray[np.int64]:
+        """
+        Count the distances between each pair of TCRs in the input data into
+        bins, in the manner of :py:func:`numpy.histogram`. This is equivalent
+        to, but far less memory-hungry than, taking the histogram of the
+        output of :py:meth:`~sceptr.model.Sceptr.calc_pdist_vector`.
+
+        Distances are computed tile by tile (see
+        :py:meth:`~sceptr.model.Sceptr.set_tile_size`) and counted as they
+        are computed, so memory use grows only linearly with the number of
+        TCRs.
+
+        Parameters
+        ----------
+        instances : DataFrame or EmbeddingStore
+            DataFrame specifying the input TCRs. It must be in the
+            :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        bins : Iterable[float] or None
+            Monotonically increasing bin edges, as described for
+            :py:meth:`~sceptr.model.Sceptr.calc_cdist_histogram`. Defaults to
+            the model's ``distance_bins``.
+
+        per_instance : bool
+            If True, return a separate histogram for each TCR, of its distances
+            to all other TCRs in `instances`, such as to profile the density of
+            each TCR's neighbourhood. Defaults to False.
+
+        Returns
+        -------
+        NDArray[numpy.int64]
+            An array of shape :math:`(B,)` holding the number of pairs of TCRs
+            whose distance falls in each of the :math:`B` bins, with each pair
+            counted once, or of shape :math:`(N, B)` if `per_instance` is set,
+            where :math:`N` is the number of TCRs in `instances`.
+        """
+        bin_edges = self._get_bin_edges(bins)
+        representations, inverse = self._calc_deduplicated_torch_representations(
+            instances
+        )
+        counts = self._get_duplicate_counts(inverse, len(representations))
+
+        histograms = torch.zeros(
+            (len(representations), len(bin_edges) - 1),
+            dtype=torch.float64,
+            device=self._device,
+        )
+
+        num_bins = len(bin_edges) - 1
+
+        # Each pair of distinct TCRs is counted once from the upper triangle of
+        # the cdist matrix, into the histogram of the row TCR (weighted by the
+        # number of duplicates of the column TCR) and, per instance, also into
+        # that of the column TCR
+        for anchor_slice, comparison_slice, cdist_tile in self._iter_cdist_tiles(
+            representations, representations, upper_triangle_only=True
+        ):
+            is_counted = (
+                self._get_upper_triangle_mask(anchor_slice, comparison_slice)
+                if comparison_slice.start < anchor_slice.stop
+                else None
+            )
+            bin_indices = _get_bin_indices(cdist_tile, bin_edges, is_counted)
+            histograms[anchor_slice] += _count_bins(
+                bin_indices, counts[comparison_slice], num_bins
+            )
+
+            if per_instance:
+                histograms[comparison_slice] += _count_bins(
+                    bin_indices.T, counts[anchor_slice], num_bins
+                )
+
+        # Duplicates of a TCR are at a distance of zero from one another
+        zero_distance_bin = torch.from_numpy(
+            np.histogram([0.0], bin_edges.cpu().numpy())[0]
+        ).to(self._device)
+
+        if per_instance:
+            histograms += (counts - 1)[:, None] * zero_distance_bin
+            histograms = self._expand_deduplicated(histograms, inverse)
+        else:
+            histograms = counts @ histograms
+            histograms += (counts * (counts - 1) / 2).sum() * zero_distance_bin
+
+        return self._to_histogram_output(histograms)
+
+    def calc_cdist_neighbour_counts(
+        self,
+        anchors: Union[DataFrame, EmbeddingStore],
+        comparisons: Union[
+            DataFrame, EmbeddingStore, List[Union[DataFrame, EmbeddingStore]]
+        ],
+        radii: Union[float, Iterable[float]],
+    ) -> Union[NDArray[np.int64], List[NDArray[np.int64]]]:
+        """
+        Count, for each anchor TCR, the number of comparison TCRs within one or
+        more distances of it, such as to measure the density of each TCR's
+        neighbourhood in a background repertoire.
+
+        Only the counts are kept, so memory use grows only linearly with the
+        number of TCRs. Distances are computed in blocks of at most
+        ``tile_size ** 2`` (see :py:meth:`~sceptr.model.Sceptr.set_tile_size`),
+        and blocks of anchors are only compared against the comparison TCRs
+        that could lie within the largest radius of them, which is decided
+        from the TCRs' projections onto the principal axis of the comparison
+        representations. This saves the most work at small radii.
+
+        Parameters
+        ----------
+        anchors : DataFrame or EmbeddingStore
+            DataFrame specifying the anchor TCRs to count neighbours for. It
+            must be in the :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        comparisons : DataFrame or EmbeddingStore, or a list thereof
+            DataFrame specifying the comparison TCRs to count as neighbours. It
+            must be in the :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations, or a list of either to count
+            neighbours in several comparison collections at once.
+
+        radii : float or Iterable[float]
+            One or more non-negative distances. Comparison TCRs at a distance
+            less than or equal to a radius from an anchor TCR are counted as
+            its neighbours.
+
+        Returns
+        -------
+        NDArray[numpy.int64] or List[NDArray[numpy.int64]]
+            An array of shape :math:`(X,)` if `radii` is a single number, or of
+            shape :math:`(X, R)` for :math:`R` radii, where :math:`X` is the
+            number of TCRs in `anchors`, holding the number of neighbours of
+            each anchor TCR within each radius. If `comparisons` is a list, a
+            list of such arrays is returned, one per comparison collection.
+        """
+        radii_tensor = self._get_radii(radii)
+        (
+            anchor_representations,
+            anchor_inverse,
+        ) = self._calc_deduplicated_torch_representations(anchors)
+
+        is_single_comparison = not isinstance(comparisons, (list, tuple))
+        if is_single_comparison:
+            comparisons = [comparisons]
+
+        neighbour_counts = []
+
+        for comparison_collection in comparisons:
+            (
+                comparison_representations,
+                comparison_inverse,
+            ) = self._calc_deduplicated_torch_representations(comparison_collection)
+            comparison_counts = self._get_duplicate_counts(
+                comparison_inverse, len(comparison_representations)
+            )
+
+            with self._stage("distance"):
+                counts = count_neighbours(
+                    anchor_representations,
+                    comparison_representations,
+                    comparison_counts,
+                    radii_tensor,
+                    self._tile_size**2,
+                )
+
+            counts = self._expand_deduplicated(counts, anchor_inverse)
+            neighbour_counts.append(self._to_neighbour_count_output(counts, radii))
+
+        if is_single_comparison:
+            return neighbour_counts[0]
+
+        return neighbour_counts
+
+    def calc_pdist_neighbour_counts(
+        self,
+        instances: Union[DataFrame, EmbeddingStore],
+        radii: Union[float, Iterable[float]],
+    ) -> NDArray[np.int64]:
+        """
+        Count, for each TCR in the input data, the number of other TCRs in the
+        input data within one or more distances of it, such as to measure the
+        density of each TCR's neighbourhood in its own repertoire. Each TCR's
+        duplicates are counted as its neighbours, but the TCR itself is not.
+
+        Memory use grows only linearly with the number of TCRs, and the
+        computation is pruned as described for
+        :py:meth:`~sceptr.model.Sceptr.calc_cdist_neighbour_counts`.
+
+        Parameters
+        ----------
+        instances : DataFrame or EmbeddingStore
+            DataFrame specifying the input TCRs. It must be in the
+            :ref:`prescribed format <data_format>`.
+            Alternatively, an :py:class:`~sceptr.store.EmbeddingStore`
+            holding precomputed representations.
+
+        radii : float or Iterable[float]
+            One or more non-negative distances. TCRs at a distance less than or
+            equal to a radius from one another are counted as neighbours.
+
+        Returns
+        -------
+        NDArray[numpy.int64]
+            An array of shape :math:`(N,)` if `radii` is a single number, or of
+            shape :math:`(N, R)` for :math:`R` radii, where :math:`N` is the
+            number of TCRs in `instances`, holding the number of neighbours of
+            each TCR within each radius.
+        """
+        radii_tensor = self._get_radii(radii)
+        representations, inverse = self._calc_deduplicated_torch_representations(
+            instances
+        )
+        duplicate_counts = self._get_duplicate_counts(inverse, len(representations))
+
+        with self._stage("distance"):
+            counts = count_neighbours(
+                representations,
+                representations,
+                duplicate_counts,
+                radii_tensor,
+                self._tile_size**2,
+                exclude_self=True,
+            )
+
+        # Duplicates of a TCR are at a distance of zero from one another, and
+        # so are neighbours at any radius
+        counts += (duplicate_counts - 1)[:, None]
+        counts = self._expand_deduplicated(counts, inverse)
+
+        return self._to_neighbour_count_output(counts, radii)
+
+    def _get_radii(self, radii: Union[float, Iterable[float]]) -> FloatTensor:
+        radii_array = np.asarray(radii)
+
+        if not np.issubdtype(radii_array.dtype, np.number) or np.issubdtype(
+            radii_array.dtype, np.complexfloating
+        ):
+            raise TypeError(f"radii must be a number or numbers. Got {radii}.")
+
+        if (
+            radii_array.ndim > 1
+            or radii_array.size == 0
+            or not np.all(np.isfinite(radii_array))
+            or np.any(radii_array < 0)
+        ):
+            raise ValueError(
+                f"radii must be one or a 1D sequence of non-negative numbers. Got {radii}."
+            )
+
+        return torch.tensor(
+            radii_array.reshape(-1), dtype=torch.float32, device=self._device
+        )
+
+    def _to_neighbour_count_output(
+        self, counts: torch.Tensor, radii: Union[float, Iterable[float]]
+    ) -> NDArray[np.int64]:
+        if np.ndim(radii) == 0:
+            counts = counts[:, 0]
+
+        return self._to_histogram_output(counts)
+
+    def _get_bin_edges(self, bins: Optional[Iterable[float]]) -> FloatTensor:
+        bin_edges = np.asarray(self.distance_bins if bins is None else bins)
+
+        if bin_edges.ndim != 1 or len(bin_edges) < 2:
+            raise ValueError(
+                f"bins must be a 1D sequence of at least two bin edges. Got {bins}."
+            )
+
+        if not np.issubdtype(bin_edges.dtype, np.number) or np.any(
+            np.diff(bin_edges) <= 0
+        ):
+            raise ValueError(f"bins must increase monotonically. Got {bins}.")
+
+        return torch.tensor(bin_edges, dtype=torch.float32, device=self._device)
+
+    def _get_duplicate_counts(
+        self, inverse: NDArray[np.int64], num_unique: int
+    ) -> torch.Tensor:
+        counts = np.bincount(inverse, minlength=num_unique)
+        return torch.from_numpy(counts).to(self._device, torch.float64)
+
+    def _to_histogram_output(self, histograms: torch.Tensor) -> NDArray[np.int64]:
+        # Counts are accumulated as float64 so that they can be weighted by
+        # the number of duplicates of each TCR, and are exact up to 2**53
+        with self._stage("output"):
+            return histograms.round().to(torch.int64).cpu().numpy()
+
+    def _iter_cdist_tiles(
+        self,
+        anchor_representations: FloatTensor,
+        comparison_representations: FloatTensor,
+        upper_triangle_only: bool = False,
+    ) -> Iterator[Tuple[slice, slice, FloatTensor]]:
+        """
+        Yield tiles of the cdist matrix between the given representations,
+        along with the anchor and comparison index slices they cover. Tiles
+        are yielded in row-major order. If `upper_triangle_only` is set, tiles
+        lying entirely below the main diagonal are skipped.
+
+        Each tile is yielded from inside a single distance stage, so that the
+        computation of the tile and the caller's processing of it are recorded
+        together, once per tile.
+        """
+        num_anchors = len(anchor_representations)
+        num_comparisons = len(comparison_representations)
+
+        for anchor_idx in range(0, num_anchors, self._tile_size):
+            anchor_slice = slice(
+                anchor_idx, min(anchor_idx + self._tile_size, num_anchors)
+            )
+            first_comparison_idx = anchor_idx if upper_triangle_only else 0
+
+            for comparison_idx in range(
+                first_comparison_idx, num_comparisons, self._tile_size
+            ):
+                comparison_slice = slice(
+                    comparison_idx,
+                    min(comparison_idx + self._tile_size, num_comparisons),
+                )
+                with self._stage("distance"):
+                    cdist_tile = torch.cdist(
+                        anchor_representations[anchor_slice],
+                        comparison_representations[comparison_slice],
+                        p=2,
+                    )
+                    yield anchor_slice, comparison_slice, cdist_tile
+
+    def _get_upper_triangle_mask(
+        self, anchor_slice: slice, comparison_slice: slice
+    ) -> torch.BoolTensor:
+        tile_rows = torch.arange(
+            anchor_slice.start, anchor_slice.stop, device=self._device
+        )
+        tile_cols = torch.arange(
+            comparison_slice.start, comparison_slice.stop, device=self._device
+        )
+        return tile_rows[:, None] < tile_cols[None, :]
+
+
+def _get_condensed_offset(row: int, num_instances: int) -> int:
+    """
+    Get the position in a condensed pdist vector over `num_instances` items at
+    which the distances from item `row` to the items after it begin.
+    """
+    return row * (2 * num_instances - row - 1) // 2
+
+
+def _get_bin_indices(
+    distances: FloatTensor,
+    bin_edges: FloatTensor,
+    is_counted: Optional[torch.BoolTensor] = None,
+) -> LongTensor:
+    """
+    Find which of the bins delimited by `bin_edges` each distance falls in,
+    following the binning rules of numpy.histogram. Bins are numbered from 1,
+    with 0 standing for distances below the bins, and one past the last bin
+    for distances above the bins or not to be counted.
+    """
+    num_bins = len(bin_edges) - 1
+    bin_indices = torch.bucketize(distances.float(), bin_edges, right=True)
+    bin_indices[distances == bin_edges[-1]] = num_bins
+
+    if is_counted is not None:
+        bin_indices.masked_fill_(is_counted.logical_not(), num_bins + 1)
+
+    return bin_indices
+
+
+def _count_bins(
+    bin_indices: LongTensor, column_weights: torch.Tensor, num_bins: int
+) -> torch.Tensor:
+    """
+    Count each row of `bin_indices` into a histogram, weighting each column by
+    `column_weights`. Returns float64 counts of shape (num_rows, num_bins).
+    """
+    num_rows = len(bin_indices)
+    counts = torch.zeros(
+        (num_rows, num_bins + 2), dtype=torch.float64, device=bin_indices.device
+    )
+    counts.scatter_add_(1, bin_indices, column_weights.expand(num_rows, -1))
+    return counts[:, 1:-1]
+
+
+def _get_hardware_accelerated_device() -> torch.device:
+    if torch.cuda.is_available():
+        return torch.device("cuda")
 
     # Below is commented out for now until MPS support is more stable / complete
     # if torch.mps.is_available():
     #     return torch.device("mps")
 
     return torch.device("cpu")
+
+
+def _get_bert_on_device(bert: Bert, device: torch.device) -> Bert:
+    """
+    Return `bert` if it is already on `device`, or else a copy of it moved to
+    `device`. Models are never moved in place, as the weights of variants
+    loaded through :py:mod:`sceptr.variant` are shared between instances.
+    """
+    current_device = next(bert.parameters()).device
+
+    if current_device.type == device.type and device.index in (
+        None,
+        current_device.index,
+    ):
+        return bert
+
+    return copy.deepcopy(bert).to(device)
+
+
+def _get_selected_compartment_values(
+    compartments: Union[Iterable[Union[str, int]], str, int, None]
+) -> List[int]:
+    if compartments is None:
+        return list(range(1, len(COMPARTMENTS) + 1))
+
+    if isinstance(compartments, (str, int, np.integer)):
+        compartments = [compartments]
+
+    selected_compartments = sorted(
+        {_get_compartment_value(compartment) for compartment in compartments}
+    )
+
+    if not selected_compartments:
+        raise ValueError("At least one compartment must be selected.")
+
+    return selected_compartments
+
+
+def _get_compartment_value(compartment: Union[str, int]) -> int:
+    if isinstance(compartment, str):
+        if compartment not in COMPARTMENTS:
+            raise ValueError(
+                f"Unrecognised compartment: {compartment}. Must be one of {COMPARTMENTS}."
+            )
+        return COMPARTMENTS.index(compartment) + 1
+
+    if not isinstance(compartment, (int, np.integer)) or isinstance(compartment, bool):
+        raise TypeError(f"compartment must be a str or int. Got {type(compartment)}.")
+
+    if not 1 <= compartment <= len(COMPARTMENTS):
+        raise ValueError(
+            f"compartment must be between 1 and {len(COMPARTMENTS)}. Got {compartment}."
+        )
+
+    return int(compartment)
+
+
+def _get_free_memory_bytes(device: torch.device) -> int:
+    if device.type == "cuda":
+        free_bytes, _ = torch.cuda.mem_get_info(device)
+        return free_bytes
+
+    available_bytes = _read_available_memory_bytes()
+    if available_bytes is not None:
+        return available_bytes
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        raise RuntimeError(
+            f'Free memory cannot be measured on this platform ({sys.platform}), so the "auto" memory budget is unavailable. Pass an explicit budget in bytes to set_memory_budget instead.'
+        )
+
+
+def _read_available_memory_bytes() -> Optional[int]:
+    """
+    Read MemAvailable from /proc/meminfo where the kernel reports it. Unlike
+    the free page count, it includes page cache that can be reclaimed, such as
+    that of memory mapped weights and embedding stores.
+    """
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+
+    return None
+
+
+def _get_precision_dtype(precision: str, supported_precisions: dict) -> torch.dtype:
+    if not isinstance(precision, str):
+        raise TypeError(f"The precision must be a str. Got {type(precision)}.")
+
+    if precision not in supported_precisions:
+        raise ValueError(
+            f"The precision must be one of {list(supported_precisions)}. Got {precision}."
+        )
+
+    return supported_precisions[precision]
@@ -0,0 +1,475 @@
+"""
+Large reference repertoires are often embedded once and then compared against
+many times. This submodule provides :py:class:`~sceptr.store.EmbeddingStore`,
+which keeps TCR representations on disk in a memory-mappable format, so that
+many processes can share them without each holding a copy in memory.
+"""
+
+import json
+import numpy as np
+from numpy.typing import NDArray
+import os
+from pathlib import Path
+from sceptr._embedding_cache import (
+    TCR_COLUMNS,
+    deduplicate_tcr_keys,
+    get_tcr_keys,
+)
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+import warnings
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+    from sceptr.model import Sceptr
+
+
+FORMAT_VERSION = 1
+WRITE_CHUNK_SIZE = 100_000
+
+_METADATA_FILENAME = "metadata.json"
+_EMBEDDINGS_FILENAME = "embeddings.f32"
+_KEYS_FILENAME = "keys.tsv"
+
+
+class EmbeddingStore:
+    """
+    An on-disk store of TCR vector representations produced by a particular
+    SCEPTR model variant. Representations are saved as a flat, memory-mappable
+    float32 array, alongside an index of the TCRs they belong to and metadata
+    identifying the model variant and species that produced them.
+
+    A store is a directory, created with
+    :py:meth:`~sceptr.store.EmbeddingStore.create` and opened with
+    :py:meth:`~sceptr.store.EmbeddingStore.open`. Opening a store does not read
+    the representations into memory; they are mapped from disk and paged in
+    as needed, so that processes opening the same store share memory.
+
+    Stores can be passed to the distance methods of a
+    :py:class:`~sceptr.model.Sceptr` instance in place of a DataFrame, in
+    which case the stored representations are used directly. Each TCR is
+    stored at most once, so the rows of a store are the distinct TCRs that
+    have been written to it, in order of first appearance. TCRs are told apart
+    by the same rule as in :py:meth:`~sceptr.model.Sceptr.enable_embedding_cache`.
+
+    Attributes
+    ----------
+    path : pathlib.Path
+        The directory holding the store.
+
+    model_name : str
+        The name of the model variant that produced the stored
+        representations.
+
+    dim : int
+        The dimensionality of the stored representations.
+
+    species : str
+        The species that SCEPTR was :py:func:`set up <sceptr.setup>` for when
+        the representations were produced.
+
+    compute_precision : str
+        The :py:meth:`compute precision
+        <sceptr.model.Sceptr.set_compute_precision>` of the model when the
+        representations were produced.
+
+    quantised : bool
+        Whether the model was :py:meth:`quantised
+        <sceptr.model.Sceptr.enable_quantisation>` when the representations
+        were produced.
+
+    Examples
+    --------
+    First, we compute representations for a set of TCRs and write them to a
+    new store.
+
+    >>> import sceptr
+    >>> from sceptr import variant
+    >>> from sceptr.store import EmbeddingStore
+    >>> model = variant.default()
+    >>> store = EmbeddingStore.create("reference_store", model, reference_tcrs) # doctest: +SKIP
+
+    The store can later be opened from any process, and passed to distance
+    methods in place of a DataFrame.
+
+    >>> store = EmbeddingStore.open("reference_store") # doctest: +SKIP
+    >>> cdist = model.calc_cdist_matrix(query_tcrs, store) # doctest: +SKIP
+    """
+
+    path: Path
+    model_name: str
+    dim: int
+    species: str
+    compute_precision: str
+    quantised: bool
+
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        self.path = Path(path)
+
+        with open(self.path / _METADATA_FILENAME, "r") as f:
+            metadata = json.load(f)
+
+        if metadata["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported embedding store format version: {metadata['format_version']}."
+            )
+
+        self.model_name = metadata["model_name"]
+        self.dim = metadata["dim"]
+        self.species = metadata["species"]
+        # Stores written before these settings were recorded were produced by
+        # models in their default settings
+        self.compute_precision = metadata.get("compute_precision", "float32")
+        self.quantised = metadata.get("quantised", False)
+        self._metadata = metadata
+        self._key_to_position: Optional[Dict[Tuple[Optional[str], ...], int]] = None
+
+    @classmethod
+    def create(
+        cls, path: Union[str, os.PathLike], model: "Sceptr", instances: "DataFrame"
+    ) -> "EmbeddingStore":
+        """
+        Create a new store at `path`, holding the representations of the TCRs
+        in `instances` as computed by `model`.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            The directory to create the store in. It must not already exist.
+
+        model : :py:class:`~sceptr.model.Sceptr`
+            The model variant used to compute representations.
+
+        instances : DataFrame
+            DataFrame specifying the TCRs to store. It must be in the
+            :ref:`prescribed format <data_format>`.
+
+        Returns
+        -------
+        :py:class:`~sceptr.store.EmbeddingStore`
+            The newly created store.
+        """
+        from libtcrlm import schema
+
+        path = Path(path)
+        path.mkdir(parents=True)
+        (path / _EMBEDDINGS_FILENAME).touch()
+        (path / _KEYS_FILENAME).touch()
+
+        _write_metadata(
+            path,
+            {
+                "format_version": FORMAT_VERSION,
+                "model_name": model.name,
+                "dim": model._bert.d_model,
+                "species": schema.tcr.SPECIES,
+                **_get_model_settings(model),
+                "num_rows": 0,
+                "keys_num_bytes": 0,
+            },
+        )
+
+        store = cls(path)
+        store.append(model, instances)
+
+        return store
+
+    @classmethod
+    def open(cls, path: Union[str, os.PathLike]) -> "EmbeddingStore":
+        """
+        Open an existing store at `path`.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            The directory holding the store.
+
+        Returns
+        -------
+        :py:class:`~sceptr.store.EmbeddingStore`
+            The opened store.
+        """
+        return cls(path)
+
+    def __len__(self) -> int:
+        return self._metadata["num_rows"]
+
+    def __repr__(self) -> str:
+        return f"EmbeddingStore[model: {self.model_name}, num_tcrs: {len(self)}, rep_dim: {self.dim}]"
+
+    @property
+    def array(self) -> NDArray[np.float32]:
+        """
+        A read-only, memory-mapped view of all stored representations, of
+        shape :math:`(N, D)` where :math:`N` is the number of stored TCRs and
+        :math:`D` is the dimensionality of the representations.
+        """
+        return self._memory_map(mode="r")
+
+    @property
+    def tcrs(self) -> "DataFrame":
+        """
+        A DataFrame of the stored TCRs, in the same order as the rows of
+        :py:attr:`~sceptr.store.EmbeddingStore.array`.
+        """
+        import pandas as pd
+
+        if len(self) == 0:
+            return pd.DataFrame(columns=list(TCR_COLUMNS), dtype=object)
+
+        keys = pd.read_csv(
+            self.path / _KEYS_FILENAME,
+            sep="\t",
+            header=None,
+            names=list(TCR_COLUMNS),
+            dtype=str,
+            keep_default_na=False,
+            nrows=len(self),
+        )
+        return keys.where(keys != "", None)
+
+    def get_by_position(self, positions: Union[int, slice, List[int]]) -> NDArray:
+        """
+        Read stored representations by row position.
+
+        Parameters
+        ----------
+        positions : int, slice or list of int
+            The row positions to read.
+
+        Returns
+        -------
+        NDArray[numpy.float32]
+            The requested representations. Single positions and slices return
+            views onto the memory-mapped array; lists return copies.
+        """
+        return self.array[positions]
+
+    def get_positions(self, instances: "DataFrame") -> NDArray[np.int64]:
+        """
+        Look up the row positions of the TCRs in `instances`.
+
+        Parameters
+        ----------
+        instances : DataFrame
+            DataFrame specifying the TCRs to look up. It must be in the
+            :ref:`prescribed format <data_format>`.
+
+        Returns
+        -------
+        NDArray[numpy.int64]
+            A 1D numpy ndarray holding the row position of each TCR in
+            `instances`.
+
+        Raises
+        ------
+        KeyError
+            If any TCR in `instances` is not in the store.
+        """
+        key_to_position = self._get_key_to_position()
+        positions = np.empty(len(instances), dtype=np.int64)
+
+        for idx, (label, key) in enumerate(
+            zip(instances.index, get_tcr_keys(instances, self.species))
+        ):
+            if key not in key_to_position:
+                raise KeyError(f"TCR at index {label} is not in the store: {key}")
+            positions[idx] = key_to_position[key]
+
+        return positions
+
+    def get_by_tcr(self, instances: "DataFrame") -> NDArray[np.float32]:
+        """
+        Read stored representations for the TCRs in `instances`.
+
+        Parameters
+        ----------
+        instances : DataFrame
+            DataFrame specifying the TCRs to look up. It must be in the
+            :ref:`prescribed format <data_format>`.
+
+        Returns
+        -------
+        NDArray[numpy.float32]
+            A 2D numpy ndarray where every row vector is the stored
+            representation of the corresponding row in `instances`.
+
+        Raises
+        ------
+        KeyError
+            If any TCR in `instances` is not in the store.
+        """
+        return self.array[self.get_positions(instances)]
+
+    def append(self, model: "Sceptr", instances: "DataFrame") -> None:
+        """
+        Compute the representations of the TCRs in `instances` and add them to
+        the store. TCRs that are already in the store are skipped.
+        Representations are stored in float32, whatever the :py:meth:`output
+        precision <sceptr.model.Sceptr.set_output_precision>` of `model`.
+
+        Parameters
+        ----------
+        model : :py:class:`~sceptr.model.Sceptr`
+            The model variant used to compute representations. It must be the
+            same variant that the store was created with, with the same compute
+            precision and quantisation setting.
+
+        instances : DataFrame
+            DataFrame specifying the TCRs to add. It must be in the
+            :ref:`prescribed format <data_format>`.
+        """
+        self._check_same_settings_as(model)
+        self.check_compatible_with(model)
+
+        key_to_position = self._get_key_to_position()
+        keys = get_tcr_keys(instances, self.species)
+        first_positions, _ = deduplicate_tcr_keys(keys)
+        new_positions = [
+            idx for idx in first_positions if keys[idx] not in key_to_position
+        ]
+
+        for idx in range(0, len(new_positions), WRITE_CHUNK_SIZE):
+            chunk_positions = new_positions[idx : idx + WRITE_CHUNK_SIZE]
+            chunk_keys = [keys[position] for position in chunk_positions]
+            representations = (
+                model._calc_torch_representations(instances.iloc[chunk_positions])
+                .cpu()
+                .numpy()
+            )
+            self._write_rows(chunk_keys, representations)
+
+    def check_compatible_with(self, model: "Sceptr") -> None:
+        """
+        Check that the stored representations were produced by the same model
+        variant as `model`, under the species SCEPTR is currently set up for.
+        If they were computed with a different compute precision or
+        quantisation setting from that of `model`, they can still be used,
+        but a warning is issued, as comparing them with representations
+        computed by `model` mixes representations of different accuracy.
+
+        Raises
+        ------
+        ValueError
+            If the store is not compatible with `model`.
+        """
+        if model.name != self.model_name or model._bert.d_model != self.dim:
+            raise ValueError(
+                f"{self} was created with {self.model_name} (dim {self.dim}), and cannot be used with {model.name} (dim {model._bert.d_model})."
+            )
+
+        from libtcrlm import schema
+
+        if schema.tcr.SPECIES != self.species:
+            raise ValueError(
+                f"{self} was created for {self.species} TCRs, but SCEPTR is currently set up for {schema.tcr.SPECIES}."
+            )
+
+        settings = _get_model_settings(model)
+        stored_settings = self._get_stored_settings()
+
+        if settings != stored_settings:
+            warnings.warn(
+                f"{self} holds representations computed with {stored_settings}, but {model.name} computes with {settings}. Results mixing the two combine representations of different accuracy.",
+                stacklevel=2,
+            )
+
+    def _get_stored_settings(self) -> dict:
+        return {
+            "compute_precision": self.compute_precision,
+            "quantised": self.quantised,
+        }
+
+    def _check_same_settings_as(self, model: "Sceptr") -> None:
+        settings = _get_model_settings(model)
+        stored_settings = self._get_stored_settings()
+
+        if settings != stored_settings:
+            raise ValueError(
+                f"{self} holds representations computed with {stored_settings}, and cannot be appended to by {model.name} computing with {settings}."
+            )
+
+    def _memory_map(self, mode: str) -> NDArray[np.float32]:
+        if len(self) == 0:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        return np.memmap(
+            self.path / _EMBEDDINGS_FILENAME,
+            dtype="<f4",
+            mode=mode,
+            shape=(len(self), self.dim),
+        )
+
+    def _get_key_to_position(self) -> Dict[Tuple[Optional[str], ...], int]:
+        if self._key_to_position is None:
+            self._key_to_position = {
+                key: position
+                for position, key in enumerate(get_tcr_keys(self.tcrs, self.species))
+            }
+
+        return self._key_to_position
+
+    def _write_rows(
+        self,
+        keys: List[Tuple[Optional[str], ...]],
+        representations: NDArray[np.float32],
+    ) -> None:
+        """
+        Append rows to the embeddings and keys files, then commit them by
+        updating the metadata. Any partially written data left over from an
+        interrupted append is discarded first.
+        """
+        num_rows = len(self)
+        encoded_keys = "".join(
+            "\t".join("" if value is None else value for value in key) + "\n"
+            for key in keys
+        ).encode("utf-8")
+
+        _append_bytes(
+            self.path / _EMBEDDINGS_FILENAME,
+            num_rows * self.dim * 4,
+            np.ascontiguousarray(representations, dtype="<f4").tobytes(),
+        )
+        _append_bytes(
+            self.path / _KEYS_FILENAME,
+            self._metadata["keys_num_bytes"],
+            encoded_keys,
+        )
+
+        metadata = dict(self._metadata)
+        metadata["num_rows"] = num_rows + len(keys)
+        metadata["keys_num_bytes"] = self._metadata["keys_num_bytes"] + len(
+            encoded_keys
+        )
+        _write_metadata(self.path, metadata)
+        self._metadata = metadata
+
+        key_to_position = self._get_key_to_position()
+        for position, key in enumerate(keys, start=num_rows):
+            key_to_position[key] = position
+
+
+def _get_model_settings(model: "Sceptr") -> dict:
+    from sceptr.model import COMPUTE_PRECISIONS
+
+    compute_precision = next(
+        name
+        for name, dtype in COMPUTE_PRECISIONS.items()
+        if dtype == model._compute_dtype
+    )
+    return {"compute_precision": compute_precision, "quantised": model._is_quantised}
+
+
+def _append_bytes(path: Path, num_valid_bytes: int, data: bytes) -> None:
+    with open(path, "r+b") as f:
+        f.truncate(num_valid_bytes)
+        f.seek(num_valid_bytes)
+        f.write(data)
+
+
+def _write_metadata(path: Path, metadata: dict) -> None:
+    temp_path = path / f"{_METADATA_FILENAME}.tmp"
+
+    with open(temp_path, "w") as f:
+        json.dump(metadata, f, indent=4)
+
+    os.replace(temp_path, path / _METADATA_FILENAME)
@@ -3,9 +3,15 @@ For the curious/power users, several model variants are available to load and us
 The submodule exposes functions, each named after a particular variant, which when called will return a :py:class:`~sceptr.model.Sceptr` instance corresponding to the selected model variant.
 :py:class:`~sceptr.model.Sceptr` instances expose the same methods as in the functional API: namely :py:func:`~sceptr.model.Sceptr.calc_pdist_vector`, :py:func:`~sceptr.model.Sceptr.calc_cdist_matrix`, and :py:func:`~sceptr.model.Sceptr.calc_vector_representations`.
 Each of their function signatures are equivalent to the functional API, so you can just plug and play!
+
+Each variant's weights are read from disk the first time it is loaded, and are then kept in memory and shared by every :py:class:`~sceptr.model.Sceptr` instance of that variant, so loading the same variant again is almost free.
+Use :py:func:`~sceptr.variant.evict` to release them.
 """
 
-from sceptr._model_saves import load_variant
+import os
+from sceptr._model_saves import evict_variants, load_variant
+from sceptr._model_saves import load_snapshot as load_snapshot_file
+from typing import List, Optional, Union
 
 
 def default():
@@ -236,3 +242,43 @@ def b_sceptr():
         A :py:class:`~sceptr.model.Sceptr` instance with the beta chain-only model state loaded.
     """
     return load_variant("B_SCEPTR")
+
+
+def load_snapshot(path: Union[str, os.PathLike]):
+    """
+    Load a model saved with :py:meth:`~sceptr.model.Sceptr.save_snapshot`.
+    This is the fastest way to get a working model in a fresh process, as the snapshot is read in one go without parsing a model config or constructing the model from scratch.
+
+    .. warning ::
+        Snapshots are pickle files. Only load snapshots from sources you trust.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The snapshot file.
+
+    Returns
+    -------
+    :py:class:`~sceptr.model.Sceptr`
+        A :py:class:`~sceptr.model.Sceptr` instance with the saved model state loaded.
+    """
+    return load_snapshot_file(path)
+
+
+def evict(name: Optional[str] = None) -> List[str]:
+    """
+    Release the shared weights of loaded model variants.
+    :py:class:`~sceptr.model.Sceptr` instances that are already loaded keep working, but the next call to a variant function reads its weights from disk again.
+
+    Parameters
+    ----------
+    name : Optional[str]
+        The name of the variant to evict, as given by :py:attr:`Sceptr.name <sceptr.model.Sceptr.name>` (e.g. ``"SCEPTR (large)"``).
+        If not given, all loaded variants are evicted.
+
+    Returns
+    -------
+    List[str]
+        The names of the evicted variants.
+    """
+    return evict_variants(name)
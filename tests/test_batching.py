@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+from sceptr._batching import TokenisedTcrs, schedule_batches
+import torch
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture
+def dummy_data():
+    df = pd.read_csv("tests/mock_data.csv")
+    return df
+
+
+def test_schedule_batches_by_batch_size():
+    lengths = np.array([3, 9, 5, 9, 1])
+    batches = schedule_batches(lengths, batch_size=2)
+
+    assert [batch.tolist() for batch in batches] == [[1, 3], [2, 0], [4]]
+
+
+def test_schedule_batches_by_token_budget():
+    lengths = np.array([3, 9, 5, 9, 1, 2])
+    batches = schedule_batches(lengths, batch_size=2, token_budget=18)
+
+    assert [batch.tolist() for batch in batches] == [[1, 3], [2, 0, 5], [4]]
+
+
+def test_schedule_batches_over_budget_row():
+    lengths = np.array([30, 2])
+    batches = schedule_batches(lengths, batch_size=512, token_budget=10)
+
+    assert [batch.tolist() for batch in batches] == [[0], [1]]
+
+
+def test_get_padded_batch():
+    tokenised_tcrs = TokenisedTcrs.from_tensors(
+        [
+            torch.tensor([[1, 1], [2, 2]]),
+            torch.tensor([[3, 3]]),
+            torch.tensor([[4, 4], [5, 5], [6, 6]]),
+        ]
+    )
+    padded_batch = tokenised_tcrs.get_padded_batch(np.array([1, 0]))
+
+    expected = torch.tensor([[[3, 3], [0, 0]], [[1, 1], [2, 2]]])
+    assert torch.equal(padded_batch, expected)
+
+
+@pytest.mark.parametrize("batch_size,token_budget", ((1, None), (2, None), (512, 60)))
+def test_batching_preserves_order(dummy_data, batch_size, token_budget):
+    model = variant.default()
+    expected = model.calc_vector_representations(dummy_data)
+
+    model.set_batch_size(batch_size)
+    model.set_token_budget(token_budget)
+    result = model.calc_vector_representations(dummy_data)
+
+    assert np.allclose(result, expected, atol=1e-6)
+
+
+def test_residue_representations_across_batches(dummy_data):
+    model = variant.default()
+    expected = model.calc_residue_representations(dummy_data)
+
+    model.set_batch_size(1)
+    result = model.calc_residue_representations(dummy_data)
+
+    assert np.array_equal(result.compartment_mask, expected.compartment_mask)
+    assert np.allclose(
+        result.representation_array, expected.representation_array, atol=1e-6
+    )
@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+import subprocess
+import sys
+
+
+BENCHMARK_SCRIPT = Path(__file__).parent.parent / "benchmarks" / "run_benchmarks.py"
+
+
+def test_benchmark_suite_runs(tmp_path):
+    output_path = tmp_path / "results.json"
+
+    subprocess.run(
+        [
+            sys.executable,
+            str(BENCHMARK_SCRIPT),
+            "--variants",
+            "tiny",
+            "--batch-sizes",
+            "8",
+            "32",
+            "--num-tcrs",
+            "40",
+            "--num-distance-tcrs",
+            "10",
+            "--repeats",
+            "1",
+            "--cpu",
+            "--output",
+            str(output_path),
+        ],
+        capture_output=True,
+        check=True,
+    )
+
+    with open(output_path, "r") as f:
+        results = json.load(f)
+
+    assert results["format_version"] == 1
+    assert "torch_version" in results["environment"]
+    assert len(results["results"]) == 2 * 2 * 4
+
+    for result in results["results"]:
+        assert result["variant"] == "SCEPTR (tiny)"
+        assert result["tcrs_per_second"] > 0
+        assert len(result["seconds"]) == 1
+
+        if result["operation"] in ("cdist", "pdist"):
+            assert result["pairs_per_second"] > 0
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+import sceptr.model
+from sceptr._embedding_cache import deduplicate_tcr_keys
+import torch
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture
+def dummy_data():
+    df = pd.read_csv("tests/mock_data.csv")
+    return df
+
+
+@pytest.fixture
+def duplicated_data(dummy_data):
+    return dummy_data.iloc[[0, 1, 0, 2, 2, 0, 1, 2]]
+
+
+@pytest.fixture
+def default_model():
+    return variant.default()
+
+
+def test_deduplicate_tcr_keys():
+    first_positions, inverse = deduplicate_tcr_keys(["b", "a", "b", "c", "a"])
+
+    assert first_positions.tolist() == [0, 1, 3]
+    assert inverse.tolist() == [0, 1, 0, 2, 1]
+
+
+def test_model_runs_once_per_unique_tcr(default_model, duplicated_data, monkeypatch):
+    seen = []
+    calc_uncached = default_model._calc_uncached_torch_representations
+
+    def spy(instances):
+        seen.append(len(instances))
+        return calc_uncached(instances)
+
+    monkeypatch.setattr(default_model, "_calc_uncached_torch_representations", spy)
+    default_model.calc_vector_representations(duplicated_data)
+
+    assert seen == [3]
+
+
+def test_vector_representations(default_model, dummy_data, duplicated_data):
+    unique_result = default_model.calc_vector_representations(dummy_data)
+    result = default_model.calc_vector_representations(duplicated_data)
+
+    assert result.shape == (8, 64)
+    assert np.array_equal(result, unique_result[[0, 1, 0, 2, 2, 0, 1, 2]])
+
+
+def test_cdist(default_model, dummy_data, duplicated_data):
+    representations = torch.from_numpy(
+        default_model.calc_vector_representations(duplicated_data)
+    )
+    result = default_model.calc_cdist_matrix(duplicated_data, dummy_data)
+    expected = torch.cdist(representations, representations[[0, 1, 3]]).numpy()
+
+    assert result.shape == (8, 3)
+    assert np.allclose(result, expected, atol=1e-6)
+
+
+@pytest.mark.parametrize("block_elements", (1, 20, 2**22))
+def test_pdist(default_model, duplicated_data, block_elements, monkeypatch):
+    monkeypatch.setattr(sceptr.model, "PDIST_SCATTER_BLOCK_ELEMENTS", block_elements)
+    representations = torch.from_numpy(
+        default_model.calc_vector_representations(duplicated_data)
+    )
+    result = default_model.calc_pdist_vector(duplicated_data)
+    expected = torch.pdist(representations).numpy()
+
+    assert result.shape == (28,)
+    assert np.allclose(result, expected, atol=1e-6)
+    assert result[1] == 0
+
+
+def test_bad_row_reported_at_first_occurrence(default_model):
+    df = pd.read_csv("tests/bad_trav.csv").iloc[[0, 2, 1, 2]]
+
+    with pytest.raises(ValueError, match="Bad TRAV symbol at index 2"):
+        default_model.calc_vector_representations(df)
@@ -0,0 +1,153 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+from sceptr._reference_data import load_reference_tcrs
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture(scope="module")
+def model():
+    model = variant.default()
+    model.set_tile_size(16)
+    return model
+
+
+@pytest.fixture(scope="module")
+def tcrs():
+    reference_tcrs = load_reference_tcrs().iloc[:60]
+    return pd.concat([reference_tcrs, reference_tcrs.iloc[::7]], ignore_index=True)
+
+
+@pytest.fixture(scope="module")
+def anchors(tcrs):
+    return tcrs.iloc[::3]
+
+
+def test_cdist_to_path(model, anchors, tcrs, tmp_path):
+    expected = model.calc_cdist_matrix(anchors, tcrs)
+    result = model.calc_cdist_matrix(anchors, tcrs, out=tmp_path / "cdist.npy")
+
+    # The matrix computed in memory goes through a less precise path in
+    # torch.cdist for large inputs, so self-distances are only close to 0
+    assert isinstance(result, np.memmap)
+    assert np.allclose(result, expected, atol=1e-3)
+    assert np.array_equal(np.load(tmp_path / "cdist.npy"), result)
+    assert not (tmp_path / "cdist.npy.progress").exists()
+
+
+def test_pdist_to_path(model, tcrs, tmp_path):
+    expected = model.calc_pdist_vector(tcrs)
+    result = model.calc_pdist_vector(tcrs, out=tmp_path / "pdist.npy")
+
+    assert result.shape == expected.shape
+    assert np.allclose(result, expected, atol=1e-5)
+
+
+def test_pdist_to_path_without_duplicates(model, tcrs, tmp_path):
+    instances = tcrs.iloc[:60]
+    expected = model.calc_pdist_vector(instances)
+    result = model.calc_pdist_vector(instances, out=tmp_path / "pdist.npy")
+
+    assert np.allclose(result, expected, atol=1e-5)
+
+
+def test_float16_memmap(model, anchors, tcrs, tmp_path):
+    expected = model.calc_cdist_matrix(anchors, tcrs)
+    out = np.memmap(
+        tmp_path / "cdist.f16", dtype=np.float16, mode="w+", shape=expected.shape
+    )
+    result = model.calc_cdist_matrix(anchors, tcrs, out=out)
+
+    assert result is out
+    assert np.allclose(result, expected, atol=1e-2)
+
+
+def test_output_precision_sets_file_dtype(anchors, tcrs, tmp_path):
+    model = variant.default()
+    model.set_output_precision("float16")
+    result = model.calc_cdist_matrix(anchors, tcrs, out=tmp_path / "cdist.npy")
+
+    assert result.dtype == np.float16
+
+
+def test_resume(model, tcrs, tmp_path, monkeypatch):
+    path = tmp_path / "pdist.npy"
+    expected = model.calc_pdist_vector(tcrs)
+
+    num_blocks = 0
+    original_to_output_array = model._to_output_array
+
+    def interrupt_after_two_blocks(values):
+        nonlocal num_blocks
+        num_blocks += 1
+        if num_blocks > 2:
+            raise KeyboardInterrupt
+        return original_to_output_array(values)
+
+    monkeypatch.setattr(model, "_to_output_array", interrupt_after_two_blocks)
+    with pytest.raises(KeyboardInterrupt):
+        model.calc_pdist_vector(tcrs, out=path)
+    monkeypatch.undo()
+
+    with open(tmp_path / "pdist.npy.progress") as f:
+        assert json.load(f)["num_rows_done"] > 0
+
+    num_blocks = 0
+    resumed_to_output_array = model._to_output_array
+
+    def count_blocks(values):
+        nonlocal num_blocks
+        num_blocks += 1
+        return resumed_to_output_array(values)
+
+    monkeypatch.setattr(model, "_to_output_array", count_blocks)
+    result = model.calc_pdist_vector(tcrs, out=path, resume=True)
+    num_resumed_blocks = num_blocks
+
+    num_blocks = 0
+    model.calc_pdist_vector(tcrs, out=tmp_path / "fresh.npy")
+
+    assert np.allclose(result, expected, atol=1e-5)
+    assert num_resumed_blocks == num_blocks - 2
+    assert not (tmp_path / "pdist.npy.progress").exists()
+
+
+def test_resume_completed_output(model, anchors, tcrs, tmp_path, monkeypatch):
+    path = tmp_path / "cdist.npy"
+    expected = model.calc_cdist_matrix(anchors, tcrs, out=path)
+
+    def fail(values):
+        raise AssertionError("No distances should be recomputed.")
+
+    monkeypatch.setattr(model, "_to_output_array", fail)
+    result = model.calc_cdist_matrix(anchors, tcrs, out=path, resume=True)
+
+    assert np.array_equal(result, expected)
+
+
+def test_resume_different_computation(model, anchors, tcrs, tmp_path):
+    path = tmp_path / "cdist.npy"
+    model.calc_cdist_matrix(anchors, tcrs, out=path)
+
+    with pytest.raises(ValueError, match="Cannot resume"):
+        model.calc_cdist_matrix(tcrs, tcrs, out=path, resume=True)
+
+
+@pytest.mark.parametrize(
+    ("out", "resume", "exception"),
+    (
+        (np.empty((3, 3), dtype=np.float32), False, ValueError),
+        (np.empty((23, 69), dtype=np.float64), False, ValueError),
+        (np.empty((23, 69), dtype=np.float32), True, ValueError),
+        (None, True, ValueError),
+        (5, False, TypeError),
+    ),
+)
+def test_bad_out(model, anchors, tcrs, out, resume, exception):
+    with pytest.raises(exception):
+        model.calc_cdist_matrix(anchors, tcrs, out=out, resume=resume)
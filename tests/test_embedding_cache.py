@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+from sceptr._embedding_cache import EmbeddingCache, get_tcr_keys
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture
+def dummy_data():
+    df = pd.read_csv("tests/mock_data.csv")
+    return df
+
+
+@pytest.fixture
+def cached_model():
+    model = variant.default()
+    model.enable_embedding_cache()
+    return model
+
+
+def test_lru_eviction_by_entries():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put("a", np.zeros(4, dtype=np.float32))
+    cache.put("b", np.zeros(4, dtype=np.float32))
+    cache.get("a")
+    cache.put("c", np.zeros(4, dtype=np.float32))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    assert cache.info().num_entries == 2
+
+
+def test_lru_eviction_by_bytes():
+    cache = EmbeddingCache(max_bytes=40)
+    cache.put("a", np.zeros(4, dtype=np.float32))
+    cache.put("b", np.zeros(4, dtype=np.float32))
+    cache.put("c", np.zeros(4, dtype=np.float32))
+
+    info = cache.info()
+    assert cache.get("a") is None
+    assert info.num_entries == 2
+    assert info.num_bytes == 32
+
+
+def test_get_tcr_keys():
+    df = pd.DataFrame(
+        {"TRAV": ["TRAV1-1*01", np.nan], "CDR3B": ["CASSANDRAF", "CASSANDRAF"]}
+    )
+
+    assert get_tcr_keys(df, "homosapiens") == [
+        ("TRAV1-1*01", None, None, None, "CASSANDRAF", None),
+        (None, None, None, None, "CASSANDRAF", None),
+    ]
+
+
+def test_get_tcr_keys_normalises_values():
+    df = pd.DataFrame(
+        {
+            "TRAV": ["TRAV1-1", "TRAV1-1*1", "TRAV1-1*02", "NOT_A_GENE"],
+            "CDR3A": ["", None, np.nan, "CAVKASGSRLTF"],
+            "TRBJ": ["TRBJ2-7", None, "", "TRBJ2-7*01"],
+        }
+    )
+
+    assert get_tcr_keys(df, "homosapiens") == [
+        ("TRAV1-1*01", None, None, None, None, "TRBJ2-7*01"),
+        ("TRAV1-1*01", None, None, None, None, None),
+        ("TRAV1-1*02", None, None, None, None, None),
+        ("NOT_A_GENE", "CAVKASGSRLTF", None, None, None, "TRBJ2-7*01"),
+    ]
+
+
+def test_cache_hits_on_equivalent_gene_symbols(cached_model, dummy_data):
+    cached_model.calc_vector_representations(dummy_data)
+    without_alleles = dummy_data.assign(
+        TRAV=dummy_data["TRAV"].str.replace("*01", "", regex=False)
+    )
+    cached_model.calc_vector_representations(without_alleles)
+
+    assert cached_model.get_embedding_cache_info().hits == 3
+
+
+def test_cache_disabled_by_default(dummy_data):
+    model = variant.default()
+    assert model.get_embedding_cache_info() is None
+
+
+def test_cache_hits(cached_model, dummy_data):
+    first = cached_model.calc_vector_representations(dummy_data)
+    second = cached_model.calc_vector_representations(dummy_data)
+    info = cached_model.get_embedding_cache_info()
+
+    assert np.array_equal(first, second)
+    assert info.hits == 3
+    assert info.misses == 3
+    assert info.num_entries == 3
+    assert info.num_bytes == 3 * 64 * 4
+
+
+def test_only_misses_reach_model(cached_model, dummy_data, monkeypatch):
+    cached_model.calc_vector_representations(dummy_data.iloc[:2])
+
+    seen = []
+    calc_uncached = cached_model._calc_uncached_torch_representations
+
+    def spy(instances):
+        seen.append(len(instances))
+        return calc_uncached(instances)
+
+    monkeypatch.setattr(cached_model, "_calc_uncached_torch_representations", spy)
+    result = cached_model.calc_vector_representations(dummy_data)
+
+    uncached_model = variant.default()
+    expected = uncached_model.calc_vector_representations(dummy_data)
+
+    assert seen == [1]
+    assert np.allclose(result, expected, atol=1e-6)
+
+
+def test_cache_used_by_distance_methods(cached_model, dummy_data):
+    cached_model.calc_vector_representations(dummy_data)
+    cached_model.calc_cdist_matrix(dummy_data, dummy_data)
+    cached_model.calc_pdist_vector(dummy_data)
+
+    assert cached_model.get_embedding_cache_info().hits == 9
+
+
+def test_disable_embedding_cache(cached_model, dummy_data):
+    cached_model.calc_vector_representations(dummy_data)
+    cached_model.disable_embedding_cache()
+
+    assert cached_model.get_embedding_cache_info() is None
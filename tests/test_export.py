@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+import torch
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture
+def dummy_data():
+    df = pd.read_csv("tests/mock_data.csv")
+    return df
+
+
+@pytest.mark.parametrize(
+    "model_loader", (variant.default, variant.average_pooling, variant.b_sceptr)
+)
+def test_inference_graph_matches_eager(model_loader, dummy_data, tmp_path):
+    model = model_loader()
+    expected = model.calc_vector_representations(dummy_data)
+    model.export_inference_graph(tmp_path / "graph.pt2")
+
+    graph_model = model_loader()
+    graph_model.load_inference_graph(tmp_path / "graph.pt2")
+
+    assert np.allclose(
+        graph_model.calc_vector_representations(dummy_data), expected, atol=1e-6
+    )
+
+    graph_model.set_batch_size(1)
+
+    assert np.allclose(
+        graph_model.calc_vector_representations(dummy_data), expected, atol=1e-6
+    )
+
+    graph_model.disable_inference_graph()
+
+    assert graph_model._inference_graph is None
+    assert np.array_equal(graph_model.calc_vector_representations(dummy_data), expected)
+
+
+def test_inference_graph_from_other_variant(tmp_path):
+    variant.tiny().export_inference_graph(tmp_path / "graph.pt2")
+
+    with pytest.raises(ValueError):
+        variant.default().load_inference_graph(tmp_path / "graph.pt2")
+
+
+def test_export_quantised_model(tmp_path):
+    model = variant.tiny()
+    model.enable_quantisation()
+
+    with pytest.raises(RuntimeError):
+        model.export_inference_graph(tmp_path / "graph.pt2")
+
+
+def test_export_with_old_torch(tmp_path, monkeypatch):
+    model = variant.tiny()
+    model.export_inference_graph(tmp_path / "graph.pt2")
+    monkeypatch.setattr(torch, "__version__", "2.1.2")
+
+    with pytest.raises(RuntimeError):
+        model.export_inference_graph(tmp_path / "other_graph.pt2")
+
+    with pytest.raises(RuntimeError):
+        model.load_inference_graph(tmp_path / "graph.pt2")
@@ -3,6 +3,7 @@ from sceptr.model import ResidueRepresentations
 import numpy as np
 import pandas as pd
 import pytest
+from scipy.sparse import csr_array
 
 
 sceptr.disable_hardware_acceleration()
@@ -43,6 +44,58 @@ def test_pdist(dummy_data):
     assert result.shape == (3,)
 
 
+def test_nearest_neighbours(dummy_data):
+    indices, distances = sceptr.calc_nearest_neighbours(dummy_data, dummy_data, 2)
+
+    assert isinstance(indices, np.ndarray)
+    assert isinstance(distances, np.ndarray)
+    assert indices.shape == (3, 2)
+    assert distances.shape == (3, 2)
+    assert np.array_equal(indices[:, 0], [0, 1, 2])
+
+
+def test_cdist_radius_graph(dummy_data):
+    result = sceptr.calc_cdist_radius_graph(dummy_data, dummy_data, 2.0)
+
+    assert isinstance(result, csr_array)
+    assert result.shape == (3, 3)
+
+
+def test_pdist_radius_graph(dummy_data):
+    result = sceptr.calc_pdist_radius_graph(dummy_data, 2.0)
+
+    assert isinstance(result, csr_array)
+    assert result.shape == (3, 3)
+
+
+def test_cdist_histogram(dummy_data):
+    result = sceptr.calc_cdist_histogram(dummy_data, dummy_data)
+
+    assert result.shape == (20,)
+    assert result.sum() == 9
+
+
+def test_pdist_histogram(dummy_data):
+    result = sceptr.calc_pdist_histogram(dummy_data, per_instance=True)
+
+    assert result.shape == (3, 20)
+    assert np.all(result.sum(axis=1) == 2)
+
+
+def test_cdist_neighbour_counts(dummy_data):
+    result = sceptr.calc_cdist_neighbour_counts(dummy_data, dummy_data, [0.5, 2.0])
+
+    assert result.shape == (3, 2)
+    assert np.all(result[:, 1] == 3)
+
+
+def test_pdist_neighbour_counts(dummy_data):
+    result = sceptr.calc_pdist_neighbour_counts(dummy_data, 2.0)
+
+    assert result.shape == (3,)
+    assert np.all(result == 2)
+
+
 def test_enable_hardware_acceleration():
     sceptr.enable_hardware_acceleration()
     assert sceptr._USE_HARDWARE_ACCELERATION
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+from sceptr._reference_data import load_reference_tcrs
+from scipy.spatial.distance import squareform
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture(scope="module")
+def model():
+    model = variant.default()
+    model.set_tile_size(16)
+    return model
+
+
+@pytest.fixture(scope="module")
+def tcrs():
+    reference_tcrs = load_reference_tcrs().iloc[:50]
+    return pd.concat([reference_tcrs, reference_tcrs.iloc[::5]], ignore_index=True)
+
+
+@pytest.fixture(scope="module")
+def anchors(tcrs):
+    return tcrs.iloc[::4]
+
+
+@pytest.fixture(scope="module")
+def pdist_vector(model, tcrs):
+    return model.calc_pdist_vector(tcrs)
+
+
+@pytest.fixture(scope="module")
+def cdist_matrix(model, anchors, tcrs):
+    return model.calc_cdist_matrix(anchors, tcrs)
+
+
+def _get_histogram(distances, bins):
+    return np.histogram(distances, bins)[0]
+
+
+def test_pdist_histogram(model, tcrs, pdist_vector):
+    result = model.calc_pdist_histogram(tcrs)
+    expected = _get_histogram(pdist_vector, model.distance_bins)
+
+    assert result.dtype == np.int64
+    assert result.sum() == len(pdist_vector)
+    assert np.array_equal(result, expected)
+
+
+def test_pdist_histogram_per_instance(model, tcrs, pdist_vector):
+    result = model.calc_pdist_histogram(tcrs, per_instance=True)
+    cdist_matrix = squareform(pdist_vector)
+
+    assert result.shape == (len(tcrs), len(model.distance_bins) - 1)
+    assert np.all(result.sum(axis=1) == len(tcrs) - 1)
+    assert np.array_equal(result.sum(axis=0), 2 * model.calc_pdist_histogram(tcrs))
+
+    for idx in (0, 10, 55):
+        distances = np.delete(cdist_matrix[idx], idx)
+        expected = _get_histogram(distances, model.distance_bins)
+        assert np.array_equal(result[idx], expected)
+
+
+def test_cdist_histogram(model, anchors, tcrs, cdist_matrix):
+    result = model.calc_cdist_histogram(anchors, tcrs)
+    expected = _get_histogram(cdist_matrix, model.distance_bins)
+
+    assert result.sum() == cdist_matrix.size
+    assert np.array_equal(result, expected)
+
+
+def test_cdist_histogram_per_anchor(model, anchors, tcrs, cdist_matrix):
+    result = model.calc_cdist_histogram(anchors, tcrs, per_anchor=True)
+
+    assert result.shape == (len(anchors), len(model.distance_bins) - 1)
+    assert np.array_equal(result.sum(axis=0), model.calc_cdist_histogram(anchors, tcrs))
+
+    for idx in range(len(anchors)):
+        expected = _get_histogram(cdist_matrix[idx], model.distance_bins)
+        assert np.array_equal(result[idx], expected)
+
+
+def test_custom_bins(model, tcrs, pdist_vector):
+    bins = [0.5, 0.9, 1.0, 1.2]
+    result = model.calc_pdist_histogram(tcrs, bins=bins)
+    expected = _get_histogram(pdist_vector, bins)
+
+    assert result.shape == (3,)
+    assert result.sum() < len(pdist_vector)
+    assert np.array_equal(result, expected)
+
+
+def test_duplicates_fall_in_zero_bin(model, tcrs):
+    duplicated = pd.concat([tcrs.iloc[:1]] * 4, ignore_index=True)
+
+    assert model.calc_pdist_histogram(duplicated)[0] == 6
+    assert np.all(model.calc_pdist_histogram(duplicated, per_instance=True)[:, 0] == 3)
+
+
+def test_zero_bin_excluded(model, tcrs):
+    duplicated = pd.concat([tcrs.iloc[:1]] * 4, ignore_index=True)
+
+    assert model.calc_pdist_histogram(duplicated, bins=[0.1, 2]).sum() == 0
+
+
+@pytest.mark.parametrize(
+    "bins", ([1.0], [[0, 1], [1, 2]], [0, 1, 1], [1, 0], ["a", "b"])
+)
+def test_bad_bins(model, tcrs, bins):
+    with pytest.raises(ValueError):
+        model.calc_pdist_histogram(tcrs, bins=bins)
@@ -0,0 +1,61 @@
+import pytest
+import subprocess
+import sys
+
+
+IMPORT_TIME_BUDGET_MICROSECONDS = 100_000
+HEAVY_DEPENDENCIES = ("torch", "pandas", "libtcrlm", "scipy")
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def get_cumulative_import_time(importtime_log: str, module_name: str) -> int:
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if name.strip() == module_name:
+            return int(cumulative)
+
+    raise ValueError(f"{module_name} not found in import time log")
+
+
+@pytest.mark.parametrize("module_name", ("sceptr", "sceptr.store"))
+def test_import_does_not_load_heavy_dependencies(module_name):
+    result = run_python(
+        f"import sys, {module_name}; "
+        f"print(','.join(m for m in {HEAVY_DEPENDENCIES!r} if m in sys.modules))"
+    )
+
+    assert result.stdout.strip() == ""
+
+
+def test_import_time_within_budget():
+    result = run_python("import sceptr", "-X", "importtime")
+    cumulative_import_time = get_cumulative_import_time(result.stderr, "sceptr")
+
+    assert cumulative_import_time < IMPORT_TIME_BUDGET_MICROSECONDS
+
+
+def test_lazy_attributes():
+    result = run_python(
+        "import sys, sceptr; "
+        "print(sceptr.Sceptr.__module__, sceptr.variant.__name__, 'torch' in sys.modules)"
+    )
+
+    assert result.stdout.split() == ["sceptr.model", "sceptr.variant", "True"]
+
+
+def test_unknown_attribute():
+    import sceptr
+
+    with pytest.raises(AttributeError):
+        sceptr.foobar
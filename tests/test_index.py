@@ -0,0 +1,159 @@
+import numpy as np
+import pytest
+import sceptr
+from sceptr import variant
+from sceptr._reference_data import load_reference_tcrs
+import sceptr.index
+from sceptr.index import SceptrIndex
+from sceptr.store import EmbeddingStore
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture(scope="module")
+def model():
+    return variant.default()
+
+
+@pytest.fixture(scope="module")
+def database():
+    return load_reference_tcrs()
+
+
+@pytest.fixture(scope="module")
+def queries(database):
+    return database.iloc[::8]
+
+
+@pytest.fixture(scope="module")
+def index(model, database):
+    return SceptrIndex.build(model, database, num_lists=16, num_probes=2)
+
+
+def test_build(index, database):
+    assert len(index) == len(database)
+    assert index.num_lists == 16
+    assert index.num_probes == 2
+    assert sorted(index._positions.tolist()) == list(range(len(database)))
+
+
+def test_search_with_all_lists_probed_is_exact(model, index, database, queries):
+    index.set_num_probes(index.num_lists)
+    indices, distances = index.search(queries, k=5)
+    expected_indices, expected_distances = model.calc_nearest_neighbours(
+        queries, database, k=5
+    )
+    index.set_num_probes(2)
+
+    assert indices.shape == (len(queries), 5)
+    assert np.allclose(distances, expected_distances, atol=1e-5)
+    assert np.array_equal(indices[:, 0], expected_indices[:, 0])
+
+
+def test_search_finds_query_itself(index, queries):
+    indices, distances = index.search(queries, k=1)
+
+    assert np.array_equal(indices[:, 0], np.arange(0, 256, 8))
+    assert np.allclose(distances[:, 0], 0, atol=1e-3)
+
+
+def test_recall(index, queries):
+    recalls = []
+
+    for num_probes in (1, 4, 16):
+        index.set_num_probes(num_probes)
+        recalls.append(index.calc_recall(queries, k=10))
+
+    index.set_num_probes(2)
+
+    assert recalls == sorted(recalls)
+    assert recalls[-1] == 1.0
+
+
+def test_search_with_too_few_candidates(model, database, queries):
+    index = SceptrIndex.build(model, database, num_lists=128, num_probes=1)
+    indices, distances = index.search(queries, k=50)
+
+    assert np.all(indices[:, -1] == -1)
+    assert np.all(np.isinf(distances[:, -1]))
+
+
+def test_save_load(model, index, queries, tmp_path):
+    index.save(tmp_path / "index")
+    loaded = SceptrIndex.load(tmp_path / "index", model)
+
+    assert loaded.num_lists == index.num_lists
+    assert loaded.num_probes == index.num_probes
+
+    indices, distances = loaded.search(queries, k=5)
+    expected_indices, expected_distances = index.search(queries, k=5)
+
+    assert np.array_equal(indices, expected_indices)
+    assert np.array_equal(distances, expected_distances)
+
+
+def test_load_with_wrong_model(index, tmp_path):
+    index.save(tmp_path / "index")
+
+    with pytest.raises(ValueError, match="cannot be used with"):
+        SceptrIndex.load(tmp_path / "index", variant.tiny())
+
+
+def test_build_from_store(model, database, queries, index, tmp_path):
+    store = EmbeddingStore.create(tmp_path / "store", model, database)
+    store_index = SceptrIndex.build(model, store, num_lists=16, num_probes=2)
+
+    indices, _ = store_index.search(queries, k=5)
+    expected_indices, _ = index.search(queries, k=5)
+
+    assert np.array_equal(indices, expected_indices)
+
+
+@pytest.mark.parametrize(
+    ("num_lists", "exception"),
+    ((0, ValueError), (257, ValueError), (1.5, TypeError)),
+)
+def test_bad_num_lists(model, database, num_lists, exception):
+    with pytest.raises(exception):
+        SceptrIndex.build(model, database, num_lists=num_lists)
+
+
+@pytest.mark.parametrize(
+    ("num_probes", "exception"),
+    ((0, ValueError), (17, ValueError), ("1", TypeError)),
+)
+def test_bad_num_probes(index, num_probes, exception):
+    with pytest.raises(exception):
+        index.set_num_probes(num_probes)
+
+
+def test_search_numpy_k(index, queries):
+    indices, distances = index.search(queries, k=np.int64(3))
+    expected_indices, expected_distances = index.search(queries, k=3)
+
+    assert np.array_equal(indices, expected_indices)
+    assert np.array_equal(distances, expected_distances)
+
+
+def test_small_search_tiles(model, database, queries, monkeypatch):
+    expected_index = SceptrIndex.build(model, database, num_lists=16, num_probes=16)
+    expected_indices, expected_distances = expected_index.search(queries, k=5)
+
+    monkeypatch.setattr(sceptr.index, "SEARCH_TILE_ELEMENTS", 40)
+    index = SceptrIndex.build(model, database, num_lists=16, num_probes=16)
+    indices, distances = index.search(queries, k=5)
+
+    assert np.allclose(index._centroids, expected_index._centroids, atol=1e-5)
+    assert np.array_equal(indices[:, 0], expected_indices[:, 0])
+    assert np.allclose(distances, expected_distances, atol=1e-5)
+    assert index.calc_recall(queries, k=5) > 0.95
+
+
+@pytest.mark.parametrize(
+    ("k", "exception"),
+    ((0, ValueError), (257, ValueError), (2.0, TypeError), (True, TypeError)),
+)
+def test_bad_k(index, queries, k, exception):
+    with pytest.raises(exception):
+        index.search(queries, k=k)
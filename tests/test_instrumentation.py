@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+from sceptr._instrumentation import STAGES
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture
+def dummy_data():
+    df = pd.read_csv("tests/mock_data.csv")
+    return df
+
+
+@pytest.fixture
+def model():
+    return variant.default()
+
+
+def test_disabled_by_default(model, dummy_data):
+    model.calc_vector_representations(dummy_data)
+
+    assert model.get_instrumentation_stats() is None
+
+
+def test_vector_representation_stages(model, dummy_data):
+    model.enable_instrumentation()
+    model.calc_vector_representations(dummy_data)
+    stats = model.get_instrumentation_stats()
+
+    assert set(stats.stages) == set(STAGES)
+
+    for stage in ("parse", "tokenise", "pad", "transfer", "forward", "output"):
+        assert stats.stages[stage].num_calls >= 1
+        assert stats.stages[stage].seconds > 0
+
+    assert stats.stages["distance"].num_calls == 0
+    assert stats.num_rows == len(dummy_data)
+
+    tokenised_tcrs = model._tokenise(model._generate_tcr_series(dummy_data))
+    assert stats.num_tokens == int(tokenised_tcrs.lengths.sum())
+
+    padded_batch = tokenised_tcrs.get_padded_batch(np.arange(len(dummy_data)))
+    assert stats.num_padding_tokens == padded_batch.shape[0] * padded_batch.shape[
+        1
+    ] - int(tokenised_tcrs.lengths.sum())
+
+
+def test_distance_stage(model, dummy_data):
+    model.enable_instrumentation()
+    model.calc_cdist_matrix(dummy_data, dummy_data)
+    model.calc_pdist_vector(dummy_data)
+    model.calc_nearest_neighbours(dummy_data, dummy_data, k=1)
+
+    assert model.get_instrumentation_stats().stages["distance"].num_calls == 3
+
+
+@pytest.mark.parametrize(
+    ("calc_distances", "num_tiles"),
+    (
+        (lambda model, df: model.calc_cdist_histogram(df, df), 9),
+        (lambda model, df: model.calc_pdist_histogram(df, per_instance=True), 6),
+        (lambda model, df: model.calc_nearest_neighbours(df, df, k=1), 9),
+        (lambda model, df: model.calc_pdist_radius_graph(df, 2.0), 6),
+    ),
+)
+def test_distance_stage_recorded_once_per_tile(
+    model, dummy_data, calc_distances, num_tiles
+):
+    model.set_tile_size(1)
+    model.enable_instrumentation()
+    calc_distances(model, dummy_data)
+
+    assert model.get_instrumentation_stats().stages["distance"].num_calls == num_tiles
+
+
+def test_residue_representation_stages(model, dummy_data):
+    model.enable_instrumentation()
+    model.calc_residue_representations(dummy_data)
+    stats = model.get_instrumentation_stats()
+
+    assert stats.stages["forward"].num_calls == 1
+    assert stats.num_rows == len(dummy_data)
+
+
+def test_hook(model, dummy_data):
+    events = []
+    model.enable_instrumentation(hook=events.append)
+    model.calc_vector_representations(dummy_data)
+    stats = model.get_instrumentation_stats()
+
+    assert [event.stage for event in events][:2] == ["parse", "tokenise"]
+    assert events[-1].stage == "output"
+    assert sum(event.num_rows for event in events) == stats.num_rows
+    assert sum(event.num_tokens for event in events) == stats.num_tokens
+    assert sum(event.seconds for event in events) == pytest.approx(
+        sum(stage.seconds for stage in stats.stages.values())
+    )
+
+
+def test_enable_resets_stats(model, dummy_data):
+    model.enable_instrumentation()
+    model.calc_vector_representations(dummy_data)
+    model.enable_instrumentation()
+
+    assert model.get_instrumentation_stats().num_rows == 0
+
+
+def test_disable(model, dummy_data):
+    model.enable_instrumentation()
+    model.disable_instrumentation()
+    model.calc_vector_representations(dummy_data)
+
+    assert model.get_instrumentation_stats() is None
+
+
+def test_bad_hook(model):
+    with pytest.raises(TypeError):
+        model.enable_instrumentation(hook="foobar")
@@ -0,0 +1,194 @@
+import numpy as np
+import os
+import pandas as pd
+import pytest
+import sceptr
+import sceptr.model
+from sceptr import variant
+from sceptr._batching import schedule_batches
+from sceptr._memory import ActivationMemoryModel, is_out_of_memory_error
+import torch
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture
+def dummy_data():
+    df = pd.read_csv("tests/mock_data.csv")
+    return df
+
+
+@pytest.fixture
+def memory_model():
+    return ActivationMemoryModel(variant.default()._bert, torch.float32)
+
+
+def test_memory_model_shape(memory_model):
+    assert memory_model.d_model == 64
+    assert memory_model.num_heads == 8
+    assert memory_model.d_feedforward == 256
+    assert memory_model.element_size == 4
+
+
+def test_memory_estimate_grows_with_width(memory_model):
+    budget = 10_000_000
+    max_rows = [memory_model.get_max_rows(width, budget) for width in (10, 40, 80)]
+
+    assert max_rows == sorted(max_rows, reverse=True)
+    assert max_rows[0] > 4 * max_rows[-1]
+
+
+def test_schedule_batches_by_memory_budget(memory_model):
+    lengths = np.random.default_rng(0).integers(5, 80, size=1000)
+    budget = 2_000_000
+    batches = schedule_batches(
+        lengths,
+        batch_size=512,
+        get_max_rows=lambda width: memory_model.get_max_rows(width, budget),
+    )
+
+    assert sorted(np.concatenate(batches).tolist()) == list(range(1000))
+    for batch in batches:
+        width = int(lengths[batch].max())
+        assert memory_model.estimate_batch_bytes(len(batch), width) <= budget
+
+
+def test_memory_budget_preserves_results(dummy_data):
+    model = variant.default()
+    expected = model.calc_vector_representations(dummy_data)
+
+    model.set_memory_budget(200_000)
+    result = model.calc_vector_representations(dummy_data)
+
+    assert np.allclose(result, expected, atol=1e-6)
+
+
+def test_auto_memory_budget(dummy_data):
+    model = variant.default()
+    expected = model.calc_vector_representations(dummy_data)
+
+    model.set_memory_budget("auto")
+    result = model.calc_vector_representations(dummy_data)
+
+    assert np.allclose(result, expected, atol=1e-6)
+
+
+@pytest.mark.parametrize("model_loader", (variant.tiny, variant.default))
+def test_memory_budget_with_quantisation(model_loader, dummy_data):
+    model = model_loader()
+    model.enable_quantisation(tolerance=2)
+    expected = model.calc_vector_representations(dummy_data)
+
+    model.set_memory_budget(10**8)
+    result = model.calc_vector_representations(dummy_data)
+
+    assert np.allclose(result, expected, atol=1e-6)
+
+
+def test_auto_memory_budget_without_free_memory_query(dummy_data, monkeypatch):
+    model = variant.default()
+    model.set_memory_budget("auto")
+
+    def sysconf(name):
+        raise ValueError(f"unrecognized configuration name: {name}")
+
+    monkeypatch.setattr(sceptr.model, "_read_available_memory_bytes", lambda: None)
+    monkeypatch.setattr(os, "sysconf", sysconf)
+
+    with pytest.raises(RuntimeError, match="explicit budget"):
+        model.calc_vector_representations(dummy_data)
+
+
+def test_free_memory_prefers_available_memory(monkeypatch):
+    monkeypatch.setattr(sceptr.model, "_read_available_memory_bytes", lambda: 12345)
+
+    assert sceptr.model._get_free_memory_bytes(torch.device("cpu")) == 12345
+
+
+def test_memory_model_built_once_per_call(dummy_data, monkeypatch):
+    model = variant.default()
+    model.set_memory_budget(10**8)
+    num_memory_models = 0
+    original_init = ActivationMemoryModel.__init__
+
+    def counting_init(self, *args, **kwargs):
+        nonlocal num_memory_models
+        num_memory_models += 1
+        original_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(ActivationMemoryModel, "__init__", counting_init)
+    model.calc_vector_representations(pd.concat([dummy_data] * 10))
+
+    assert num_memory_models == 1
+
+
+def test_out_of_memory_batches_are_split(dummy_data, monkeypatch):
+    model = variant.default()
+    expected_vectors = model.calc_vector_representations(dummy_data)
+    expected_residues = model.calc_residue_representations(dummy_data)
+
+    model.set_memory_budget(10_000_000)
+    batch_sizes = []
+
+    def fail_on_large_batches(forward):
+        def wrapped(padded_batch):
+            batch_sizes.append(len(padded_batch))
+            if len(padded_batch) > 1:
+                raise torch.cuda.OutOfMemoryError("CUDA out of memory.")
+            return forward(padded_batch)
+
+        return wrapped
+
+    monkeypatch.setattr(
+        model,
+        "_get_vector_representations_of",
+        fail_on_large_batches(model._get_vector_representations_of),
+    )
+    monkeypatch.setattr(
+        model,
+        "_get_residue_representations_of",
+        fail_on_large_batches(model._get_residue_representations_of),
+    )
+
+    vectors = model.calc_vector_representations(dummy_data)
+    residues = model.calc_residue_representations(dummy_data)
+
+    assert np.allclose(vectors, expected_vectors, atol=1e-6)
+    assert np.allclose(
+        residues.representation_array, expected_residues.representation_array, atol=1e-6
+    )
+    assert batch_sizes[0] == len(dummy_data)
+    assert model._memory_estimate_scale > 1
+
+
+def test_out_of_memory_without_memory_budget_is_raised(dummy_data, monkeypatch):
+    model = variant.default()
+
+    def raise_out_of_memory(padded_batch):
+        raise torch.cuda.OutOfMemoryError("CUDA out of memory.")
+
+    monkeypatch.setattr(model, "_get_vector_representations_of", raise_out_of_memory)
+
+    with pytest.raises(torch.cuda.OutOfMemoryError):
+        model.calc_vector_representations(dummy_data)
+
+
+def test_is_out_of_memory_error():
+    assert is_out_of_memory_error(torch.cuda.OutOfMemoryError("CUDA out of memory."))
+    assert is_out_of_memory_error(
+        RuntimeError("[enforce fail at alloc_cpu.cpp:117] can't allocate memory")
+    )
+    assert not is_out_of_memory_error(RuntimeError("shape mismatch"))
+    assert not is_out_of_memory_error(ValueError("out of memory"))
+
+
+@pytest.mark.parametrize(
+    ("memory_budget", "exception"),
+    ((0, ValueError), (-1, ValueError), (1.5, TypeError), ("all", TypeError)),
+)
+def test_bad_memory_budget(memory_budget, exception):
+    model = variant.default()
+
+    with pytest.raises(exception):
+        model.set_memory_budget(memory_budget)
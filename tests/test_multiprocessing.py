@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture
+def dummy_data():
+    df = pd.read_csv("tests/mock_data.csv")
+    return df
+
+
+@pytest.fixture(scope="module")
+def parallel_model():
+    model = variant.default()
+    model.enable_multiprocessing(num_workers=2)
+    yield model
+    model.disable_multiprocessing()
+
+
+def test_vector_representations(parallel_model, dummy_data):
+    parallel_model.set_batch_size(1)
+    result = parallel_model.calc_vector_representations(dummy_data)
+    expected = variant.default().calc_vector_representations(dummy_data)
+
+    assert np.allclose(result, expected, atol=1e-6)
+
+
+def test_distances(parallel_model, dummy_data):
+    result = parallel_model.calc_cdist_matrix(dummy_data, dummy_data)
+    expected = variant.default().calc_cdist_matrix(dummy_data, dummy_data)
+
+    assert np.allclose(result, expected, atol=1e-6)
+
+
+def test_species_forwarded_to_workers(parallel_model):
+    df = pd.read_csv("tests/mock_data_musmusculus.csv")
+
+    sceptr.setup("musmusculus")
+    try:
+        result = parallel_model.calc_vector_representations(df)
+        expected = variant.default().calc_vector_representations(df)
+    finally:
+        sceptr.setup("homosapiens")
+
+    assert np.allclose(result, expected, atol=1e-6)
+
+
+def test_errors_propagate(parallel_model):
+    df = pd.read_csv("tests/bad_trav.csv")
+
+    with pytest.raises(ValueError, match="Bad TRAV symbol at index 2"):
+        parallel_model.calc_vector_representations(df)
+
+
+def test_bad_num_workers():
+    with pytest.raises(ValueError):
+        variant.default().enable_multiprocessing(num_workers=0)
+
+
+def test_disable_multiprocessing(dummy_data):
+    model = variant.default()
+    model.enable_multiprocessing(num_workers=1)
+    model.disable_multiprocessing()
+
+    assert model._inference_pool is None
+    assert model.calc_vector_representations(dummy_data).shape == (3, 64)
+
+
+@pytest.mark.parametrize("model_loader", (variant.tiny, variant.default))
+def test_quantised_model(model_loader, dummy_data):
+    model = model_loader()
+    model.enable_quantisation()
+    expected = model.calc_vector_representations(dummy_data)
+
+    model.enable_multiprocessing(num_workers=2)
+    try:
+        result = model.calc_vector_representations(dummy_data)
+    finally:
+        model.disable_multiprocessing()
+
+    assert np.allclose(result, expected, atol=1e-6)
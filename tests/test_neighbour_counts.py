@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+from sceptr._neighbours import count_neighbours
+from sceptr._reference_data import load_reference_tcrs
+from scipy.spatial.distance import squareform
+import torch
+
+
+sceptr.disable_hardware_acceleration()
+
+RADII = [0.5, 0.9, 1.2]
+
+
+@pytest.fixture(scope="module")
+def model():
+    model = variant.default()
+    model.set_tile_size(16)
+    return model
+
+
+@pytest.fixture(scope="module")
+def tcrs():
+    reference_tcrs = load_reference_tcrs().iloc[:50]
+    return pd.concat([reference_tcrs, reference_tcrs.iloc[::5]], ignore_index=True)
+
+
+@pytest.fixture(scope="module")
+def anchors(tcrs):
+    return tcrs.iloc[::4]
+
+
+@pytest.fixture(scope="module")
+def background():
+    return load_reference_tcrs().iloc[50:120]
+
+
+def _count_within(distances, radii):
+    return np.stack([(distances <= radius).sum(axis=1) for radius in radii], axis=1)
+
+
+def test_cdist_neighbour_counts(model, anchors, tcrs):
+    result = model.calc_cdist_neighbour_counts(anchors, tcrs, RADII)
+    expected = _count_within(model.calc_cdist_matrix(anchors, tcrs), RADII)
+
+    assert result.dtype == np.int64
+    assert result.shape == (len(anchors), len(RADII))
+    assert np.array_equal(result, expected)
+
+
+def test_cdist_neighbour_counts_single_radius(model, anchors, tcrs):
+    result = model.calc_cdist_neighbour_counts(anchors, tcrs, 0.9)
+    expected = model.calc_cdist_neighbour_counts(anchors, tcrs, [0.9])
+
+    assert result.shape == (len(anchors),)
+    assert np.array_equal(result, expected[:, 0])
+
+
+def test_cdist_neighbour_counts_several_comparisons(model, anchors, tcrs, background):
+    result = model.calc_cdist_neighbour_counts(anchors, [tcrs, background], RADII)
+
+    assert isinstance(result, list)
+    assert np.array_equal(
+        result[0], model.calc_cdist_neighbour_counts(anchors, tcrs, RADII)
+    )
+    assert np.array_equal(
+        result[1],
+        _count_within(model.calc_cdist_matrix(anchors, background), RADII),
+    )
+
+
+def test_pdist_neighbour_counts(model, tcrs):
+    result = model.calc_pdist_neighbour_counts(tcrs, RADII)
+    distances = squareform(model.calc_pdist_vector(tcrs))
+    np.fill_diagonal(distances, np.inf)
+
+    assert result.shape == (len(tcrs), len(RADII))
+    assert np.array_equal(result, _count_within(distances, RADII))
+
+
+def test_duplicates_are_neighbours(model, tcrs):
+    duplicated = pd.concat([tcrs.iloc[:1]] * 4, ignore_index=True)
+
+    assert np.all(model.calc_pdist_neighbour_counts(duplicated, 0) == 3)
+
+
+def test_pruning_matches_dense_counts():
+    generator = torch.Generator().manual_seed(0)
+    anchors = torch.nn.functional.normalize(torch.randn(700, 8, generator=generator))
+    comparisons = torch.nn.functional.normalize(
+        torch.randn(900, 8, generator=generator)
+    )
+    weights = torch.randint(1, 4, (900,), generator=generator).double()
+    radii = torch.tensor([0.2, 0.4, 0.8])
+
+    result = count_neighbours(anchors, comparisons, weights, radii, 1000)
+    distances = torch.cdist(anchors, comparisons)
+    expected = torch.stack(
+        [(distances <= radius).double() @ weights for radius in radii], dim=1
+    )
+
+    assert torch.equal(result, expected)
+
+
+@pytest.mark.parametrize(
+    ("radii", "exception"),
+    (
+        (-0.1, ValueError),
+        ([0.5, -1], ValueError),
+        ([], ValueError),
+        ([[0.5]], ValueError),
+        (np.inf, ValueError),
+        ("0.5", TypeError),
+        (None, TypeError),
+    ),
+)
+def test_bad_radii(model, tcrs, radii, exception):
+    with pytest.raises(exception):
+        model.calc_pdist_neighbour_counts(tcrs, radii)
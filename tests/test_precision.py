@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+from sceptr._reference_data import load_reference_tcrs
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture
+def dummy_data():
+    df = pd.read_csv("tests/mock_data.csv")
+    return df
+
+
+@pytest.fixture
+def reference_tcrs():
+    return load_reference_tcrs()
+
+
+def test_bfloat16_compute(reference_tcrs):
+    model = variant.default()
+    float_result = model.calc_vector_representations(reference_tcrs)
+    float_nn_indices, _ = model.calc_nearest_neighbours(
+        reference_tcrs, reference_tcrs, k=2
+    )
+
+    model.set_compute_precision("bfloat16")
+    result = model.calc_vector_representations(reference_tcrs)
+    nn_indices, _ = model.calc_nearest_neighbours(reference_tcrs, reference_tcrs, k=2)
+
+    assert result.dtype == np.float32
+    assert np.linalg.norm(result - float_result, axis=1).mean() < 0.05
+    assert (nn_indices[:, 1] == float_nn_indices[:, 1]).mean() > 0.9
+
+    model.set_compute_precision("float32")
+
+    assert np.array_equal(
+        model.calc_vector_representations(reference_tcrs), float_result
+    )
+
+
+def test_bfloat16_residue_representations(dummy_data):
+    model = variant.default()
+    float_result = model.calc_residue_representations(dummy_data)
+
+    model.set_compute_precision("bfloat16")
+    result = model.calc_residue_representations(dummy_data)
+
+    assert result.representation_array.dtype == np.float32
+    assert np.allclose(
+        result.representation_array, float_result.representation_array, atol=0.2
+    )
+
+
+def test_float16_output(reference_tcrs):
+    model = variant.default()
+    float_representations = model.calc_vector_representations(reference_tcrs)
+    float_cdist = model.calc_cdist_matrix(reference_tcrs, reference_tcrs)
+    float_nn_indices, _ = model.calc_nearest_neighbours(
+        reference_tcrs, reference_tcrs, k=5
+    )
+
+    model.set_output_precision("float16")
+    representations = model.calc_vector_representations(reference_tcrs)
+    cdist = model.calc_cdist_matrix(reference_tcrs, reference_tcrs)
+    pdist = model.calc_pdist_vector(reference_tcrs)
+    nn_indices, nn_distances = model.calc_nearest_neighbours(
+        reference_tcrs, reference_tcrs, k=5
+    )
+
+    assert representations.dtype == np.float16
+    assert cdist.dtype == np.float16
+    assert pdist.dtype == np.float16
+    assert nn_distances.dtype == np.float16
+    assert np.allclose(representations, float_representations, atol=1e-3)
+    assert np.allclose(cdist, float_cdist, atol=1e-3)
+    assert np.array_equal(nn_indices, float_nn_indices)
+
+
+def test_quantisation_excludes_bfloat16():
+    model = variant.tiny()
+    model.set_compute_precision("bfloat16")
+
+    with pytest.raises(RuntimeError):
+        model.enable_quantisation()
+
+    model.set_compute_precision("float32")
+    model.enable_quantisation()
+
+    with pytest.raises(RuntimeError):
+        model.set_compute_precision("bfloat16")
+
+
+@pytest.mark.parametrize(
+    ("precision", "exception"), ((16, TypeError), ("float64", ValueError))
+)
+def test_bad_compute_precision(precision, exception):
+    model = variant.tiny()
+
+    with pytest.raises(exception):
+        model.set_compute_precision(precision)
+
+
+@pytest.mark.parametrize(
+    ("precision", "exception"), ((16, TypeError), ("bfloat16", ValueError))
+)
+def test_bad_output_precision(precision, exception):
+    model = variant.tiny()
+
+    with pytest.raises(exception):
+        model.set_output_precision(precision)
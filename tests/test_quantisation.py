@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+from sceptr._quantisation import QuantisationReport, quantise_linear_layers
+from sceptr.model import ResidueRepresentations
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture
+def dummy_data():
+    df = pd.read_csv("tests/mock_data.csv")
+    return df
+
+
+@pytest.mark.parametrize(
+    "model_loader", (variant.tiny, variant.default, variant.large, variant.cdr3_only)
+)
+def test_enable_quantisation(model_loader, dummy_data):
+    model = model_loader()
+    float_result = model.calc_vector_representations(dummy_data)
+
+    report = model.enable_quantisation()
+    quantised_result = model.calc_vector_representations(dummy_data)
+
+    assert isinstance(report, QuantisationReport)
+    assert report.num_reference_tcrs == 256
+    assert 0 < report.mean_l2_deviation <= report.max_l2_deviation < 0.2
+    assert len(report.quantised_layers) > 0
+    assert quantised_result.shape == float_result.shape
+    assert np.allclose(np.linalg.norm(quantised_result, axis=1), 1, atol=1e-5)
+    assert np.abs(quantised_result - float_result).max() < 0.2
+
+    model.disable_quantisation()
+
+    assert np.allclose(model.calc_vector_representations(dummy_data), float_result)
+
+
+def test_zero_tolerance(dummy_data):
+    model = variant.tiny()
+    float_result = model.calc_vector_representations(dummy_data)
+    report = model.enable_quantisation(tolerance=0)
+
+    assert report.quantised_layers == ()
+    assert report.max_l2_deviation < 1e-5
+    assert np.allclose(
+        model.calc_vector_representations(dummy_data), float_result, atol=1e-5
+    )
+
+
+def test_attention_projections_quantised():
+    model = variant.tiny()
+    report = model.enable_quantisation(tolerance=2)
+
+    assert any(name.endswith("self_attn.in_proj") for name in report.quantised_layers)
+    assert any(name.endswith("self_attn.out_proj") for name in report.quantised_layers)
+
+
+@pytest.mark.parametrize("model_loader", (variant.tiny, variant.left_aligned))
+def test_unquantised_attention_matches_original(model_loader, dummy_data):
+    model = model_loader()
+    float_result = model.calc_vector_representations(dummy_data)
+    model._bert = quantise_linear_layers(model._bert, [])
+
+    assert np.allclose(
+        model.calc_vector_representations(dummy_data), float_result, atol=1e-5
+    )
+
+
+def test_quantised_residue_representations(dummy_data):
+    model = variant.tiny()
+    model.enable_quantisation()
+    result = model.calc_residue_representations(dummy_data)
+
+    assert isinstance(result, ResidueRepresentations)
+    assert result.representation_array.shape[0] == len(dummy_data)
+
+
+def test_quantisation_clears_embedding_cache(dummy_data):
+    model = variant.tiny()
+    model.enable_embedding_cache()
+    model.calc_vector_representations(dummy_data)
+    model.enable_quantisation()
+
+    assert model.get_embedding_cache_info().num_entries == 0
+
+
+@pytest.mark.parametrize(
+    ("tolerance", "exception"), (("0.1", TypeError), (-0.1, ValueError))
+)
+def test_bad_tolerance(tolerance, exception):
+    model = variant.tiny()
+
+    with pytest.raises(exception):
+        model.enable_quantisation(tolerance=tolerance)
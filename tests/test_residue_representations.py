@@ -1,6 +1,12 @@
 import numpy as np
+import pandas as pd
 import pytest
-from sceptr.model import ResidueRepresentations
+import sceptr
+from sceptr import variant
+from sceptr.model import RaggedResidueRepresentations, ResidueRepresentations
+
+
+sceptr.disable_hardware_acceleration()
 
 
 def test_repr(res_reps):
@@ -12,3 +18,153 @@ def res_reps() -> ResidueRepresentations:
     rep_array = np.zeros((3, 10, 64))
     comp_mask = np.zeros_like(rep_array, dtype=int)
     return ResidueRepresentations(rep_array, comp_mask)
+
+
+@pytest.fixture(scope="module")
+def dummy_data():
+    return pd.read_csv("tests/mock_data.csv")
+
+
+@pytest.fixture(scope="module")
+def model():
+    return variant.default()
+
+
+@pytest.fixture(scope="module")
+def ragged_reps(model, dummy_data) -> RaggedResidueRepresentations:
+    return model.calc_residue_representations(dummy_data, ragged=True)
+
+
+def test_ragged_repr(ragged_reps, dummy_data):
+    assert repr(ragged_reps) == (
+        f"RaggedResidueRepresentations[num_tcrs: {len(dummy_data)}, "
+        f"num_residues: {len(ragged_reps.values)}, rep_dim: 64]"
+    )
+
+
+def test_ragged_layout(ragged_reps, dummy_data):
+    assert len(ragged_reps) == len(dummy_data)
+    assert ragged_reps.offsets[0] == 0
+    assert ragged_reps.offsets[-1] == len(ragged_reps.values)
+    assert ragged_reps.compartments.dtype == np.uint8
+    assert np.all(ragged_reps.compartments != 0)
+
+
+def test_ragged_matches_padded(model, ragged_reps, dummy_data):
+    expected = model.calc_residue_representations(dummy_data)
+    padded = ragged_reps.to_padded()
+
+    assert np.array_equal(padded.compartment_mask, expected.compartment_mask)
+    assert np.array_equal(padded.representation_array, expected.representation_array)
+
+
+def test_to_ragged_round_trip(model, ragged_reps, dummy_data):
+    round_tripped = model.calc_residue_representations(dummy_data).to_ragged()
+
+    assert np.array_equal(round_tripped.offsets, ragged_reps.offsets)
+    assert np.array_equal(round_tripped.compartments, ragged_reps.compartments)
+    assert np.array_equal(round_tripped.values, ragged_reps.values)
+
+
+def test_get_tcr(model, ragged_reps, dummy_data):
+    padded = model.calc_residue_representations(dummy_data)
+
+    for idx in range(len(dummy_data)):
+        reps = padded.representation_array[idx]
+        mask = padded.compartment_mask[idx]
+
+        assert np.array_equal(ragged_reps.get_tcr(idx), reps[mask != 0])
+        assert np.array_equal(ragged_reps.get_tcr(idx, "CDR3B"), reps[mask == 6])
+        assert np.array_equal(ragged_reps.get_tcr(idx, 1), reps[mask == 1])
+
+    assert np.shares_memory(ragged_reps.get_tcr(0, "CDR3A"), ragged_reps.values)
+
+
+def test_get_compartment(ragged_reps, dummy_data):
+    cdr3bs = ragged_reps.get_compartment("CDR3B")
+
+    assert len(cdr3bs) == len(dummy_data)
+    assert np.all(cdr3bs.compartments == 6)
+    assert np.array_equal(np.diff(cdr3bs.offsets), dummy_data.CDR3B.str.len())
+
+    for idx in range(len(dummy_data)):
+        assert np.array_equal(
+            cdr3bs.get_tcr(idx), ragged_reps.get_tcr(idx, compartment="CDR3B")
+        )
+
+
+@pytest.mark.parametrize(
+    ("compartment", "exception"),
+    (("CDR4A", ValueError), (0, ValueError), (7, ValueError), (1.0, TypeError)),
+)
+def test_bad_compartment(ragged_reps, compartment, exception):
+    with pytest.raises(exception):
+        ragged_reps.get_compartment(compartment)
+
+
+def test_bad_tcr_index(ragged_reps):
+    with pytest.raises(IndexError):
+        ragged_reps.get_tcr(len(ragged_reps))
+
+
+def test_compartment_selection(model, ragged_reps, dummy_data):
+    result = model.calc_residue_representations(
+        dummy_data, ragged=True, compartments=["CDR3B", "CDR3A"]
+    )
+    expected_values = ragged_reps.values[np.isin(ragged_reps.compartments, (3, 6))]
+
+    assert np.array_equal(result.values, expected_values)
+    assert set(np.unique(result.compartments)) == {3, 6}
+    assert np.array_equal(
+        np.diff(result.offsets),
+        dummy_data.CDR3A.str.len() + dummy_data.CDR3B.str.len(),
+    )
+
+
+def test_compartment_selection_padded(model, dummy_data):
+    result = model.calc_residue_representations(dummy_data, compartments="CDR3B")
+
+    assert result.representation_array.shape[1] == dummy_data.CDR3B.str.len().max()
+    assert set(np.unique(result.compartment_mask)) == {0, 6}
+
+
+@pytest.mark.parametrize("pooling", ("mean", "max"))
+def test_pooling(model, ragged_reps, dummy_data, pooling):
+    result = model.calc_residue_representations(
+        dummy_data, compartments=[6, 1], pooling=pooling
+    )
+    pool = np.mean if pooling == "mean" else np.max
+
+    assert result.shape == (len(dummy_data), 2, 64)
+    for idx in range(len(dummy_data)):
+        assert np.allclose(
+            result[idx, 0], pool(ragged_reps.get_tcr(idx, "CDR1A"), axis=0), atol=1e-6
+        )
+        assert np.allclose(
+            result[idx, 1], pool(ragged_reps.get_tcr(idx, "CDR3B"), axis=0), atol=1e-6
+        )
+
+
+@pytest.mark.parametrize("pooling", ("mean", "max"))
+def test_pooling_missing_compartment(model, dummy_data, pooling):
+    beta_only = dummy_data.assign(TRAV=None, CDR3A=None)
+    result = model.calc_residue_representations(
+        beta_only, compartments=["CDR3A", "CDR3B"], pooling=pooling
+    )
+
+    assert np.all(np.isnan(result[:, 0]))
+    assert not np.any(np.isnan(result[:, 1]))
+
+
+@pytest.mark.parametrize(
+    ("kwargs", "exception"),
+    (
+        ({"compartments": []}, ValueError),
+        ({"compartments": ["CDR3C"]}, ValueError),
+        ({"pooling": "sum"}, ValueError),
+        ({"pooling": "mean", "ragged": True}, ValueError),
+    ),
+)
+def test_bad_residue_representation_arguments(model, dummy_data, kwargs, exception):
+    with pytest.raises(exception):
+        model.calc_residue_representations(dummy_data, **kwargs)
@@ -0,0 +1,69 @@
+from libtcrlm import schema
+from libtcrlm.schema.tcr import Tcrv
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+import torch
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture
+def dummy_data():
+    df = pd.read_csv("tests/mock_data.csv")
+    return df
+
+
+@pytest.mark.parametrize(
+    "model_loader", (variant.default, variant.cdr3_only, variant.left_aligned)
+)
+def test_snapshot_round_trip(model_loader, dummy_data, tmp_path):
+    model = model_loader()
+    expected = model.calc_vector_representations(dummy_data)
+    model.save_snapshot(tmp_path / "snapshot.pt")
+
+    restored = variant.load_snapshot(tmp_path / "snapshot.pt")
+
+    assert restored.name == model.name
+    assert type(restored._tokeniser) is type(model._tokeniser)
+    assert np.array_equal(restored.calc_vector_representations(dummy_data), expected)
+
+
+def test_snapshot_includes_germline_cdr_table(tmp_path):
+    model = variant.default()
+    model.save_snapshot(tmp_path / "snapshot.pt")
+
+    restored = variant.load_snapshot(tmp_path / "snapshot.pt")
+    germline_cdr_table = restored._germline_cdr_tables["homosapiens"]
+    tcrv = Tcrv(schema.tcr.TravGene["TRAV1-1"], 1)
+
+    assert len(germline_cdr_table) > 200
+    assert germline_cdr_table._cdrs[("TRAV1-1", 1)] == (
+        tcrv.cdr1_sequence,
+        tcrv.cdr2_sequence,
+    )
+
+
+def test_snapshot_saves_float_model(dummy_data, tmp_path):
+    model = variant.default()
+    expected = model.calc_vector_representations(dummy_data)
+    model.set_compute_precision("bfloat16")
+    model.save_snapshot(tmp_path / "snapshot.pt")
+
+    restored = variant.load_snapshot(tmp_path / "snapshot.pt")
+
+    assert restored._compute_dtype == torch.float32
+    assert all(
+        parameter.dtype == torch.float32 for parameter in restored._bert.parameters()
+    )
+    assert np.array_equal(restored.calc_vector_representations(dummy_data), expected)
+
+
+def test_load_bad_snapshot(tmp_path):
+    torch.save({"foo": "bar"}, tmp_path / "not_a_snapshot.pt")
+
+    with pytest.raises(ValueError, match="not a SCEPTR snapshot"):
+        variant.load_snapshot(tmp_path / "not_a_snapshot.pt")
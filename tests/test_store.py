@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+from sceptr.store import EmbeddingStore
+import warnings
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture
+def dummy_data():
+    df = pd.read_csv("tests/mock_data.csv")
+    return df
+
+
+@pytest.fixture
+def default_model():
+    return variant.default()
+
+
+@pytest.fixture
+def store(tmp_path, default_model, dummy_data):
+    return EmbeddingStore.create(tmp_path / "store", default_model, dummy_data)
+
+
+def test_create(store, default_model, dummy_data):
+    expected = default_model.calc_vector_representations(dummy_data)
+
+    assert len(store) == 3
+    assert store.model_name == "SCEPTR"
+    assert store.dim == 64
+    assert store.species == "homosapiens"
+    assert np.array_equal(store.array, expected)
+
+
+def test_open(store, default_model, dummy_data):
+    reopened = EmbeddingStore.open(store.path)
+
+    assert len(reopened) == 3
+    assert isinstance(reopened.array, np.memmap)
+    assert not reopened.array.flags.writeable
+    assert np.array_equal(reopened.array, store.array)
+    pd.testing.assert_frame_equal(reopened.tcrs, dummy_data)
+
+
+def test_get_by_position(store):
+    assert np.array_equal(store.get_by_position(1), store.array[1])
+    assert np.array_equal(store.get_by_position([2, 0]), store.array[[2, 0]])
+
+
+def test_get_by_tcr(store, dummy_data):
+    result = store.get_by_tcr(dummy_data.iloc[[2, 0]])
+
+    assert np.array_equal(result, store.array[[2, 0]])
+
+
+def test_get_by_tcr_without_allele_numbers(store, dummy_data):
+    without_alleles = dummy_data.assign(TRBV=["TRBV2", "TRBV2", "TRBV6-9"])
+
+    assert np.array_equal(store.get_by_tcr(without_alleles), store.array)
+
+
+def test_get_by_tcr_missing(store, dummy_data):
+    missing = dummy_data.iloc[[0]].assign(CDR3B="CASSQDF")
+
+    with pytest.raises(KeyError):
+        store.get_by_tcr(missing)
+
+
+def test_append(store, default_model, dummy_data):
+    new_tcr = dummy_data.iloc[[0]].assign(CDR3B="CASSLGQAYEQYF")
+    store.append(default_model, pd.concat([dummy_data, new_tcr, new_tcr]))
+
+    reopened = EmbeddingStore.open(store.path)
+    expected = default_model.calc_vector_representations(new_tcr)
+
+    assert len(reopened) == 4
+    assert np.array_equal(reopened.get_by_tcr(new_tcr), expected)
+    assert np.array_equal(reopened.get_by_position(3), expected[0])
+
+
+def test_append_wrong_variant(store, dummy_data):
+    with pytest.raises(ValueError, match="cannot be used with"):
+        store.append(variant.tiny(), dummy_data)
+
+
+def test_distances_with_store(store, default_model, dummy_data):
+    expected_cdist = default_model.calc_cdist_matrix(dummy_data, dummy_data)
+    expected_pdist = default_model.calc_pdist_vector(dummy_data)
+
+    assert np.allclose(
+        default_model.calc_cdist_matrix(dummy_data, store), expected_cdist, atol=1e-6
+    )
+    assert np.allclose(
+        default_model.calc_pdist_vector(store), expected_pdist, atol=1e-6
+    )
+
+    indices, _ = default_model.calc_nearest_neighbours(store, store, 1)
+    assert indices[:, 0].tolist() == [0, 1, 2]
+
+
+def test_distances_with_store_wrong_variant(store, dummy_data):
+    with pytest.raises(ValueError, match="cannot be used with"):
+        variant.small().calc_cdist_matrix(dummy_data, store)
+
+
+def test_append_after_interrupted_write(store, default_model, dummy_data):
+    with open(store.path / "embeddings.f32", "ab") as f:
+        f.write(b"\x00" * 100)
+    with open(store.path / "keys.tsv", "a") as f:
+        f.write("TRAV1-1*01\tCASS")
+
+    reopened = EmbeddingStore.open(store.path)
+    assert len(reopened) == 3
+
+    new_tcr = dummy_data.iloc[[0]].assign(CDR3B="CASSLGQAYEQYF")
+    reopened.append(default_model, new_tcr)
+    reopened = EmbeddingStore.open(store.path)
+
+    assert len(reopened) == 4
+    assert reopened.tcrs.CDR3B.tolist()[-1] == "CASSLGQAYEQYF"
+    assert np.array_equal(
+        reopened.get_by_position(3),
+        default_model.calc_vector_representations(new_tcr)[0],
+    )
+
+
+def test_float16_output_stored_as_float32(tmp_path, dummy_data):
+    model = variant.default()
+    expected = model.calc_vector_representations(dummy_data)
+    model.set_output_precision("float16")
+    store = EmbeddingStore.create(tmp_path / "store", model, dummy_data)
+
+    assert store.array.dtype == np.float32
+    assert np.array_equal(store.array, expected)
+
+
+def test_settings_recorded(store):
+    reopened = EmbeddingStore.open(store.path)
+
+    assert reopened.compute_precision == "float32"
+    assert not reopened.quantised
+
+
+def test_append_with_different_compute_precision(store, dummy_data):
+    model = variant.default()
+    model.set_compute_precision("bfloat16")
+    new_tcr = dummy_data.iloc[[0]].assign(CDR3B="CASSLGQAYEQYF")
+
+    with pytest.raises(ValueError, match="cannot be appended to"):
+        store.append(model, new_tcr)
+
+    assert len(EmbeddingStore.open(store.path)) == 3
+
+
+def test_append_with_quantised_model(store, dummy_data):
+    model = variant.default()
+    model.enable_quantisation()
+    new_tcr = dummy_data.iloc[[0]].assign(CDR3B="CASSLGQAYEQYF")
+
+    with pytest.raises(ValueError, match="cannot be appended to"):
+        store.append(model, new_tcr)
+
+
+def test_use_with_different_compute_precision(store, dummy_data):
+    model = variant.default()
+    model.set_compute_precision("bfloat16")
+
+    with pytest.warns(UserWarning, match="different accuracy"):
+        result = model.calc_cdist_matrix(dummy_data, store)
+
+    assert result.shape == (3, 3)
+
+
+def test_use_with_quantised_model(store, dummy_data):
+    model = variant.default()
+    model.enable_quantisation()
+
+    with pytest.warns(UserWarning, match="different accuracy"):
+        model.calc_cdist_matrix(dummy_data, store)
+
+
+def test_use_with_same_settings_does_not_warn(store, default_model, dummy_data):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        default_model.calc_cdist_matrix(dummy_data, store)
+
+    assert not any("different accuracy" in str(w.message) for w in caught)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+
+
+sceptr.disable_hardware_acceleration()
+
+
+@pytest.fixture
+def dummy_data():
+    df = pd.read_csv("tests/mock_data.csv")
+    return df
+
+
+@pytest.fixture
+def default_model():
+    return variant.default()
+
+
+def test_stream_chunks(default_model, dummy_data):
+    default_model.set_batch_size(2)
+    chunks = (dummy_data.iloc[[idx]] for idx in range(3))
+    blocks = list(default_model.iter_vector_representations(chunks))
+
+    assert [row_range for row_range, _ in blocks] == [(0, 2), (2, 3)]
+    assert np.allclose(
+        np.concatenate([block for _, block in blocks]),
+        default_model.calc_vector_representations(dummy_data),
+        atol=1e-6,
+    )
+
+
+@pytest.mark.parametrize(
+    "set_budget",
+    (
+        lambda model: model.set_token_budget(100),
+        lambda model: model.set_memory_budget(10**8),
+    ),
+)
+def test_stream_chunks_with_budget(default_model, dummy_data, set_budget):
+    set_budget(default_model)
+    chunks = (dummy_data.iloc[[idx]] for idx in range(3))
+    blocks = list(default_model.iter_vector_representations(chunks))
+
+    assert [row_range for row_range, _ in blocks] == [(0, 1), (1, 2), (2, 3)]
+    assert np.allclose(
+        np.concatenate([block for _, block in blocks]),
+        default_model.calc_vector_representations(dummy_data),
+        atol=1e-6,
+    )
+
+
+@pytest.mark.parametrize("filename,separator", (("data.csv", ","), ("data.tsv", "\t")))
+def test_stream_file(default_model, dummy_data, tmp_path, filename, separator):
+    path = tmp_path / filename
+    dummy_data.to_csv(path, sep=separator, index=False)
+    blocks = list(default_model.iter_vector_representations(path, chunk_size=2))
+
+    assert [row_range for row_range, _ in blocks] == [(0, 3)]
+    assert np.allclose(
+        blocks[0][1],
+        default_model.calc_vector_representations(dummy_data),
+        atol=1e-6,
+    )
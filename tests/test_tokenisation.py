@@ -0,0 +1,145 @@
+import re
+from libtcrlm import schema
+from libtcrlm.tokeniser import (
+    CdrTokeniser,
+    AlphaCdrTokeniser,
+    BetaCdrTokeniser,
+    Cdr3Tokeniser,
+    BetaCdr3Tokeniser,
+)
+import pandas as pd
+import pytest
+import sceptr
+from sceptr import variant
+from sceptr._batching import TokenisedTcrs
+from sceptr._tokenisation import GermlineCdrTable, tokenise_tcrs
+import torch
+
+
+TOKENISERS = [
+    CdrTokeniser,
+    AlphaCdrTokeniser,
+    BetaCdrTokeniser,
+    Cdr3Tokeniser,
+    BetaCdr3Tokeniser,
+]
+
+
+@pytest.fixture
+def dummy_tcrs():
+    df = pd.read_csv("tests/mock_data.csv")
+    return list(schema.generate_tcr_series(df))
+
+
+@pytest.fixture
+def all_v_gene_tcrs():
+    travs = [gene.name for gene in schema.tcr.TravGene]
+    trbvs = [gene.name for gene in schema.tcr.TrbvGene]
+    num_tcrs = max(len(travs), len(trbvs))
+    df = pd.DataFrame(
+        {
+            "TRAV": [travs[idx % len(travs)] for idx in range(num_tcrs)],
+            "CDR3A": "CAVSDGGSQGNLIF",
+            "TRBV": [trbvs[idx % len(trbvs)] for idx in range(num_tcrs)],
+            "CDR3B": "CASSLGQAYEQYF",
+        }
+    )
+    return list(schema.generate_tcr_series(df))
+
+
+@pytest.fixture
+def missing_chain_tcrs():
+    df = pd.DataFrame(
+        {
+            "TRAV": ["TRAV1-1", None, "TRAV1-2", None],
+            "CDR3A": ["CAVKASGSRLTF", None, None, "CAVSDGGSQGNLIF"],
+            "TRBV": [None, "TRBV2", "TRBV3-1", "TRBV2"],
+            "CDR3B": [None, "CASSPVRGEF", None, None],
+        }
+    )
+    return list(schema.generate_tcr_series(df))
+
+
+@pytest.mark.parametrize("tokeniser_class", TOKENISERS)
+def test_matches_per_tcr_tokenisation(tokeniser_class, dummy_tcrs):
+    tokeniser = tokeniser_class()
+    expected = TokenisedTcrs.from_tensors(tokeniser.tokenise(tcr) for tcr in dummy_tcrs)
+    result = tokenise_tcrs(tokeniser, dummy_tcrs)
+
+    assert torch.equal(result.tokens, expected.tokens)
+    assert result.lengths.tolist() == expected.lengths.tolist()
+
+
+@pytest.mark.parametrize("tokeniser_class", TOKENISERS)
+def test_matches_per_tcr_tokenisation_for_all_v_genes(tokeniser_class, all_v_gene_tcrs):
+    tokeniser = tokeniser_class()
+    expected = TokenisedTcrs.from_tensors(
+        tokeniser.tokenise(tcr) for tcr in all_v_gene_tcrs
+    )
+    result = tokenise_tcrs(tokeniser, all_v_gene_tcrs)
+
+    assert torch.equal(result.tokens, expected.tokens)
+    assert result.lengths.tolist() == expected.lengths.tolist()
+
+
+def test_matches_per_tcr_tokenisation_for_missing_chains(missing_chain_tcrs):
+    tokeniser = CdrTokeniser()
+    expected = TokenisedTcrs.from_tensors(
+        tokeniser.tokenise(tcr) for tcr in missing_chain_tcrs
+    )
+    result = tokenise_tcrs(tokeniser, missing_chain_tcrs)
+
+    assert torch.equal(result.tokens, expected.tokens)
+    assert result.lengths.tolist() == expected.lengths.tolist()
+
+
+@pytest.mark.parametrize(
+    ("tokeniser_class", "tcr_idx"),
+    ((AlphaCdrTokeniser, 1), (BetaCdrTokeniser, 0), (BetaCdr3Tokeniser, 0)),
+)
+def test_empty_tcr(tokeniser_class, tcr_idx, missing_chain_tcrs):
+    tokeniser = tokeniser_class()
+    tcrs = missing_chain_tcrs[:2]
+
+    with pytest.raises(RuntimeError) as expected_error:
+        tokeniser.tokenise(tcrs[tcr_idx])
+
+    with pytest.raises(RuntimeError, match=re.escape(str(expected_error.value))):
+        tokenise_tcrs(tokeniser, tcrs)
+
+
+def test_germline_cdr_table(dummy_tcrs):
+    table = GermlineCdrTable("homosapiens")
+    tokeniser = CdrTokeniser()
+    expected = TokenisedTcrs.from_tensors(tokeniser.tokenise(tcr) for tcr in dummy_tcrs)
+    result = tokenise_tcrs(tokeniser, dummy_tcrs, table)
+
+    assert torch.equal(result.tokens, expected.tokens)
+    assert len(table) == len(
+        {repr(tcr._trav) for tcr in dummy_tcrs}
+        | {repr(tcr._trbv) for tcr in dummy_tcrs}
+    )
+    assert table.get_cdrs(dummy_tcrs[0]._trav) == (
+        dummy_tcrs[0].cdr1a_sequence,
+        dummy_tcrs[0].cdr2a_sequence,
+    )
+
+
+def test_germline_cdr_table_follows_species(dummy_tcrs):
+    model = variant.default()
+    model._tokenise(dummy_tcrs)
+
+    sceptr.setup("musmusculus")
+    try:
+        mouse_tcrs = list(
+            schema.generate_tcr_series(pd.read_csv("tests/mock_data_musmusculus.csv"))
+        )
+        expected = TokenisedTcrs.from_tensors(
+            model._tokeniser.tokenise(tcr) for tcr in mouse_tcrs
+        )
+        result = model._tokenise(mouse_tcrs)
+    finally:
+        sceptr.setup("homosapiens")
+
+    assert torch.equal(result.tokens, expected.tokens)
+    assert set(model._germline_cdr_tables) == {"homosapiens", "musmusculus"}
@@ -3,8 +3,11 @@ import numpy as np
 import pandas as pd
 import pytest
 import sceptr
+from scipy.sparse import csr_array
 from sceptr import variant
+from sceptr._model_saves import get_loaded_variant_names
 from sceptr.model import Sceptr, ResidueRepresentations
+import torch
 
 
 sceptr.disable_hardware_acceleration()
@@ -21,6 +24,13 @@ def default_model():
     return variant.default()
 
 
+@pytest.fixture
+def tiled_model():
+    # Tests using this fixture change the tile size, so each gets a model of
+    # its own rather than sharing one with other tests
+    return variant.default()
+
+
 @pytest.mark.parametrize(
     "model",
     (
@@ -78,6 +88,28 @@ class TestVariant:
         assert isinstance(result, np.ndarray)
         assert result.shape == (3,)
 
+    def test_nearest_neighbours(self, model, dummy_data):
+        indices, distances = model.calc_nearest_neighbours(dummy_data, dummy_data, 2)
+
+        assert isinstance(indices, np.ndarray)
+        assert isinstance(distances, np.ndarray)
+        assert indices.shape == (3, 2)
+        assert distances.shape == (3, 2)
+
+    def test_cdist_radius_graph(self, model, dummy_data):
+        result = model.calc_cdist_radius_graph(dummy_data, dummy_data, 2.0)
+
+        assert isinstance(result, csr_array)
+        assert result.shape == (3, 3)
+        assert result.nnz == 9
+
+    def test_pdist_radius_graph(self, model, dummy_data):
+        result = model.calc_pdist_radius_graph(dummy_data, 2.0)
+
+        assert isinstance(result, csr_array)
+        assert result.shape == (3, 3)
+        assert result.nnz == 6
+
     def test_residue_representations(self, model, dummy_data):
         if model.name in (
             "SCEPTR",
@@ -112,3 +144,144 @@ def test_set_batch_size(default_model):
 def test_set_batch_size_type_error(default_model):
     with pytest.raises(TypeError):
         default_model.set_batch_size("128")
+
+
+def test_set_token_budget(default_model):
+    assert default_model._token_budget is None
+    default_model.set_token_budget(4096)
+    assert default_model._token_budget == 4096
+    default_model.set_token_budget(None)
+    assert default_model._token_budget is None
+
+
+def test_set_token_budget_type_error(default_model):
+    with pytest.raises(TypeError):
+        default_model.set_token_budget("4096")
+
+
+def test_set_token_budget_value_error(default_model):
+    with pytest.raises(ValueError):
+        default_model.set_token_budget(0)
+
+
+def test_set_tile_size(tiled_model):
+    assert tiled_model._tile_size == 4096
+    tiled_model.set_tile_size(2)
+    assert tiled_model._tile_size == 2
+
+
+def test_set_tile_size_type_error(tiled_model):
+    with pytest.raises(TypeError):
+        tiled_model.set_tile_size("2")
+
+
+@pytest.mark.parametrize("tile_size", (1, 2, 4096))
+def test_nearest_neighbours_match_cdist(tiled_model, dummy_data, tile_size):
+    tiled_model.set_tile_size(tile_size)
+    indices, distances = tiled_model.calc_nearest_neighbours(dummy_data, dummy_data, 3)
+    cdist = tiled_model.calc_cdist_matrix(dummy_data, dummy_data)
+
+    assert np.allclose(distances, np.sort(cdist, axis=1), atol=1e-6)
+    assert np.allclose(np.take_along_axis(cdist, indices, axis=1), distances, atol=1e-6)
+
+
+@pytest.mark.parametrize("k", (0, 4))
+def test_nearest_neighbours_bad_k(default_model, dummy_data, k):
+    with pytest.raises(ValueError):
+        default_model.calc_nearest_neighbours(dummy_data, dummy_data, k)
+
+
+@pytest.mark.parametrize(("k", "exception"), ((True, TypeError), (2.0, TypeError)))
+def test_nearest_neighbours_k_type_error(default_model, dummy_data, k, exception):
+    with pytest.raises(exception):
+        default_model.calc_nearest_neighbours(dummy_data, dummy_data, k)
+
+
+def test_nearest_neighbours_numpy_k(default_model, dummy_data):
+    k = np.int64(2)
+    indices, distances = default_model.calc_nearest_neighbours(
+        dummy_data, dummy_data, k
+    )
+
+    assert indices.shape == (3, 2)
+    assert distances.shape == (3, 2)
+
+
+@pytest.mark.parametrize("tile_size", (1, 2, 4096))
+def test_radius_graphs_match_cdist(tiled_model, dummy_data, tile_size):
+    tiled_model.set_tile_size(tile_size)
+    cdist = tiled_model.calc_cdist_matrix(dummy_data, dummy_data)
+    radius = np.median(cdist[cdist > 0])
+
+    cdist_graph = tiled_model.calc_cdist_radius_graph(dummy_data, dummy_data, radius)
+    pdist_graph = tiled_model.calc_pdist_radius_graph(dummy_data, radius)
+
+    expected_cdist_mask = cdist <= radius
+    expected_pdist_mask = expected_cdist_mask & ~np.eye(3, dtype=bool)
+
+    assert np.array_equal(_get_sparsity_mask(cdist_graph), expected_cdist_mask)
+    assert np.array_equal(_get_sparsity_mask(pdist_graph), expected_pdist_mask)
+    assert np.allclose(pdist_graph.toarray(), pdist_graph.toarray().T)
+    assert np.allclose(
+        pdist_graph.toarray()[expected_pdist_mask],
+        cdist[expected_pdist_mask],
+        atol=1e-6,
+    )
+
+
+def _get_sparsity_mask(sparse_array: csr_array) -> np.ndarray:
+    mask = np.zeros(sparse_array.shape, dtype=bool)
+    coo = sparse_array.tocoo()
+    mask[coo.row, coo.col] = True
+    return mask
+
+
+class TestVariantRegistry:
+    def test_weights_shared_between_instances(self):
+        first = variant.tiny()
+        second = variant.tiny()
+
+        assert first is not second
+        assert first._bert is second._bert
+
+    def test_weights_are_read_only(self):
+        model = variant.tiny()
+
+        assert not any(
+            parameter.requires_grad for parameter in model._bert.parameters()
+        )
+
+    def test_settings_not_shared_between_instances(self, dummy_data):
+        first = variant.tiny()
+        second = variant.tiny()
+        expected = second.calc_vector_representations(dummy_data)
+
+        first.set_compute_precision("bfloat16")
+        first.enable_hardware_acceleration()
+        first.disable_hardware_acceleration()
+
+        assert second._compute_dtype == torch.float32
+        assert np.array_equal(second.calc_vector_representations(dummy_data), expected)
+
+    def test_evict(self):
+        before_eviction = variant.tiny()
+
+        assert variant.evict(before_eviction.name) == [before_eviction.name]
+        assert before_eviction.name not in get_loaded_variant_names()
+
+        after_eviction = variant.tiny()
+
+        assert after_eviction._bert is not before_eviction._bert
+        assert before_eviction.name in get_loaded_variant_names()
+
+    def test_evict_unloaded(self):
+        assert variant.evict("foobar") == []
+
+    def test_evict_all(self):
+        variant.tiny()
+        variant.small()
+
+        evicted = variant.evict()
+
+        assert {"SCEPTR (tiny)", "SCEPTR (small)"} <= set(evicted)
+        assert get_loaded_variant_names() == []